@@ -252,8 +252,12 @@ const App: React.FC = () => {
     loadData();
   }, []);
 
-  // Poll for notification count
+  // Live notification count (server push, polling only if the stream is unavailable)
   useEffect(() => {
+    let cancelled = false;
+    let interval: ReturnType<typeof setInterval> | null = null;
+    let unsubscribe = () => { };
+
     const loadNotificationCount = async () => {
       try {
         const { fetchUnreadNotificationCount } = await import('./api');
@@ -263,10 +267,29 @@ const App: React.FC = () => {
         console.error('Failed to fetch notification count:', e);
       }
     };
+    const startPolling = () => {
+      if (interval || cancelled) return;
+      loadNotificationCount();
+      interval = setInterval(loadNotificationCount, 10000); // Poll every 10 seconds
+    };
+
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+    } else {
+      import('./api').then(({ subscribeToNotificationStream }) => {
+        if (cancelled) return;
+        unsubscribe = subscribeToNotificationStream({
+          onUnreadCount: setUnreadNotificationCount,
+          onClosed: startPolling
+        });
+      });
+    }
 
-    loadNotificationCount();
-    const interval = setInterval(loadNotificationCount, 10000); // Poll every 10 seconds
-    return () => clearInterval(interval);
+    return () => {
+      cancelled = true;
+      unsubscribe();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   // Security State
@@ -411,32 +434,22 @@ const App: React.FC = () => {
     const booking = (syncEvents.find(e => e.type === 'booking' && e.roomNumber === roomNumber && e.status === 'CheckedIn') as Booking);
     if (!booking) return;
 
-    const totalAmount = items.reduce((sum, i) => sum + i.price, 0);
-    const description = `In-Room Dining - Order #${Math.floor(Math.random() * 1000)}`;
-
-    const newFolioItem: FolioItem = {
-      id: `fi-${Date.now()}`,
-      description,
-      amount: totalAmount,
-      category: 'F&B',
-      timestamp: new Date().toISOString()
-    };
-
-    const updatedBooking: Booking = {
-      ...booking,
-      folio: [...(booking.folio || []), newFolioItem],
-      timestamp: Date.now()
-    };
-
-    // Update local state reactively
-    setSyncEvents(prev => prev.map(e => (e.id === booking.id && e.type === 'booking') ? { ...updatedBooking, type: 'booking' } as SyncEvent : e));
-
-    // Persist to backend immediately
-    try {
-      const { updateBooking } = await import('./api');
-      await updateBooking(updatedBooking);
-    } catch (err) {
-      console.error("Failed to persist in-room dining order:", err);
+    // One small request: the server appends the folio charge and queues the order for the kitchen.
+    // The id is chosen once per cart, so resending after a dropped connection can't charge twice.
+    const orderId = `ord-${crypto.randomUUID().slice(0, 8)}`;
+    const { placeServiceOrder } = await import('./api');
+    for (let attempt = 1; attempt <= 3; attempt++) {
+      try {
+        const { booking: saved } = await placeServiceOrder(booking.id, { id: orderId, department: 'F&B', items });
+        setSyncEvents(prev => prev.map(e => (e.id === saved.id && e.type === 'booking') ? { ...saved, type: 'booking' } as SyncEvent : e));
+        return;
+      } catch (err) {
+        // fetch rejects with a TypeError when the request never got an answer; anything else is final
+        if (!(err instanceof TypeError) || attempt === 3) {
+          console.error("Failed to persist in-room dining order:", err);
+          return;
+        }
+      }
     }
   };
 
@@ -482,7 +495,8 @@ const App: React.FC = () => {
 
     try {
       const { updateBooking } = await import('./api');
-      await updateBooking(updated);
+      const saved = await updateBooking(updated);
+      setSyncEvents(prev => prev.map(e => e.id === saved.id && e.type === 'booking' ? { ...saved, type: 'booking' } as SyncEvent : e));
     } catch (err) {
       console.error("Failed to persist extra bed update", err);
     }
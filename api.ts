@@ -1,4 +1,4 @@
-import { Hotel, RoomType, OTAConnection, RateRulesConfig, Booking, PropertySettings, Notification } from './types';
+import { Hotel, RoomType, OTAConnection, RateRulesConfig, Booking, FolioItem, PropertySettings, Notification, GuestSuggestion, ServiceOrder, ServiceOrderItem, ServiceOrderStatus, FrontDeskToday, RoomAssignmentPlan } from './types';
 
 const API_BASE = '/api';
 
@@ -108,13 +108,169 @@ export const createBooking = async (booking: Booking): Promise<Booking> => {
     if (!response.ok) throw new Error('Failed to create booking');
     return response.json();
 };
+// Thrown on a 409: the booking changed since it was read; `current` is what the server has now
+export class BookingConflictError extends Error {
+    current: Booking | null;
+    constructor(message: string, current: Booking | null) {
+        super(message);
+        this.name = 'BookingConflictError';
+        this.current = current;
+    }
+}
+
+const readBookingWrite = async (response: Response, failure: string): Promise<Booking> => {
+    if (response.status === 409) {
+        const err = await response.json().catch(() => ({}));
+        if (err.detail?.current) throw new BookingConflictError(err.detail.message, err.detail.current);
+        throw new Error(typeof err.detail === 'string' ? err.detail : failure);
+    }
+    if (!response.ok) throw new Error(failure);
+    return response.json();
+};
+
+export const fetchBooking = async (bookingId: string): Promise<Booking> => {
+    const response = await fetch(`${API_BASE}/bookings/${bookingId}`);
+    if (!response.ok) throw new Error('Failed to fetch booking');
+    return response.json();
+};
+
+// Sends the booking's `version`; rejected with BookingConflictError if someone else saved first
 export const updateBooking = async (booking: Booking): Promise<Booking> => {
     const response = await fetch(`${API_BASE}/bookings/${booking.id}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(booking)
     });
-    if (!response.ok) throw new Error('Failed to update booking');
+    return readBookingWrite(response, 'Failed to update booking');
+};
+
+// JSON Merge Patch: only the fields sent are written (null clears a field).
+// Pass `version` when the patch replaces something read earlier (folio, payments).
+export const patchBooking = async (bookingId: string, patch: Partial<Booking>, version?: number): Promise<Booking> => {
+    const headers: Record<string, string> = { 'Content-Type': 'application/merge-patch+json' };
+    if (version !== undefined) headers['If-Match'] = `"${version}"`;
+    const response = await fetch(`${API_BASE}/bookings/${bookingId}`, {
+        method: 'PATCH',
+        headers,
+        body: JSON.stringify(patch)
+    });
+    return readBookingWrite(response, 'Failed to update booking');
+};
+
+export const appendFolioItem = async (bookingId: string, item: FolioItem): Promise<Booking> => {
+    const response = await fetch(`${API_BASE}/bookings/${bookingId}/folio`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(item)
+    });
+    return readBookingWrite(response, 'Failed to add folio item');
+};
+
+export const updateBookingStatus = async (bookingId: string, status: Booking['status'], rejectionReason?: string): Promise<Booking> => {
+    const response = await fetch(`${API_BASE}/bookings/${bookingId}/status`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ status, rejectionReason })
+    });
+    return readBookingWrite(response, 'Failed to update booking status');
+};
+
+export const assignBookingRoom = async (bookingId: string, roomNumber: string, roomTypeId?: string): Promise<Booking> => {
+    const response = await fetch(`${API_BASE}/bookings/${bookingId}/room`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ roomNumber, roomTypeId })
+    });
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        throw new Error(err.detail || 'Failed to assign room');
+    }
+    return response.json();
+};
+
+// Guest menu / laundry: charges the folio and queues the order for its department in one request
+export const placeServiceOrder = async (bookingId: string, order: {
+    id?: string;
+    department?: ServiceOrder['department'];
+    items: ServiceOrderItem[];
+    instructions?: string;
+}): Promise<{ order: ServiceOrder; booking: Booking }> => {
+    const response = await fetch(`${API_BASE}/bookings/${bookingId}/orders`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(order)
+    });
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        throw new Error(err.detail || 'Failed to place order');
+    }
+    return response.json();
+};
+
+export const fetchServiceOrders = async (options: {
+    department?: ServiceOrder['department'];
+    status?: 'open' | 'all' | ServiceOrderStatus;
+    bookingId?: string;
+} = {}): Promise<ServiceOrder[]> => {
+    const params = new URLSearchParams();
+    if (options.department) params.append('department', options.department);
+    if (options.status) params.append('status', options.status);
+    if (options.bookingId) params.append('bookingId', options.bookingId);
+    const response = await fetch(`${API_BASE}/orders?${params.toString()}`);
+    if (!response.ok) return [];
+    return response.json();
+};
+
+export const updateServiceOrderStatus = async (orderId: string, status: ServiceOrderStatus): Promise<ServiceOrder> => {
+    const response = await fetch(`${API_BASE}/orders/${orderId}/status`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ status })
+    });
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        throw new Error(err.detail || 'Failed to update order');
+    }
+    return response.json();
+};
+
+// Server-sent events for kitchen / laundry screens: the open queue on connect (then `onReady`),
+// followed by every new order and status change. Keep orders keyed by id and replace on each event.
+export const subscribeToServiceOrders = (handlers: {
+    department?: ServiceOrder['department'];
+    onOrder: (order: ServiceOrder) => void;
+    onReady?: () => void;
+    onClosed?: () => void;
+}): (() => void) => {
+    const query = handlers.department ? `?department=${encodeURIComponent(handlers.department)}` : '';
+    const source = new EventSource(`${API_BASE}/orders/stream${query}`);
+    source.addEventListener('order', (e) => handlers.onOrder(JSON.parse((e as MessageEvent).data)));
+    source.addEventListener('ready', () => handlers.onReady?.());
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) handlers.onClosed?.();
+    };
+    return () => source.close();
+};
+
+// Revalidated with the board's ETag, so an unchanged board costs a 304
+export const fetchFrontDeskToday = async (date?: string): Promise<FrontDeskToday | null> => {
+    const query = date ? `?date=${encodeURIComponent(date)}` : '';
+    const response = await fetch(`${API_BASE}/frontdesk/today${query}`, { cache: 'no-cache' });
+    if (!response.ok) return null;
+    return response.json();
+};
+
+// Place unassigned bookings arriving in [start, end) into rooms; a dry run unless `apply` is set
+export const autoAssignRooms = async (options: { start?: string; end?: string; apply?: boolean } = {}): Promise<RoomAssignmentPlan> => {
+    const response = await fetch(`${API_BASE}/bookings/assign-rooms`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(options)
+    });
+    if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.detail || 'Failed to assign rooms');
+    }
     return response.json();
 };
 
@@ -144,16 +300,63 @@ export const lookupGuest = async (name?: string, phone?: string): Promise<any> =
     return response.json();
 };
 
-export const fetchGuestHistory = async (name: string, phone?: string, excludeBookingId?: string): Promise<Booking[]> => {
+// Typeahead: id, name, masked phone, last check-in and stay count only
+export const suggestGuests = async (q: string, limit?: number): Promise<GuestSuggestion[]> => {
+    const params = new URLSearchParams({ q });
+    if (limit) params.append('limit', String(limit));
+    const response = await fetch(`${API_BASE}/guest/suggest?${params.toString()}`);
+    if (!response.ok) return [];
+    return response.json();
+};
+
+export const fetchGuestProfile = async (profileId: number): Promise<any> => {
+    const response = await fetch(`${API_BASE}/guest/${profileId}`);
+    if (!response.ok) throw new Error('Failed to load guest profile');
+    return response.json();
+};
+
+export const fetchGuestHistory = async (name: string, phone?: string, excludeBookingId?: string, profileId?: number): Promise<Booking[]> => {
     const params = new URLSearchParams();
     params.append('name', name);
     if (phone) params.append('phone', phone);
     if (excludeBookingId) params.append('exclude_booking_id', excludeBookingId);
+    if (profileId) params.append('profile_id', String(profileId));
     const response = await fetch(`${API_BASE}/guest/history?${params.toString()}`);
     if (!response.ok) return [];
     return response.json();
 };
 
+// ========== BILLING ==========
+
+export const getInvoiceExportUrl = (start: string, end: string): string => {
+    const params = new URLSearchParams({ start, end });
+    return `${API_BASE}/billing/export?${params.toString()}`;
+};
+
+// ========== OCR ==========
+
+export interface OCRPageResult {
+    type: string;
+    filename: string;
+    text: string;
+    cached: boolean;
+}
+
+export const uploadOCRPages = async (pages: { file: Blob; type: string; filename?: string }[]): Promise<OCRPageResult[]> => {
+    const form = new FormData();
+    pages.forEach((page, i) => {
+        form.append('files', page.file, page.filename || `${page.type}-${i}.jpg`);
+        form.append('types', page.type);
+    });
+    const response = await fetch(`${API_BASE}/ocr/upload`, { method: 'POST', body: form });
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        throw new Error(err.detail || `Server Error: ${response.status}`);
+    }
+    const data = await response.json();
+    return data.pages;
+};
+
 // ========== NOTIFICATIONS API ==========
 
 export const fetchNotifications = async (unreadOnly: boolean = false, typeFilter?: string): Promise<Notification[]> => {
@@ -165,6 +368,29 @@ export const fetchNotifications = async (unreadOnly: boolean = false, typeFilter
     return response.json();
 };
 
+// Keyset-paginated feed: pass the previous page's nextCursor as `before` to load older notifications
+export const fetchNotificationPage = async (options: {
+    unreadOnly?: boolean;
+    types?: string[];
+    bookingId?: string;
+    roomNumber?: string;
+    order?: 'recent' | 'priority';
+    before?: string | null;
+    limit?: number;
+} = {}): Promise<{ notifications: Notification[]; nextCursor: string | null }> => {
+    const params = new URLSearchParams();
+    if (options.unreadOnly) params.append('unread_only', 'true');
+    if (options.types?.length) params.append('type_filter', options.types.join(','));
+    if (options.bookingId) params.append('booking_id', options.bookingId);
+    if (options.roomNumber) params.append('room_number', options.roomNumber);
+    if (options.order) params.append('order', options.order);
+    if (options.before) params.append('before', options.before);
+    if (options.limit) params.append('limit', String(options.limit));
+    const response = await fetch(`${API_BASE}/notifications?${params.toString()}`);
+    if (!response.ok) return { notifications: [], nextCursor: null };
+    return { notifications: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+};
+
 export const fetchUnreadNotificationCount = async (): Promise<number> => {
     const response = await fetch(`${API_BASE}/notifications/unread-count`);
     if (!response.ok) return 0;
@@ -172,6 +398,22 @@ export const fetchUnreadNotificationCount = async (): Promise<number> => {
     return data.count || 0;
 };
 
+// Server-sent events: pushes new notifications and unread-count changes.
+// EventSource reconnects on its own and resumes from the last notification id.
+export const subscribeToNotificationStream = (handlers: {
+    onNotification?: (notification: Notification) => void;
+    onUnreadCount?: (count: number) => void;
+    onClosed?: () => void; // Stream unavailable (e.g. serverless host); fall back to polling
+}): (() => void) => {
+    const source = new EventSource(`${API_BASE}/notifications/stream`);
+    source.addEventListener('notification', (e) => handlers.onNotification?.(JSON.parse((e as MessageEvent).data)));
+    source.addEventListener('unread-count', (e) => handlers.onUnreadCount?.(JSON.parse((e as MessageEvent).data).count || 0));
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) handlers.onClosed?.();
+    };
+    return () => source.close();
+};
+
 export const markNotificationRead = async (notificationId: string): Promise<void> => {
     await fetch(`${API_BASE}/notifications/${notificationId}/read`, {
         method: 'PUT'
@@ -42,13 +42,19 @@ try:
         sys.path.insert(0, project_root)
     
     # Try to import the main app's routes
-    from main import app as main_app
+    from main import app as main_app, _OCRUploadLimit
+    
+    # Share the main app's lifespan so upstream clients are managed here too
+    app.router.lifespan_context = main_app.router.lifespan_context
     
     # Copy routes from main_app to our app
     for route in main_app.routes:
         if hasattr(route, 'path') and route.path not in ['/api/ping', '/api/health']:
             app.routes.append(route)
     
+    # Copying routes leaves main_app's middleware behind; the OCR size cap has to run here too
+    app.add_middleware(_OCRUploadLimit)
+    
     _full_app_loaded = True
     
 except Exception as e:
@@ -0,0 +1,61 @@
+"""
+Streaming ZIP writer for invoice batch exports.
+
+zipfile can write to a non-seekable sink (it falls back to data descriptors),
+so each member is compressed into a small buffer that is drained straight into
+the HTTP response. Nothing but the member currently being written is held in
+memory, however many invoices are in the archive.
+"""
+import zipfile
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=compression)
+
+    def add(self, name: str, data: bytes) -> bytes:
+        """Add an in-memory member; returns the bytes to send."""
+        self._zip.writestr(name, data)
+        return self._sink.drain()
+
+    def add_file(self, name: str, fileobj):
+        """Add a member from a (possibly disk-spooled) file object, yielding output as it is produced."""
+        with self._zip.open(name, mode="w") as dst:
+            while True:
+                chunk = fileobj.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst.write(chunk.encode() if isinstance(chunk, str) else chunk)
+                out = self._sink.drain()
+                if out:
+                    yield out
+        out = self._sink.drain()
+        if out:
+            yield out
+
+    def close(self) -> bytes:
+        """Write the central directory; returns the final bytes to send."""
+        self._zip.close()
+        return self._sink.drain()
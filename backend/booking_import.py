@@ -0,0 +1,442 @@
+"""
+Streaming import of historical bookings (onboarding from a previous PMS).
+
+Input is NDJSON (one booking object per line) or CSV with a header row, using
+the API's field names (id, roomTypeId, guestName, checkIn, ...). Guest contact
+details come either as flat guestPhone / guestEmail columns or, in NDJSON, as a
+guestDetails object. The file is read one record at a time and handled in
+chunks of CHUNK_ROWS:
+
+    1. each record is checked against a small field schema (required fields,
+       types, dates, known room types); rejected records go to the error file
+       as NDJSON {"line", "errors", "record"};
+    2. accepted rows are loaded into a temporary staging table, with COPY on
+       Postgres (executemany elsewhere);
+    3. guests with a phone that normalizes to E.164 are upserted into
+       guest_profiles with one INSERT ... SELECT ... ON CONFLICT (historical
+       rows only fill blanks and move last_check_in forward);
+    4. bookings are inserted with one INSERT ... SELECT joined to their
+       profiles; ids that already exist are skipped, never overwritten.
+
+Each chunk is its own transaction, so memory stays flat and an interrupted
+import can be re-run: finished chunks are skipped as duplicates. No
+notifications are raised and no room-overlap check is done; the previous
+PMS's history is taken as it is. tax_breakdown is left empty and computed on
+the next write to the booking.
+
+Run from the CLI (`python backend/init_db.py --import-bookings FILE`) or
+through POST /api/bookings/import, which runs it as a background job.
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from backend.frontdesk_board import frontdesk_board
+from backend.guest_search import normalize_phone
+
+CHUNK_ROWS = int(os.getenv("BOOKING_IMPORT_CHUNK_ROWS", "5000"))
+MAX_TRACKED_JOBS = 100
+STAGING_TABLE = "booking_import_staging"
+
+SOURCES = ("MMT", "Booking.com", "Expedia", "Direct")
+STATUSES = ("Confirmed", "CheckedIn", "CheckedOut", "Cancelled", "Rejected")
+
+
+def _text(value):
+    return str(value).strip()
+
+
+def _int(value):
+    number = _float(value)
+    if not number.is_integer():
+        raise ValueError("expected an integer")
+    return int(number)
+
+
+def _float(value):
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    return float(value)
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    lowered = str(value).strip().lower()
+    if lowered in ("true", "t", "yes", "y", "1"):
+        return True
+    if lowered in ("false", "f", "no", "n", "0"):
+        return False
+    raise ValueError("expected true or false")
+
+
+def _date(value):
+    value = str(value).strip()
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError("expected a YYYY-MM-DD date")
+    return value
+
+
+def _one_of(choices):
+    def parse(value):
+        value = str(value).strip()
+        if value not in choices:
+            raise ValueError(f"expected one of {', '.join(choices)}")
+        return value
+    return parse
+
+
+# (staging/bookings column, import field, parser, required)
+FIELDS = [
+    ("id", "id", _text, True),
+    ("room_type_id", "roomTypeId", _text, True),
+    ("room_number", "roomNumber", _text, False),
+    ("guest_name", "guestName", _text, True),
+    ("source", "source", _one_of(SOURCES), True),
+    ("status", "status", _one_of(STATUSES), True),
+    ("timestamp", "timestamp", _int, False),
+    ("check_in", "checkIn", _date, True),
+    ("check_out", "checkOut", _date, True),
+    ("amount", "amount", _float, False),
+    ("reservation_id", "reservationId", _text, False),
+    ("number_of_rooms", "numberOfRooms", _int, False),
+    ("pax", "pax", _int, False),
+    ("extra_beds", "extraBeds", _int, False),
+    ("special_requests", "specialRequests", _text, False),
+    ("is_vip", "isVIP", _bool, False),
+    ("is_settled", "isSettled", _bool, False),
+    ("invoice_number", "invoiceNumber", _text, False),
+    ("external_reference_id", "externalReferenceId", _text, False),
+]
+# Filled in where the import leaves them empty, as create_booking does
+DEFAULTS = {"number_of_rooms": "1", "pax": "1", "is_vip": "FALSE", "is_settled": "FALSE"}
+# Staged alongside the booking columns, used for the guest profile upsert
+GUEST_COLUMNS = ["guest_details", "guest_phone", "guest_email", "phone_e164"]
+STAGING_COLUMNS = ["line"] + [column for column, _, _, _ in FIELDS] + GUEST_COLUMNS
+
+
+def iter_records(stream, fmt: str):
+    """Yield (line, record, error) from a text stream, one record at a time; record is None on a parse error."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, "more values than header columns"
+                continue
+            yield reader.line_num, record, None
+    elif fmt == "ndjson":
+        for line, raw in enumerate(stream, 1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError as e:
+                yield line, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line, None, "expected a JSON object"
+                continue
+            yield line, record, None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def validate_record(record: dict, room_type_ids) -> tuple:
+    """Return (row, errors): the staging row for a valid record, or None and the reasons it was rejected."""
+    row, errors = {}, []
+    for column, field, parse, required in FIELDS:
+        value = record.get(field)
+        if _blank(value):
+            if required:
+                errors.append(f"{field} is required")
+            row[column] = None
+            continue
+        try:
+            row[column] = parse(value)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{field}: {e}" if str(e) else f"{field} is invalid")
+
+    if row.get("room_type_id") and row["room_type_id"] not in room_type_ids:
+        errors.append(f"roomTypeId: unknown room type {row['room_type_id']}")
+    if row.get("check_in") and row.get("check_out") and row["check_out"] <= row["check_in"]:
+        errors.append("checkOut must be after checkIn")
+
+    details = record.get("guestDetails")
+    if details is not None and not isinstance(details, dict):
+        errors.append("guestDetails must be an object")
+        details = None
+    if errors:
+        return None, errors
+
+    details = dict(details or {})
+    phone = details.get("phoneNumber") or record.get("guestPhone") or None
+    email = details.get("email") or record.get("guestEmail") or None
+    details.setdefault("name", row["guest_name"])
+    if phone:
+        details["phoneNumber"] = str(phone).strip()
+    if email:
+        details["email"] = str(email).strip()
+    details.pop("profileId", None)
+
+    row["guest_phone"] = details.get("phoneNumber")
+    row["guest_email"] = details.get("email")
+    row["phone_e164"] = normalize_phone(row["guest_phone"]) if row["guest_phone"] else None
+    row["guest_details"] = json.dumps(details)
+    if row["timestamp"] is None:
+        # Booked-at time is rarely exported; the check-in date is the best stand-in
+        check_in = datetime.strptime(row["check_in"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        row["timestamp"] = int(check_in.timestamp() * 1000)
+    return row, []
+
+
+def _create_staging(conn):
+    pg = conn.dialect.name == "postgresql"
+    types = {"line": "INTEGER", "timestamp": "BIGINT", "amount": "DOUBLE PRECISION" if pg else "REAL",
+             "number_of_rooms": "INTEGER", "pax": "INTEGER", "extra_beds": "INTEGER",
+             "is_vip": "BOOLEAN", "is_settled": "BOOLEAN", "guest_details": "JSON" if pg else "TEXT"}
+    columns = ", ".join(f"{c} {types.get(c, 'VARCHAR')}" for c in STAGING_COLUMNS)
+    conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    # ON COMMIT DELETE ROWS empties it after every chunk without a separate statement
+    conn.execute(text(f"CREATE TEMPORARY TABLE {STAGING_TABLE} ({columns})"
+                      + (" ON COMMIT DELETE ROWS" if pg else "")))
+
+
+def _stage(conn, rows: list):
+    if conn.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # Unquoted empty fields are NULL in COPY's CSV format
+            writer.writerow([row[c] for c in STAGING_COLUMNS])
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+    else:
+        conn.execute(
+            text(f"INSERT INTO {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) "
+                 f"VALUES ({', '.join(':' + c for c in STAGING_COLUMNS)})"),
+            rows
+        )
+
+
+def _merge(conn) -> tuple:
+    """Upsert the staged guests, insert the staged bookings; returns (inserted, [(line, id), ...] already present)."""
+    pg = conn.dialect.name == "postgresql"
+    latest = "GREATEST" if pg else "MAX"
+    conn.execute(text(f"""
+        INSERT INTO guest_profiles (name, phone_number, phone_e164, email, last_check_in)
+        SELECT guest_name, MAX(guest_phone), phone_e164, MAX(guest_email), MAX(check_in)
+        FROM {STAGING_TABLE}
+        WHERE phone_e164 IS NOT NULL
+        GROUP BY phone_e164, guest_name
+        ON CONFLICT (phone_e164, name) DO UPDATE SET
+            email = COALESCE(NULLIF(guest_profiles.email, ''), excluded.email),
+            last_check_in = {latest}(COALESCE(guest_profiles.last_check_in, ''), excluded.last_check_in)
+    """))
+
+    existing = conn.execute(text(f"""
+        SELECT s.line, s.id FROM {STAGING_TABLE} s JOIN bookings b ON b.id = s.id ORDER BY s.line
+    """)).fetchall()
+
+    booking_columns = [column for column, _, _, _ in FIELDS]
+    if pg:
+        empty_list, empty_object = "CAST('[]' AS JSON)", "CAST('{}' AS JSON)"
+        details = "(s.guest_details::jsonb || jsonb_build_object('profileId', gp.id))::json"
+    else:
+        empty_list, empty_object = "'[]'", "'{}'"
+        details = "json_set(s.guest_details, '$.profileId', gp.id)"
+    inserted = conn.execute(text(f"""
+        INSERT INTO bookings ({', '.join(booking_columns)}, guest_details, guest_profile_id,
+                              folio, payments, accessory_guests, channel_sync, is_auto_generated)
+        SELECT {', '.join(f"COALESCE(s.{c}, {DEFAULTS[c]})" if c in DEFAULTS else f"s.{c}" for c in booking_columns)},
+               CASE WHEN gp.id IS NULL THEN s.guest_details ELSE {details} END,
+               gp.id, {empty_list}, {empty_list}, {empty_list}, {empty_object}, FALSE
+        FROM {STAGING_TABLE} s
+        LEFT JOIN guest_profiles gp ON gp.phone_e164 = s.phone_e164 AND gp.name = s.guest_name
+        WHERE true
+        ON CONFLICT (id) DO NOTHING
+    """)).rowcount
+
+    if not pg:
+        conn.execute(text(f"DELETE FROM {STAGING_TABLE}"))
+    return inserted, existing
+
+
+def import_bookings(engine, stream, fmt: str = "ndjson", errors=None, progress=None,
+                    chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Import bookings from a text `stream` in `fmt` ('ndjson' or 'csv'). Rejected records are
+    written to `errors` (a text file object) as NDJSON; `progress(stats)` is called after
+    every chunk. Returns the final stats.
+    """
+    stats = {"read": 0, "imported": 0, "rejected": 0, "duplicates": 0, "chunks": 0}
+
+    def report(line, reasons, record=None):
+        if errors is not None:
+            errors.write(json.dumps({"line": line, "errors": reasons, "record": record}, default=str) + "\n")
+
+    def reject(line, reasons, record=None):
+        stats["rejected"] += 1
+        report(line, reasons, record)
+
+    with engine.connect() as conn:
+        with conn.begin():
+            room_type_ids = set(conn.execute(text("SELECT id FROM room_types")).scalars().all())
+            _create_staging(conn)
+
+        def flush(rows):
+            with conn.begin():
+                _stage(conn, rows)
+                inserted, existing = _merge(conn)
+            stats["imported"] += inserted
+            stats["duplicates"] += len(rows) - inserted
+            for line, booking_id in existing:
+                report(line, [f"booking {booking_id} already exists, skipped"])
+            stats["chunks"] += 1
+            if inserted:
+                frontdesk_board.invalidate()
+            if progress:
+                progress(dict(stats))
+
+        rows = []
+        try:
+            for line, record, error in iter_records(stream, fmt):
+                stats["read"] += 1
+                if error:
+                    reject(line, [error])
+                    continue
+                row, reasons = validate_record(record, room_type_ids)
+                if reasons:
+                    reject(line, reasons, record)
+                    continue
+                row["line"] = line
+                rows.append(row)
+                if len(rows) >= chunk_rows:
+                    flush(rows)
+                    rows = []
+            if rows:
+                flush(rows)
+        finally:
+            with conn.begin():
+                conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    return stats
+
+
+def detect_format(filename: str, fmt: str = None) -> str:
+    if fmt:
+        fmt = fmt.lower()
+    elif filename and filename.lower().endswith(".csv"):
+        fmt = "csv"
+    else:
+        fmt = "ndjson"
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError("format must be 'ndjson' or 'csv'")
+    return fmt
+
+
+class BookingImportJobs:
+    """Imports uploaded through the API, each on a thread of its own, polled by job id."""
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._dir = None
+
+    def _workdir(self):
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="booking-import-")
+        return self._dir
+
+    def submit(self, engine, fileobj, filename: str, fmt: str) -> dict:
+        """Copy the upload to a file of our own (the request's copy is closed once it returns) and start the import."""
+        job_id = f"import-{str(uuid.uuid4())[:8]}"
+        with self._lock:
+            workdir = self._workdir()
+        source_path = os.path.join(workdir, f"{job_id}.{fmt}")
+        with open(source_path, "wb") as dst:
+            shutil.copyfileobj(fileobj, dst)
+
+        job = {
+            "jobId": job_id,
+            "filename": filename,
+            "format": fmt,
+            "status": "queued",
+            "read": 0,
+            "imported": 0,
+            "rejected": 0,
+            "duplicates": 0,
+            "chunks": 0,
+            "error": None,
+            "createdAt": datetime.now().isoformat(),
+            "finishedAt": None,
+            "_source": source_path,
+            "_errors": os.path.join(workdir, f"{job_id}.errors.ndjson"),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                _, old = self._jobs.popitem(last=False)
+                self._remove_files(old)
+
+        threading.Thread(target=self._run, args=(engine, job), name=job_id, daemon=True).start()
+        return self._public(job)
+
+    def _run(self, engine, job: dict):
+        job["status"] = "running"
+        try:
+            with open(job["_source"], encoding="utf-8-sig", newline="") as source, \
+                    open(job["_errors"], "w", encoding="utf-8") as errors:
+                stats = import_bookings(engine, source, job["format"], errors=errors, progress=job.update)
+            job.update(status="done", finishedAt=datetime.now().isoformat(), **stats)
+        except Exception as e:
+            print(f"Booking import {job['jobId']} failed: {e}")
+            job.update(status="failed", error=str(e), finishedAt=datetime.now().isoformat())
+        finally:
+            try:
+                os.remove(job["_source"])
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove_files(job: dict):
+        for key in ("_source", "_errors"):
+            try:
+                os.remove(job[key])
+            except OSError:
+                pass
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def error_file(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["_errors"] if job else None
+
+
+booking_imports = BookingImportJobs()
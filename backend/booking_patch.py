@@ -0,0 +1,80 @@
+"""
+Partial booking updates: JSON Merge Patch (RFC 7386) and column mapping.
+
+PUT /api/bookings/{id} rewrites every column and re-syncs the guest profile.
+PATCH applies a merge patch to the booking's API representation, validates the
+result as a whole `Booking`, then writes back only the columns for the fields
+the patch named. Side effects follow the fields:
+
+    - guestDetails        re-syncs the guest profile;
+    - TAX_FIELDS          recompute the cached GST breakdown;
+    - status / folio      raise the same notifications as PUT.
+
+Fields that the server owns (READ_ONLY_FIELDS) cannot be patched.
+"""
+
+# Booking field -> bookings column, for every field a patch may touch
+COLUMNS = {
+    "roomTypeId": "room_type_id",
+    "roomNumber": "room_number",
+    "guestName": "guest_name",
+    "source": "source",
+    "status": "status",
+    "checkIn": "check_in",
+    "checkOut": "check_out",
+    "amount": "amount",
+    "reservationId": "reservation_id",
+    "channelSync": "channel_sync",
+    "rejectionReason": "rejection_reason",
+    "guestDetails": "guest_details",
+    "numberOfRooms": "number_of_rooms",
+    "pax": "pax",
+    "accessoryGuests": "accessory_guests",
+    "extraBeds": "extra_beds",
+    "specialRequests": "special_requests",
+    "isVIP": "is_vip",
+    "isSettled": "is_settled",
+    "folio": "folio",
+    "payments": "payments",
+    "invoiceNumber": "invoice_number",
+}
+READ_ONLY_FIELDS = {"id", "timestamp", "invoicePath", "receiptPath", "isAutoGenerated", "externalReferenceId",
+                    "taxBreakdown", "guestProfileId"}
+# Inputs of backend/tax_engine.compute_tax_breakdown
+TAX_FIELDS = {"checkIn", "checkOut", "amount", "roomNumber", "roomTypeId", "folio"}
+# Stored as [] / {} / False rather than NULL, as PUT does
+EMPTY_VALUES = {"channelSync": {}, "accessoryGuests": [], "folio": [], "payments": [], "isVIP": False,
+                "isSettled": False}
+
+
+def apply_merge_patch(target, patch):
+    """RFC 7386: objects merge key by key, null removes a key, anything else replaces the target."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def column_value(field: str, value):
+    """The value to store for a validated Booking field (as produced by Booking.dict())."""
+    if value is None:
+        return EMPTY_VALUES.get(field)
+    return value
+
+
+def assign_fields(db_booking, booking, fields) -> list:
+    """Copy `fields` from the validated `booking` onto `db_booking`; returns the fields whose value changed."""
+    values = booking.dict(include=set(fields))
+    changed = []
+    for field in fields:
+        column = COLUMNS[field]
+        value = column_value(field, values.get(field))
+        if getattr(db_booking, column) != value:
+            setattr(db_booking, column, value)
+            changed.append(field)
+    return changed
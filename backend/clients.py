@@ -0,0 +1,128 @@
+"""
+Shared upstream clients (Gemini, Razorpay).
+
+Building a `genai.Client` or `razorpay.Client` per request threw away the HTTP
+connection pool and TLS session every time. The registry keeps one client per
+credential, so a key change in Property Settings simply produces a new entry
+(the stale one is dropped, not closed: a request on another thread may still be
+using it, and its pool is released once the last reference goes), and guards each upstream with a bounded
+semaphore so request bursts queue instead of hammering the provider.
+
+Tunables (environment):
+    GEMINI_TIMEOUT_SECONDS       per-call timeout for Gemini (default 60)
+    GEMINI_MAX_CONCURRENCY       concurrent Gemini calls (default 4)
+    RAZORPAY_TIMEOUT_SECONDS     per-call timeout for Razorpay (default 15)
+    RAZORPAY_MAX_CONCURRENCY     concurrent Razorpay calls (default 8)
+    UPSTREAM_QUEUE_TIMEOUT       seconds a request waits for a free slot (default 30)
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+
+class ClientRegistry:
+    def __init__(self):
+        self.gemini_timeout = _env_float("GEMINI_TIMEOUT_SECONDS", 60)
+        self.razorpay_timeout = _env_float("RAZORPAY_TIMEOUT_SECONDS", 15)
+        self.queue_timeout = _env_float("UPSTREAM_QUEUE_TIMEOUT", 30)
+        self._limits = {
+            "gemini": threading.BoundedSemaphore(int(_env_float("GEMINI_MAX_CONCURRENCY", 4))),
+            "razorpay": threading.BoundedSemaphore(int(_env_float("RAZORPAY_MAX_CONCURRENCY", 8))),
+        }
+        self._gemini = {}    # api_key -> genai.Client
+        self._razorpay = {}  # (key_id, key_secret) -> razorpay.Client
+        self._lock = threading.Lock()
+
+    # --- Gemini ---
+    def gemini(self, api_key: str):
+        """Return the shared Gemini client for `api_key`, replacing any client built for an older key."""
+        with self._lock:
+            client = self._gemini.get(api_key)
+            if client is not None:
+                return client
+
+            from google import genai
+            from google.genai import types
+
+            client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(timeout=int(self.gemini_timeout * 1000))
+            )
+            # Only one key is live at a time; in-flight callers keep their own reference
+            self._gemini.clear()
+            self._gemini[api_key] = client
+            return client
+
+    # --- Razorpay ---
+    def razorpay(self, key_id: str, key_secret: str):
+        """Return the shared Razorpay client for this key pair (keep-alive requests session)."""
+        cred = (key_id, key_secret)
+        with self._lock:
+            client = self._razorpay.get(cred)
+            if client is not None:
+                return client
+
+            import razorpay
+            from requests.adapters import HTTPAdapter
+
+            client = razorpay.Client(auth=cred)
+            pool_size = int(_env_float("RAZORPAY_MAX_CONCURRENCY", 8))
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            client.session.mount("https://", adapter)
+
+            self._razorpay.clear()
+            self._razorpay[cred] = client
+            return client
+
+    # --- Concurrency limits ---
+    @contextmanager
+    def slot(self, upstream: str):
+        """Hold one of the upstream's concurrency slots; waits up to UPSTREAM_QUEUE_TIMEOUT."""
+        sem = self._limits[upstream]
+        if not sem.acquire(timeout=self.queue_timeout):
+            raise HTTPException(status_code=503, detail=f"{upstream} is busy, please retry shortly")
+        try:
+            yield
+        finally:
+            sem.release()
+
+    # --- Lifecycle ---
+    def invalidate(self):
+        """
+        Forget every cached client, e.g. after credentials change in Property Settings.
+        They aren't closed here since requests on other threads may still hold them.
+        """
+        with self._lock:
+            self._gemini.clear()
+            self._razorpay.clear()
+
+    def close(self):
+        """Close every cached client at shutdown, once no requests are in flight."""
+        with self._lock:
+            clients = list(self._gemini.values()) + list(self._razorpay.values())
+            self._gemini.clear()
+            self._razorpay.clear()
+        for client in clients:
+            self._close(client)
+
+    @staticmethod
+    def _close(client):
+        try:
+            if hasattr(client, "close"):
+                client.close()
+            elif hasattr(client, "session"):
+                client.session.close()
+        except Exception as e:
+            print(f"Error closing upstream client: {e}")
+
+
+client_registry = ClientRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, JSON, ForeignKey, BigInteger
+from sqlalchemy import Column, String, Integer, Float, Boolean, JSON, ForeignKey, BigInteger, Text, DateTime, Index, DDL, event, text
 from sqlalchemy.orm import relationship
 from backend.database import Base
 
@@ -22,6 +22,7 @@ class PropertySettingsDB(Base):
     check_out_time = Column(String, default="11:00")
     gemini_api_key = Column(String, nullable=True)
     loyalty_tiers = Column(JSON, default=[])
+    room_gst_slabs = Column(JSON, default=[])
 
 class HotelDB(Base):
     __tablename__ = "hotels"
@@ -77,6 +78,23 @@ class BookingDB(Base):
     receipt_path = Column(String, nullable=True)
     is_auto_generated = Column(Boolean, default=False)
     external_reference_id = Column(String, nullable=True, index=True)
+    tax_breakdown = Column(JSON, nullable=True)  # cached backend.tax_engine result
+    guest_profile_id = Column(Integer, ForeignKey("guest_profiles.id"), nullable=True)
+    # Bumped on every ORM update and checked in its WHERE clause; exposed as the booking's ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    __table_args__ = (
+        # A guest's stays, newest first (history, loyalty, stay counts)
+        Index("idx_bookings_guest_profile_checkin", "guest_profile_id", check_in.desc()),
+        # Night audit / front desk passes: a status and a date range or day
+        Index("idx_bookings_status_checkin", "status", "check_in"),
+        Index("idx_bookings_status_checkout", "status", "check_out"),
+        # Front desk board: bookings still waiting for a room
+        Index("idx_bookings_unassigned", "check_out",
+              postgresql_where=text("room_number IS NULL OR room_number = 'Unassigned'"),
+              sqlite_where=text("room_number IS NULL OR room_number = 'Unassigned'")),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
 class OTAConnectionDB(Base):
     __tablename__ = "ota_connections"
@@ -142,6 +160,24 @@ class GuestProfileDB(Base):
     signature = Column(String)
     preferences = Column(String)
     last_check_in = Column(String)
+    # E.164 form of phone_number, what lookups match on (backend/guest_search.py)
+    phone_e164 = Column(String, index=True)
+    
+    __table_args__ = (
+        # Upsert key for backend/guest_profile_sync.py
+        Index("uq_guest_profiles_phone_name", "phone_e164", "name", unique=True),
+        # Substring / fuzzy name search (pg_trgm); Postgres only
+        Index("idx_guest_profiles_name_trgm", "name", postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        # Typeahead prefix scans (LIKE 'abc%' needs pattern ops under a non-C collation)
+        Index("idx_guest_profiles_name_prefix", text("lower(name) text_pattern_ops")).ddl_if(dialect="postgresql"),
+        Index("idx_guest_profiles_phone_prefix", text("phone_e164 text_pattern_ops")).ddl_if(dialect="postgresql"),
+    )
+
+event.listen(
+    GuestProfileDB.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
 
 class NotificationDB(Base):
     __tablename__ = "notifications"
@@ -154,9 +190,146 @@ class NotificationDB(Base):
     priority = Column(String, default="normal")  # 'low', 'normal', 'high', 'urgent'
     is_read = Column(Boolean, default=False)
     is_dismissed = Column(Boolean, default=False)
-    created_at = Column(String, nullable=False)  # ISO timestamp
-    read_at = Column(String, nullable=True)
+    # Partition key on Postgres (monthly ranges, see migrate_db.py), hence part of the primary key
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    read_at = Column(DateTime(timezone=True), nullable=True)
     booking_id = Column(String, ForeignKey("bookings.id"), nullable=True)
     room_number = Column(String, nullable=True)
     metadata = Column(JSON, default={})  # Additional context data
+    
+    __table_args__ = (
+        # The feed only ever lists undismissed notifications, newest first
+        Index("idx_notifications_active_created", "created_at",
+              postgresql_where=text("NOT is_dismissed"), sqlite_where=text("NOT is_dismissed")),
+        # Feed pages (backend/notification_feed.py): one ordered keyset range per branch
+        Index("idx_notifications_feed", "is_dismissed", "is_read", created_at.desc(), id.desc(),
+              postgresql_include=["type", "priority"]),
+        Index("idx_notifications_priority", "is_dismissed", "priority", created_at.desc(), id.desc(),
+              postgresql_include=["is_read", "type"]),
+        Index("idx_notifications_booking", "booking_id", created_at.desc(), id.desc()),
+        Index("idx_notifications_room", "room_number", created_at.desc(), id.desc()),
+    )
+
+class NotificationArchiveDB(Base):
+    """Read/dismissed notifications moved out by backend/notification_retention.py"""
+    __tablename__ = "notifications_archive"
+    
+    id = Column(String, primary_key=True)
+    type = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    message = Column(String, nullable=False)
+    priority = Column(String, default="normal")
+    is_read = Column(Boolean, default=False)
+    is_dismissed = Column(Boolean, default=False)
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+    booking_id = Column(String, nullable=True, index=True)
+    room_number = Column(String, nullable=True)
+    metadata = Column(JSON, default={})
+    archived_at = Column(DateTime(timezone=True), nullable=False)
+
+class NotificationCounterDB(Base):
+    __tablename__ = "notification_counters"
+    
+    name = Column(String, primary_key=True)  # 'unread' (see backend/notification_counter.py)
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(String, nullable=True)
+
+
+class OCRCacheDB(Base):
+    __tablename__ = "ocr_cache"
+    
+    digest = Column(String, primary_key=True)  # sha256(type + image bytes)
+    ocr_type = Column(String, nullable=False)  # 'id_front', 'id_back', 'form', ...
+    result = Column(Text, nullable=False)  # Extracted JSON text as returned to the client
+    created_at = Column(String, nullable=False)  # ISO timestamp
+    hit_count = Column(Integer, default=0)
+
+class InvoiceSequenceDB(Base):
+    __tablename__ = "invoice_sequences"
+    
+    financial_year = Column(String, primary_key=True)  # '2026' or '2026-27' (see backend/invoice_sequence.py)
+    last_value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(String, nullable=True)
+
+class InvoiceVoidDB(Base):
+    __tablename__ = "invoice_voids"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    invoice_number = Column(String, nullable=False, index=True)
+    reason = Column(String, nullable=True)
+    voided_at = Column(String, nullable=False)
+
+class ServiceOrderDB(Base):
+    """Guest menu / laundry orders and their department queue (see backend/service_orders.py)"""
+    __tablename__ = "service_orders"
+    
+    id = Column(String, primary_key=True)
+    booking_id = Column(String, ForeignKey("bookings.id"), nullable=False, index=True)
+    room_number = Column(String, nullable=True)
+    guest_name = Column(String, nullable=True)
+    department = Column(String, nullable=False)  # 'F&B', 'Laundry'
+    status = Column(String, nullable=False)  # 'Received', 'InProgress', 'Ready', 'Delivered', 'Cancelled'
+    items = Column(JSON, default=[])  # [{name, price, quantity, instructions}]
+    amount = Column(Float, nullable=False)
+    instructions = Column(String, nullable=True)
+    folio_item_id = Column(String, nullable=False)  # The charge appended to the booking's folio
+    created_at = Column(String, nullable=False)  # ISO timestamp (UTC)
+    updated_at = Column(String, nullable=False)
+    # Concurrent status changes from two staff screens: the second one fails instead of overwriting
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    __table_args__ = (
+        # A department's queue, oldest first
+        Index("idx_service_orders_queue", "department", "status", "created_at"),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
+class NightAuditDB(Base):
+    """One row per closed business date (see backend/night_audit.py)"""
+    __tablename__ = "night_audits"
+    
+    business_date = Column(String, primary_key=True)  # YYYY-MM-DD
+    started_at = Column(String, nullable=True)
+    completed_at = Column(String, nullable=True)
+    report = Column(JSON, nullable=True)
+
+class RoomRevenuePostingDB(Base):
+    """Nightly room revenue recognised by the night audit (a reporting ledger, not folio charges)"""
+    __tablename__ = "room_revenue_postings"
+    
+    booking_id = Column(String, ForeignKey("bookings.id"), primary_key=True)
+    business_date = Column(String, primary_key=True, index=True)
+    room_type_id = Column(String, nullable=True)
+    room_number = Column(String, nullable=True)
+    source = Column(String, nullable=True)
+    amount = Column(Float, nullable=False)
+    posted_at = Column(String, nullable=False)
+
+class DailyStatsDB(Base):
+    __tablename__ = "daily_stats"
+    
+    business_date = Column(String, primary_key=True)
+    rooms_available = Column(Integer, nullable=False, default=0)
+    rooms_occupied = Column(Integer, nullable=False, default=0)
+    occupancy = Column(Float, nullable=False, default=0)  # percent
+    room_revenue = Column(Float, nullable=False, default=0)
+    adr = Column(Float, nullable=False, default=0)
+    revpar = Column(Float, nullable=False, default=0)
+    arrivals = Column(Integer, nullable=False, default=0)
+    departures = Column(Integer, nullable=False, default=0)
+    no_shows = Column(Integer, nullable=False, default=0)
+    overstays = Column(Integer, nullable=False, default=0)
+    revenue_by_source = Column(JSON, default={})
+    computed_at = Column(String, nullable=True)
+
+class OccupancySnapshotDB(Base):
+    __tablename__ = "occupancy_snapshots"
+    
+    business_date = Column(String, primary_key=True)
+    room_type_id = Column(String, primary_key=True)
+    room_type_name = Column(String, nullable=True)
+    rooms_total = Column(Integer, nullable=False, default=0)
+    rooms_occupied = Column(Integer, nullable=False, default=0)
+    room_revenue = Column(Float, nullable=False, default=0)
@@ -0,0 +1,147 @@
+"""
+Document store for generated invoices and receipts.
+
+PDFs are rendered in memory and handed to a store instead of being written
+straight into Billing/ and served by StaticFiles. Two backends:
+
+    local   files under BILLING_DIR (default Billing/, /tmp/Billing on Vercel)
+    s3      any S3-compatible bucket (AWS, R2, MinIO) via boto3, with a small
+            in-process LRU so repeat downloads don't go back to the bucket
+
+Selected with DOCUMENT_STORE=local|s3. The s3 backend reads DOCUMENT_BUCKET,
+DOCUMENT_PREFIX (optional) and DOCUMENT_STORE_URL (optional custom endpoint).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+BILLING_DIR = os.getenv("BILLING_DIR") or ("/tmp/Billing" if os.getenv("VERCEL") else "Billing")
+
+
+def invoice_key(invoice_num: str) -> str:
+    return f"Invoice_{invoice_num}.pdf"
+
+
+def receipt_key(invoice_num: str) -> str:
+    return f"Receipt_{invoice_num}.pdf"
+
+
+def content_etag(data: bytes) -> str:
+    return '"' + hashlib.md5(data).hexdigest() + '"'
+
+
+class DocumentStore:
+    """Interface: keys are flat file names such as 'Invoice_INV-2026-0001.pdf'."""
+
+    def put(self, key: str, data: bytes, content_type: str = "application/pdf") -> str:
+        """Store `data` under `key` and return its ETag."""
+        raise NotImplementedError
+
+    def get(self, key: str):
+        """Return (data, etag) or None if the document is not stored."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+class LocalDocumentStore(DocumentStore):
+    def __init__(self, root: str = BILLING_DIR):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        # Keys are plain file names; refuse anything that could escape the root
+        name = os.path.basename(key)
+        if not name or name != key:
+            raise ValueError(f"Invalid document key: {key}")
+        return os.path.join(self.root, name)
+
+    def put(self, key, data, content_type="application/pdf"):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return content_etag(data)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        return data, content_etag(data)
+
+    def exists(self, key):
+        try:
+            return os.path.isfile(self._path(key))
+        except ValueError:
+            return False
+
+
+class ObjectDocumentStore(DocumentStore):
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None, cache_entries: int = 64):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix else ""
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def put(self, key, data, content_type="application/pdf"):
+        etag = content_etag(data)
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.prefix + key, Body=data,
+            ContentType=content_type, CacheControl="private, max-age=3600"
+        )
+        self._remember(key, (data, etag))
+        return etag
+
+    def get(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        from botocore.exceptions import ClientError
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        data = obj["Body"].read()
+        value = (data, content_etag(data))
+        self._remember(key, value)
+        return value
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv("DOCUMENT_STORE", "local").lower()
+            if backend == "s3":
+                _store = ObjectDocumentStore(
+                    bucket=os.environ["DOCUMENT_BUCKET"],
+                    prefix=os.getenv("DOCUMENT_PREFIX", ""),
+                    endpoint_url=os.getenv("DOCUMENT_STORE_URL")
+                )
+            else:
+                _store = LocalDocumentStore()
+        return _store
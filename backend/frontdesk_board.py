@@ -0,0 +1,292 @@
+"""
+Front desk "today board" (/api/frontdesk/today).
+
+The front desk used to download every booking and filter arrivals, departures
+and in-house guests in the browser. The board is computed on the server for one
+business date (backend/night_audit.current_business_date) from a single query
+whose branches each match an index on bookings:
+
+    status = 'CheckedIn'                                   -> (status, check_in)
+    status = 'Confirmed' AND check_in = :d                 -> (status, check_in)
+    unassigned room, not yet departed                      -> idx_bookings_unassigned
+
+and kept in an in-process cache per business date. Booking writes don't rebuild
+it: the session hook (`register`) records which bookings a commit touched, and
+the next read re-fetches just those rows by primary key and re-files them.
+Writers that bypass the ORM (night audit, historical import) and room type
+changes drop the cached boards instead. Boards are rebuilt from scratch once
+they are older than FRONTDESK_CACHE_SECONDS, which bounds how long a write made
+by another worker process can go unseen.
+
+Board shape:
+    {"businessDate", "arrivals", "departures", "inHouse", "unassigned",
+     "rooms": [{"roomNumber", "roomTypeId", "status", "occupant", "arrival"}],
+     "counts": {...}}
+
+Room status: 'occupied', 'departing' (occupant due out on or before the date),
+'arriving' (vacant with an assigned arrival) or 'vacant'.
+
+Tunables (environment):
+    FRONTDESK_CACHE_SECONDS   full rebuild interval per business date (default 60)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from sqlalchemy import event, text
+
+CACHE_SECONDS = float(os.getenv("FRONTDESK_CACHE_SECONDS", "60"))
+MAX_CACHED_DATES = 3
+TOUCHED_KEY = "frontdesk_touched"
+UNASSIGNED = "Unassigned"
+
+# Booking columns the board carries (a slim row, not the whole booking)
+ROW_COLUMNS = {
+    "id": "id",
+    "reservation_id": "reservationId",
+    "guest_name": "guestName",
+    "room_type_id": "roomTypeId",
+    "room_number": "roomNumber",
+    "status": "status",
+    "source": "source",
+    "check_in": "checkIn",
+    "check_out": "checkOut",
+    "pax": "pax",
+    "number_of_rooms": "numberOfRooms",
+    "is_vip": "isVIP",
+    "is_settled": "isSettled",
+    "is_auto_generated": "isAutoGenerated",
+}
+SELECT_ROWS = "SELECT " + ", ".join(f'{column} AS "{field}"' for column, field in ROW_COLUMNS.items()) + " FROM bookings"
+UNASSIGNED_SQL = "(room_number IS NULL OR room_number = 'Unassigned')"
+
+
+def is_unassigned(row: dict) -> bool:
+    return not row.get("roomNumber") or row["roomNumber"] == UNASSIGNED
+
+
+def on_board(row: dict, business_date: str) -> bool:
+    """Whether a booking belongs on the board for `business_date` (the Python twin of BOARD_QUERY)."""
+    status = row["status"]
+    if status == "CheckedIn":
+        return True
+    if status == "Confirmed" and row["checkIn"] == business_date:
+        return True
+    return status in ("Confirmed", "CheckedIn") and is_unassigned(row) and row["checkOut"] > business_date
+
+
+BOARD_QUERY = f"""
+    {SELECT_ROWS}
+    WHERE status = 'CheckedIn'
+       OR (status = 'Confirmed' AND check_in = :d)
+       OR ({UNASSIGNED_SQL} AND status IN ('Confirmed', 'CheckedIn') AND check_out > :d)
+"""
+
+
+def _by_guest(rows):
+    return sorted(rows, key=lambda r: ((r.get("guestName") or "").lower(), r["id"]))
+
+
+def build_board(business_date: str, rows: list, room_types: list) -> dict:
+    """Arrange the board's bookings (slim rows) and the room inventory into the API payload."""
+    arrivals = [r for r in rows if r["status"] == "Confirmed" and r["checkIn"] == business_date]
+    in_house = [r for r in rows if r["status"] == "CheckedIn"]
+    departures = [r for r in in_house if r["checkOut"] <= business_date]
+    unassigned = [r for r in rows if is_unassigned(r)]
+
+    occupant_by_room = {r["roomNumber"]: r for r in in_house if not is_unassigned(r)}
+    arrival_by_room = {r["roomNumber"]: r for r in arrivals if not is_unassigned(r)}
+    rooms, room_counts = [], {"occupied": 0, "departing": 0, "arriving": 0, "vacant": 0}
+    for rt in room_types:
+        for number in rt["roomNumbers"]:
+            occupant, arrival = occupant_by_room.get(number), arrival_by_room.get(number)
+            if occupant:
+                status = "departing" if occupant["checkOut"] <= business_date else "occupied"
+            else:
+                status = "arriving" if arrival else "vacant"
+            room_counts[status] += 1
+            rooms.append({
+                "roomNumber": number,
+                "roomTypeId": rt["id"],
+                "roomTypeName": rt["name"],
+                "status": status,
+                "occupant": occupant and {"id": occupant["id"], "guestName": occupant["guestName"],
+                                          "checkOut": occupant["checkOut"]},
+                "arrival": arrival and {"id": arrival["id"], "guestName": arrival["guestName"]},
+            })
+
+    return {
+        "businessDate": business_date,
+        "arrivals": _by_guest(arrivals),
+        "departures": _by_guest(departures),
+        "inHouse": sorted(in_house, key=lambda r: (r.get("roomNumber") or "", r["id"])),
+        "unassigned": sorted(unassigned, key=lambda r: (r["checkIn"], r["id"])),
+        "rooms": rooms,
+        "counts": {
+            "arrivals": len(arrivals),
+            "departures": len(departures),
+            "inHouse": len(in_house),
+            "unassigned": len(unassigned),
+            "rooms": room_counts,
+        },
+    }
+
+
+def _row(mapping) -> dict:
+    row = dict(mapping)
+    for flag in ("isVIP", "isSettled", "isAutoGenerated"):
+        row[flag] = bool(row.get(flag))
+    return row
+
+
+class _Entry:
+    def __init__(self, business_date: str, rows: dict, room_types: list):
+        self.business_date = business_date
+        self.rows = rows  # booking id -> slim row, only bookings on the board
+        self.room_types = room_types
+        self.built_at = time.monotonic()
+        self.pending = set()  # booking ids written since the rows were read
+        self.payload = None
+        self.etag = None
+
+    def render(self):
+        if self.payload is None:
+            board = build_board(self.business_date, list(self.rows.values()), self.room_types)
+            body = json.dumps(board, sort_keys=True, default=str)
+            self.etag = f'"fd-{hashlib.sha1(body.encode()).hexdigest()[:16]}"'
+            self.payload = board
+        return self.payload, self.etag
+
+
+class FrontDeskBoardCache:
+    def __init__(self, ttl: float = CACHE_SECONDS):
+        self.ttl = ttl
+        self._entries = {}
+        self._building = {}  # business date -> ids touched while its board is being read
+        self._generation = 0  # bumped by invalidate(); boards read before the bump aren't cached
+        self._lock = threading.Lock()
+
+    def get(self, engine, business_date: str):
+        """(board, etag) for `business_date`, from cache where possible."""
+        with self._lock:
+            entry = self._entries.get(business_date)
+            if entry is not None and time.monotonic() - entry.built_at >= self.ttl:
+                entry = None
+            pending = set(entry.pending) if entry is not None else None
+            if entry is not None:
+                entry.pending.clear()
+            generation = self._generation
+
+        if entry is None:
+            entry = self._build(engine, business_date)
+        elif pending:
+            self._apply(engine, entry, pending)
+
+        with self._lock:
+            # An invalidate() while we were reading means these rows may predate a bulk write;
+            # serve them to this request, which overlapped the write, but don't cache them
+            if self._generation == generation:
+                self._entries[business_date] = entry
+                while len(self._entries) > MAX_CACHED_DATES:
+                    oldest = min(self._entries.values(), key=lambda e: e.built_at)
+                    self._entries.pop(oldest.business_date)
+            return entry.render()
+
+    def _build(self, engine, business_date: str) -> "_Entry":
+        touched = set()
+        with self._lock:
+            self._building[business_date] = touched
+        try:
+            entry = self._read(engine, business_date)
+        finally:
+            with self._lock:
+                self._building.pop(business_date, None)
+        # Writes that committed while the rows were being read are re-read on the next request
+        entry.pending.update(touched)
+        return entry
+
+    def _read(self, engine, business_date: str) -> "_Entry":
+        with engine.connect() as conn:
+            rows = {r["id"]: r for r in (_row(m) for m in conn.execute(text(BOARD_QUERY), {"d": business_date}).mappings())}
+            room_types = [
+                {"id": rt.id, "name": rt.name, "roomNumbers": _json_list(rt.room_numbers)}
+                for rt in conn.execute(text("SELECT id, name, room_numbers FROM room_types ORDER BY id"))
+            ]
+        return _Entry(business_date, rows, room_types)
+
+    def _apply(self, engine, entry: "_Entry", booking_ids: set):
+        """Re-file just the bookings written since the board was built."""
+        from sqlalchemy import bindparam
+
+        query = text(f"{SELECT_ROWS} WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        with engine.connect() as conn:
+            fresh = {r["id"]: r for r in (_row(m) for m in conn.execute(query, {"ids": list(booking_ids)}).mappings())}
+        with self._lock:
+            for booking_id in booking_ids:
+                row = fresh.get(booking_id)
+                if row is not None and on_board(row, entry.business_date):
+                    entry.rows[booking_id] = row
+                else:
+                    entry.rows.pop(booking_id, None)
+            entry.payload = None
+
+    def touch(self, booking_ids):
+        """Bookings changed by a commit: re-read them on the next request."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.pending.update(booking_ids)
+            for touched in self._building.values():
+                touched.update(booking_ids)
+
+    def invalidate(self):
+        """Drop every cached board (bulk writes, room type changes), including any being built."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+def _json_list(value) -> list:
+    if isinstance(value, str):
+        value = json.loads(value or "[]")
+    return list(value or [])
+
+
+frontdesk_board = FrontDeskBoardCache()
+
+
+# ---- session hook ----
+
+def _collect(session, flush_context):
+    from backend.db_models import BookingDB, RoomTypeDB
+
+    touched = session.info.setdefault(TOUCHED_KEY, {"bookings": set(), "room_types": False})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, BookingDB):
+            touched["bookings"].add(obj.id)
+        elif isinstance(obj, RoomTypeDB):
+            touched["room_types"] = True
+
+
+def _after_commit(session):
+    touched = session.info.pop(TOUCHED_KEY, None)
+    if not touched:
+        return
+    if touched["room_types"]:
+        frontdesk_board.invalidate()
+    elif touched["bookings"]:
+        frontdesk_board.touch(touched["bookings"])
+
+
+def _after_rollback(session):
+    session.info.pop(TOUCHED_KEY, None)
+
+
+def register(session_factory):
+    """Hook booking writes into the board cache (done once for backend.database.SessionLocal)."""
+    if getattr(session_factory, "_frontdesk_board", False):
+        return
+    event.listen(session_factory, "after_flush", _collect)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
+    session_factory._frontdesk_board = True
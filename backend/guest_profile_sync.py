@@ -0,0 +1,112 @@
+"""
+Guest profile upsert, run from every booking write (create, bulk, update).
+
+A profile is identified by (phone_e164, name), a unique index. Syncing a batch
+of guests is one INSERT ... ON CONFLICT (phone_e164, name) DO UPDATE:
+
+    - a new guest is inserted with everything the booking carries;
+    - a returning guest keeps what is on file unless the booking has a non-empty
+      value for the field (COALESCE(NULLIF(new, ''), old)), and last_check_in
+      is always taken from the booking.
+
+A guest picked from the typeahead carries its profileId; that profile's own
+key is used, so edits to the name or phone on the booking do not fork it.
+Guests without a name or a phone that normalizes to E.164 are not synced.
+"""
+from sqlalchemy import func, null
+
+from backend.guest_search import normalize_phone
+
+# (guest_profiles column, GuestDetails field); name and phone are the key
+TEXT_FIELDS = [
+    ("id_type", "idType"), ("id_number", "idNumber"), ("address", "address"), ("dob", "dob"),
+    ("nationality", "nationality"), ("gender", "gender"), ("email", "email"),
+    ("passport_number", "passportNumber"), ("passport_place_issue", "passportPlaceIssue"),
+    ("passport_issue_date", "passportIssueDate"), ("passport_expiry", "passportExpiry"),
+    ("visa_number", "visaNumber"), ("visa_type", "visaType"), ("visa_place_issue", "visaPlaceIssue"),
+    ("visa_issue_date", "visaIssueDate"), ("visa_expiry", "visaExpiry"),
+    ("arrived_from", "arrivedFrom"), ("arrival_date_india", "arrivalDateIndia"),
+    ("arrival_port", "arrivalPort"), ("next_destination", "nextDestination"),
+    ("purpose_of_visit", "purposeOfVisit"), ("id_image", "idImage"), ("id_image_back", "idImageBack"),
+    ("visa_page", "visaPage"), ("father_or_husband_name", "fatherOrHusbandName"), ("city", "city"),
+    ("state", "state"), ("pin_code", "pinCode"), ("country", "country"),
+    ("arrival_time", "arrivalTime"), ("departure_time", "departureTime"), ("signature", "signature"),
+]
+# Replaced only when the booking has a non-empty value
+OPTIONAL_FIELDS = [("additional_docs", "additionalDocs"), ("form_pages", "formPages"), ("serial_number", "serialNumber")]
+
+
+def _profile_row(gd, check_in_date):
+    phone_e164 = normalize_phone(gd.phoneNumber)
+    if not phone_e164:
+        return None
+    row = {"name": gd.name, "phone_number": gd.phoneNumber, "phone_e164": phone_e164, "last_check_in": check_in_date}
+    for column, field in TEXT_FIELDS:
+        row[column] = getattr(gd, field)
+    for column, field in OPTIONAL_FIELDS:
+        row[column] = getattr(gd, field) or None
+    return row
+
+
+def _merge(into: dict, row: dict):
+    """Same guest twice in one batch (e.g. a group booking): later non-empty values win."""
+    for column, value in row.items():
+        if value not in (None, "", []):
+            into[column] = value
+    into["last_check_in"] = max(filter(None, (into.get("last_check_in"), row.get("last_check_in"))), default=None)
+
+
+def upsert_guest_profiles(session, guests: list) -> list:
+    """
+    Sync `guests` ([(GuestDetails, check_in_date), ...]) into guest_profiles with one
+    upsert. Returns the profile id for each guest, None where it was not synced.
+    """
+    from backend.db_models import GuestProfileDB
+
+    table = GuestProfileDB.__table__
+    rows = [_profile_row(gd, check_in) if gd and gd.name and gd.phoneNumber else None for gd, check_in in guests]
+
+    pinned = {gd.profileId for (gd, _), row in zip(guests, rows) if row and gd.profileId}
+    if pinned:
+        known = {
+            p.id: p for p in session.query(GuestProfileDB.id, GuestProfileDB.name, GuestProfileDB.phone_e164)
+            .filter(GuestProfileDB.id.in_(pinned))
+        }
+        for (gd, _), row in zip(guests, rows):
+            profile = known.get(gd.profileId) if row else None
+            if profile and profile.phone_e164:
+                row["name"], row["phone_e164"] = profile.name, profile.phone_e164
+
+    batch = {}
+    for row in rows:
+        if row is None:
+            continue
+        key = (row["phone_e164"], row["name"])
+        if key in batch:
+            _merge(batch[key], row)
+        else:
+            batch[key] = dict(row)
+    if not batch:
+        return [None] * len(guests)
+
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    values = [
+        {c: (null() if v is None and c in dict(OPTIONAL_FIELDS) else v) for c, v in row.items()}
+        for row in batch.values()
+    ]
+    stmt = insert(table).values(values)
+    current, new = table.c, stmt.excluded
+    update = {column: func.coalesce(func.nullif(new[column], ""), current[column]) for column, _ in TEXT_FIELDS}
+    update.update({column: func.coalesce(new[column], current[column]) for column, _ in OPTIONAL_FIELDS})
+    update["last_check_in"] = new.last_check_in
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.phone_e164, table.c.name], set_=update)
+
+    ids = {
+        (r.phone_e164, r.name): r.id
+        for r in session.execute(stmt.returning(table.c.id, table.c.phone_e164, table.c.name))
+    }
+    return [ids.get((row["phone_e164"], row["name"])) if row else None for row in rows]
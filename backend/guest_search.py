@@ -0,0 +1,107 @@
+"""
+Guest profile lookup: normalized phone numbers and ranked name search.
+
+Phone numbers are stored as typed ("+91 98765 43210", "098765-43210", ...) and
+also in E.164 form in `guest_profiles.phone_e164`, which is what lookups and
+profile matching compare. Numbers without a country code are read as
+GUEST_PHONE_COUNTRY_CODE (default 91).
+
+Name search on Postgres uses the pg_trgm GIN index on `guest_profiles.name`:
+substring (ILIKE) and typo-tolerant (`%`) matches, best similarity first.
+Elsewhere (local SQLite) it falls back to ILIKE with prefix matches first.
+
+Typeahead (/api/guest/suggest) only does prefix matches, which the
+text_pattern_ops indexes on lower(name) and phone_e164 answer as index range
+scans, and returns a few small rows instead of whole profiles.
+"""
+import os
+import re
+
+from sqlalchemy import case, func, or_
+
+DEFAULT_COUNTRY_CODE = os.getenv("GUEST_PHONE_COUNTRY_CODE", "91")
+NATIONAL_NUMBER_LENGTH = 10
+LOOKUP_LIMIT = 20
+MAX_LOOKUP_LIMIT = 50
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 10
+PHONE_QUERY = re.compile(r"^\+?[\d\s()-]+$")
+
+
+def normalize_phone(phone: str, country_code: str = DEFAULT_COUNTRY_CODE):
+    """Return `phone` in E.164 ("+919876543210"), or None if it has too few digits to be a number."""
+    if not phone:
+        return None
+    phone = phone.strip()
+    digits = re.sub(r"\D", "", phone)
+    if phone.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]  # International dialing prefix
+    elif len(digits) == NATIONAL_NUMBER_LENGTH + 1 and digits.startswith("0"):
+        digits = country_code + digits[1:]  # National trunk prefix
+    elif len(digits) == NATIONAL_NUMBER_LENGTH:
+        digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_profiles(query, model, name: str = None, phone: str = None, dialect: str = "postgresql",
+                    limit: int = LOOKUP_LIMIT):
+    """Filter and rank a GuestProfileDB query for lookup; returns the capped query."""
+    order = []
+    if phone:
+        e164 = normalize_phone(phone)
+        query = query.filter(model.phone_e164 == e164 if e164 else model.phone_number == phone)
+    if name:
+        name = name.strip()
+        pattern = f"%{_escape_like(name)}%"
+        if dialect == "postgresql":
+            query = query.filter(or_(model.name.ilike(pattern, escape="\\"), model.name.op("%")(name)))
+            order.append(func.similarity(model.name, name).desc())
+        else:
+            query = query.filter(model.name.ilike(pattern, escape="\\"))
+            prefix = f"{_escape_like(name)}%"
+            order.append(case((model.name.ilike(prefix, escape="\\"), 0), else_=1))
+    order.append(model.last_check_in.desc())
+    return query.order_by(*order).limit(max(1, min(limit, MAX_LOOKUP_LIMIT)))
+
+
+def phone_prefix(partial: str, country_code: str = DEFAULT_COUNTRY_CODE):
+    """E.164 prefix for a partly typed number: "98765" -> "+9198765", "+44 20" -> "+4420"."""
+    digits = re.sub(r"\D", "", partial)
+    if not digits:
+        return None
+    if partial.strip().startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if digits.startswith("0"):
+        digits = digits[1:]
+    if len(digits) > NATIONAL_NUMBER_LENGTH:
+        return f"+{digits}"  # Already has a country code
+    return f"+{country_code}{digits}"
+
+
+def mask_phone(phone: str) -> str:
+    """Last four digits only, behind a fixed-width mask (so the length gives nothing away)."""
+    digits = re.sub(r"\D", "", phone or "")
+    return "••••••" + digits[-4:] if len(digits) > 4 else "••••"
+
+
+def suggest_profiles(query, model, q: str, limit: int = SUGGEST_LIMIT):
+    """Prefix match on name or (if `q` looks like a number) phone; returns the capped query."""
+    q = (q or "").strip()
+    if PHONE_QUERY.match(q):
+        prefix = phone_prefix(q)
+        if not prefix:
+            return None
+        query = query.filter(model.phone_e164.like(f"{_escape_like(prefix)}%", escape="\\"))
+    else:
+        query = query.filter(func.lower(model.name).like(f"{_escape_like(q.lower())}%", escape="\\"))
+    return query.order_by(model.last_check_in.desc()).limit(max(1, min(limit, MAX_SUGGEST_LIMIT)))
@@ -3,6 +3,7 @@ Database initialization script.
 Run this once to create tables and seed initial data.
 
 Usage: python backend/init_db.py
+       python backend/init_db.py --import-bookings FILE [--format ndjson|csv] [--errors rejected.ndjson]
 """
 import sys
 import os
@@ -107,6 +108,37 @@ def seed_data():
     finally:
         db.close()
 
+def import_bookings(path, fmt=None, errors_path=None):
+    """Stream historical bookings from an NDJSON/CSV file (see backend/booking_import.py)."""
+    from backend.booking_import import import_bookings as _import, detect_format
+
+    fmt = detect_format(path, fmt)
+    errors_path = errors_path or f"{path}.errors.ndjson"
+    print(f"Importing bookings from {path} ({fmt})...")
+
+    def progress(stats):
+        print(f"  {stats['read']} read, {stats['imported']} imported, "
+              f"{stats['rejected']} rejected, {stats['duplicates']} already present", flush=True)
+
+    with open(path, encoding="utf-8-sig", newline="") as source, \
+            open(errors_path, "w", encoding="utf-8") as errors:
+        stats = _import(engine, source, fmt, errors=errors, progress=progress)
+    print(f"Import finished: {stats['imported']} imported, {stats['rejected']} rejected, "
+          f"{stats['duplicates']} already present")
+    if stats["rejected"] or stats["duplicates"]:
+        print(f"Rejected/skipped rows written to {errors_path}")
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--import-bookings", metavar="FILE", help="NDJSON or CSV bookings exported from another PMS")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Input format (default: from the file extension)")
+    parser.add_argument("--errors", metavar="FILE", help="Where to write rejected rows (default: FILE.errors.ndjson)")
+    args = parser.parse_args()
+
     create_tables()
-    seed_data()
+    if args.import_bookings:
+        import_bookings(args.import_bookings, args.format, args.errors)
+    else:
+        seed_data()
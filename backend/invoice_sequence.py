@@ -0,0 +1,128 @@
+"""
+Invoice number allocation.
+
+Checkout used to read `property_settings.last_invoice_number`, add one in Python
+and write it back with the rest of the checkout, so two concurrent checkouts
+could mint the same INV-YYYY-NNNN. Numbers now come from a counter row per
+financial year in `invoice_sequences`, bumped with a single
+`UPDATE ... RETURNING` in its own short transaction. The settings row is never
+locked, and the counter row lock lasts for one statement only.
+
+Year boundaries / reset:
+    Each financial year has its own row, so the first checkout of a new year
+    creates the row and numbering restarts at 0001 automatically. The row is
+    seeded from the highest INV-<year>-NNNN already on a booking, so switching
+    to this scheme mid-year never re-issues a number. The year starts in
+    January by default (matching the old INV-YYYY format); set
+    INVOICE_FY_START_MONTH=4 for an April-March year, labelled e.g. "2026-27".
+    To manually restart or move a year's numbering, use `set_last_invoice_number`.
+    Property Settings' `lastInvoiceNumber` can only move the counter forward,
+    since winding it back would re-issue numbers.
+
+Gaps:
+    A number is consumed as soon as it is allocated. If the checkout then fails,
+    call `void_invoice_number` so the gap is recorded in `invoice_voids` for
+    the auditors instead of vanishing silently.
+"""
+import os
+from datetime import datetime
+
+from sqlalchemy import text
+
+FY_START_MONTH = int(os.getenv("INVOICE_FY_START_MONTH", "1"))
+
+
+def financial_year(when: datetime = None) -> str:
+    when = when or datetime.now()
+    if FY_START_MONTH == 1:
+        return str(when.year)
+    start = when.year if when.month >= FY_START_MONTH else when.year - 1
+    return f"{start}-{str(start + 1)[-2:]}"
+
+
+def format_invoice_number(fy: str, serial: int) -> str:
+    return f"INV-{fy}-{serial:04d}"
+
+
+def _seed_value(conn, fy: str) -> int:
+    """Highest serial already issued for `fy` (0 if none)."""
+    prefix = f"INV-{fy}-"
+    rows = conn.execute(
+        text("SELECT invoice_number FROM bookings WHERE invoice_number LIKE :prefix"),
+        {"prefix": prefix + "%"}
+    ).fetchall()
+    highest = 0
+    for (number,) in rows:
+        try:
+            highest = max(highest, int(number[len(prefix):]))
+        except (TypeError, ValueError):
+            continue
+    return highest
+
+
+def _ensure_year(conn, fy: str):
+    exists = conn.execute(
+        text("SELECT 1 FROM invoice_sequences WHERE financial_year = :fy"), {"fy": fy}
+    ).first()
+    if not exists:
+        conn.execute(
+            text("""
+                INSERT INTO invoice_sequences (financial_year, last_value, updated_at)
+                VALUES (:fy, :seed, :now)
+                ON CONFLICT (financial_year) DO NOTHING
+            """),
+            {"fy": fy, "seed": _seed_value(conn, fy), "now": datetime.now().isoformat()}
+        )
+
+
+def allocate_invoice_number(engine, when: datetime = None):
+    """Atomically take the next number. Returns (invoice_number, financial_year, serial)."""
+    fy = financial_year(when)
+    with engine.begin() as conn:
+        _ensure_year(conn, fy)
+    with engine.begin() as conn:
+        serial = conn.execute(
+            text("""
+                UPDATE invoice_sequences
+                SET last_value = last_value + 1, updated_at = :now
+                WHERE financial_year = :fy
+                RETURNING last_value
+            """),
+            {"fy": fy, "now": datetime.now().isoformat()}
+        ).scalar()
+    return format_invoice_number(fy, serial), fy, serial
+
+
+def void_invoice_number(engine, invoice_number: str, reason: str):
+    """Record an allocated number that never made it onto a committed invoice."""
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO invoice_voids (invoice_number, reason, voided_at) VALUES (:num, :reason, :now)"),
+                {"num": invoice_number, "reason": reason[:500], "now": datetime.now().isoformat()}
+            )
+    except Exception as e:
+        print(f"Error recording voided invoice number {invoice_number}: {e}")
+
+
+def current_invoice_number(engine, when: datetime = None) -> int:
+    """Last serial issued in the current financial year."""
+    fy = financial_year(when)
+    with engine.connect() as conn:
+        value = conn.execute(
+            text("SELECT last_value FROM invoice_sequences WHERE financial_year = :fy"), {"fy": fy}
+        ).scalar()
+        if value is None:
+            return _seed_value(conn, fy)
+    return value
+
+
+def set_last_invoice_number(engine, value: int, when: datetime = None):
+    """Manually reset the current financial year's counter (the next invoice gets value + 1)."""
+    fy = financial_year(when)
+    with engine.begin() as conn:
+        _ensure_year(conn, fy)
+        conn.execute(
+            text("UPDATE invoice_sequences SET last_value = :value, updated_at = :now WHERE financial_year = :fy"),
+            {"fy": fy, "value": value, "now": datetime.now().isoformat()}
+        )
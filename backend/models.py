@@ -5,6 +5,10 @@ class LoyaltyTier(BaseModel):
     name: str
     minNights: int
 
+class GstSlab(BaseModel):
+    upTo: Optional[float] = None  # per-night tariff ceiling; None = no upper bound
+    rate: float
+
 class PropertySettings(BaseModel):
     name: str
     address: str
@@ -22,6 +26,7 @@ class PropertySettings(BaseModel):
     checkInTime: Optional[str] = "12:00"
     checkOutTime: Optional[str] = "11:00"
     loyaltyTiers: Optional[List[LoyaltyTier]] = []
+    roomGstSlabs: Optional[List[GstSlab]] = None  # None (field omitted) keeps the configured slabs
 
 class WeeklyRule(BaseModel):
     isActive: bool
@@ -123,6 +128,7 @@ class FolioItem(BaseModel):
     isPaid: Optional[bool] = False
     paymentMethod: Optional[str] = None
     paymentId: Optional[str] = None
+    isInclusive: Optional[bool] = False
 
 class Payment(BaseModel):
     id: str
@@ -162,6 +168,58 @@ class Booking(BaseModel):
     receiptPath: Optional[str] = None
     isAutoGenerated: Optional[bool] = False
     externalReferenceId: Optional[str] = None
+    taxBreakdown: Optional[Dict[str, Any]] = None
+    guestProfileId: Optional[int] = None
+    version: Optional[int] = None  # Optimistic concurrency token (also the ETag); send it back with PUT
+
+class BookingStatusUpdate(BaseModel):
+    status: Literal['Confirmed', 'CheckedIn', 'CheckedOut', 'Cancelled', 'Rejected']
+    rejectionReason: Optional[str] = None
+
+class RoomAssignment(BaseModel):
+    roomNumber: str
+    roomTypeId: Optional[str] = None  # Defaults to the booking's current room type
+
+class RoomAutoAssignRequest(BaseModel):
+    start: Optional[str] = None  # First arrival date (YYYY-MM-DD); defaults to the business day in progress
+    end: Optional[str] = None  # Exclusive; defaults to start + ROOM_ASSIGNMENT_WINDOW_DAYS
+    apply: bool = False  # False = dry run: return the plan without writing it
+
+class ServiceOrderItem(BaseModel):
+    name: str
+    price: float  # Unit price
+    quantity: int = 1
+    instructions: Optional[str] = None
+
+class ServiceOrderCreate(BaseModel):
+    id: Optional[str] = None  # Client-chosen id makes a retried submit idempotent
+    department: Literal['F&B', 'Laundry'] = 'F&B'
+    items: List[ServiceOrderItem]
+    instructions: Optional[str] = None
+
+class ServiceOrder(BaseModel):
+    id: str
+    number: str
+    bookingId: str
+    roomNumber: Optional[str] = None
+    guestName: Optional[str] = None
+    department: Literal['F&B', 'Laundry']
+    status: Literal['Received', 'InProgress', 'Ready', 'Delivered', 'Cancelled']
+    items: List[ServiceOrderItem]
+    amount: float
+    instructions: Optional[str] = None
+    folioItemId: str
+    createdAt: str
+    updatedAt: str
+
+class ServiceOrderStatusUpdate(BaseModel):
+    status: Literal['Received', 'InProgress', 'Ready', 'Delivered', 'Cancelled']
+
+class NightAuditRequest(BaseModel):
+    businessDate: Optional[str] = None  # YYYY-MM-DD; defaults to the last business day that has ended
+    force: bool = False  # Recompute a date that was already audited
+    allowOpen: bool = False  # Close the day in progress (or later); its pending arrivals become no-shows
+
 class RoomTransferRequest(BaseModel):
     bookingId: str
     newRoomTypeId: str
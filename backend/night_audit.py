@@ -0,0 +1,336 @@
+"""
+Night audit: closes a business date in one transaction.
+
+Without it no-shows stayed Confirmed (holding their rooms), overstays went
+unnoticed, room revenue only existed as the booking amount settled at checkout,
+and every report recomputed from raw bookings. `run_night_audit(session, date)`
+makes set-based passes over bookings for the business date D (the night of D
+to D+1):
+
+    1. no-shows: Confirmed bookings due on or before D (within the last
+       NIGHT_AUDIT_CATCHUP_DAYS days) become Cancelled with rejection reason
+       "No-show", which frees their rooms; one UPDATE, version bumped;
+    2. overstays: CheckedIn bookings whose check-out is on or before D are
+       listed in the report (checkout still happens at the desk);
+    3. room revenue: one room_revenue_postings line per booking in-house on
+       night D (amount / nights), one INSERT ... SELECT. In-house is read from
+       the stay dates, not just the current status, so a past date (forced
+       re-run, catch-up after downtime) still posts guests who have since
+       checked out. Still-CheckedIn overstays are posted too. These are a revenue
+       ledger for reporting, not folio charges: the bill still charges the
+       booking amount, so posting to the folio would double it;
+    4. daily_stats and occupancy_snapshots are rolled up from the postings
+       (occupancy, ADR, RevPAR, arrivals, departures, revenue by source and by
+       room type);
+    5. the report is stored on night_audits and a summary notification is
+       queued on the same commit.
+
+A business date is audited once: night_audits.business_date is claimed at the
+start, so a concurrent run waits on it and then returns the stored report.
+`force=True` recomputes the postings and rollups for the date. The day in
+progress (or a later one) is refused unless `allow_open=True`: its arrivals
+would be flagged as no-shows before they had a chance to arrive.
+
+Business day: runs until NIGHT_AUDIT_TIME (local) the next morning. The
+scheduled job (main.py) closes the day that ended last, catching up missed
+dates up to NIGHT_AUDIT_CATCHUP_DAYS back. Also runnable by hand:
+
+    python backend/night_audit.py [--date YYYY-MM-DD] [--force]
+
+Tunables (environment):
+    NIGHT_AUDIT_TIME           end of the business day, HH:MM (default 03:00)
+    NIGHT_AUDIT_CATCHUP_DAYS   how far back missed audits and no-shows reach (default 7)
+"""
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from backend.frontdesk_board import frontdesk_board
+
+NIGHT_AUDIT_TIME = os.getenv("NIGHT_AUDIT_TIME", "03:00")
+CATCHUP_DAYS = max(1, int(os.getenv("NIGHT_AUDIT_CATCHUP_DAYS", "7")))
+NO_SHOW_REASON = "No-show"
+
+# Bookings that occupied a room on night :d (checked out since, still in house, or overstaying)
+IN_HOUSE_SQL = """
+    check_in <= :d
+    AND (status = 'CheckedIn' OR (status = 'CheckedOut' AND check_out > :d))
+"""
+
+
+class BusinessDateOpen(Exception):
+    """The business date has not ended yet."""
+
+
+def _day_offset() -> timedelta:
+    hours, minutes = NIGHT_AUDIT_TIME.split(":")
+    return timedelta(hours=int(hours), minutes=int(minutes))
+
+
+def current_business_date(now: datetime = None) -> str:
+    """The business day in progress (it ends at NIGHT_AUDIT_TIME the next morning)."""
+    return ((now or datetime.now()) - _day_offset()).date().isoformat()
+
+
+def closable_business_date(now: datetime = None) -> str:
+    """The latest business day that has ended, i.e. what the scheduled run closes."""
+    return (date.fromisoformat(current_business_date(now)) - timedelta(days=1)).isoformat()
+
+
+def _nightly_amount_sql(dialect: str) -> str:
+    """A booking's amount spread evenly over its nights (at least one)."""
+    if dialect == "postgresql":
+        return ("ROUND(CAST(COALESCE(amount, 0) AS NUMERIC) / "
+                "GREATEST(CAST(check_out AS DATE) - CAST(check_in AS DATE), 1), 2)")
+    return "ROUND(COALESCE(amount, 0) * 1.0 / MAX(CAST(julianday(check_out) - julianday(check_in) AS INTEGER), 1), 2)"
+
+
+def _rows(result) -> list:
+    return [dict(row._mapping) for row in result]
+
+
+def _flag_no_shows(conn, params: dict) -> list:
+    return _rows(conn.execute(text("""
+        UPDATE bookings
+        SET status = 'Cancelled', rejection_reason = :reason, version = version + 1, timestamp = :now_ms
+        WHERE status = 'Confirmed' AND check_in BETWEEN :since AND :d
+        RETURNING id, guest_name AS "guestName", room_number AS "roomNumber", check_in AS "checkIn", source
+    """), dict(params, reason=NO_SHOW_REASON)))
+
+
+def _overstays(conn, params: dict) -> list:
+    return _rows(conn.execute(text("""
+        SELECT id, guest_name AS "guestName", room_number AS "roomNumber", check_out AS "checkOut"
+        FROM bookings
+        WHERE status = 'CheckedIn' AND check_out <= :d
+        ORDER BY room_number
+    """), params))
+
+
+def _post_room_revenue(conn, params: dict, force: bool) -> int:
+    if force:
+        conn.execute(text("DELETE FROM room_revenue_postings WHERE business_date = :d"), params)
+    return conn.execute(text(f"""
+        INSERT INTO room_revenue_postings (booking_id, business_date, room_type_id, room_number, source, amount, posted_at)
+        SELECT id, :d, room_type_id, room_number, source, {_nightly_amount_sql(conn.dialect.name)}, :now
+        FROM bookings
+        WHERE {IN_HOUSE_SQL}
+        ON CONFLICT (booking_id, business_date) DO NOTHING
+    """), params).rowcount
+
+
+def _roll_up(session, conn, params: dict) -> tuple:
+    """daily_stats and occupancy_snapshots rows for the date, from its postings."""
+    from backend.db_models import RoomTypeDB, DailyStatsDB, OccupancySnapshotDB
+
+    by_type, by_source = {}, {}
+    for row in conn.execute(text("""
+        SELECT room_type_id, source, COUNT(*) AS rooms, COALESCE(SUM(amount), 0) AS revenue
+        FROM room_revenue_postings
+        WHERE business_date = :d
+        GROUP BY room_type_id, source
+    """), params):
+        rooms, revenue = by_type.get(row.room_type_id, (0, 0.0))
+        by_type[row.room_type_id] = (rooms + row.rooms, revenue + float(row.revenue))
+        by_source[row.source] = round(by_source.get(row.source, 0.0) + float(row.revenue), 2)
+    # Arrivals: stays that began on D and occupied a room that night; departures: stays
+    # that ended on D. Both from stay dates, so they hold for dates audited later.
+    movements = conn.execute(text(f"""
+        SELECT
+            (SELECT COUNT(*) FROM bookings WHERE check_in = :d AND {IN_HOUSE_SQL}) AS arrivals,
+            (SELECT COUNT(*) FROM bookings WHERE status = 'CheckedOut' AND check_out = :d) AS departures
+    """), params).one()
+
+    snapshots = []
+    for rt in session.query(RoomTypeDB).order_by(RoomTypeDB.id).all():
+        rooms, revenue = by_type.pop(rt.id, (0, 0.0))
+        snapshots.append(OccupancySnapshotDB(
+            business_date=params["d"], room_type_id=rt.id, room_type_name=rt.name,
+            rooms_total=len(rt.room_numbers or []) or rt.total_capacity or 0,
+            rooms_occupied=rooms, room_revenue=round(revenue, 2),
+        ))
+    for room_type_id, (rooms, revenue) in by_type.items():
+        # Postings for a room type that has since been deleted
+        snapshots.append(OccupancySnapshotDB(
+            business_date=params["d"], room_type_id=room_type_id, room_type_name=None,
+            rooms_total=0, rooms_occupied=rooms, room_revenue=round(revenue, 2),
+        ))
+
+    available = sum(s.rooms_total for s in snapshots)
+    occupied = sum(s.rooms_occupied for s in snapshots)
+    revenue = round(sum(s.room_revenue for s in snapshots), 2)
+    stats = DailyStatsDB(
+        business_date=params["d"],
+        rooms_available=available,
+        rooms_occupied=occupied,
+        occupancy=round(occupied / available * 100, 1) if available else 0.0,
+        room_revenue=revenue,
+        adr=round(revenue / occupied, 2) if occupied else 0.0,
+        revpar=round(revenue / available, 2) if available else 0.0,
+        arrivals=movements.arrivals,
+        departures=movements.departures,
+        revenue_by_source=by_source,
+        computed_at=params["now"],
+    )
+    session.query(OccupancySnapshotDB).filter(OccupancySnapshotDB.business_date == params["d"]).delete()
+    session.query(DailyStatsDB).filter(DailyStatsDB.business_date == params["d"]).delete()
+    return stats, snapshots
+
+
+def stats_to_api(stats) -> dict:
+    return {
+        "businessDate": stats.business_date,
+        "roomsAvailable": stats.rooms_available,
+        "roomsOccupied": stats.rooms_occupied,
+        "occupancy": stats.occupancy,
+        "roomRevenue": stats.room_revenue,
+        "adr": stats.adr,
+        "revpar": stats.revpar,
+        "arrivals": stats.arrivals,
+        "departures": stats.departures,
+        "noShows": stats.no_shows,
+        "overstays": stats.overstays,
+        "revenueBySource": stats.revenue_by_source or {},
+    }
+
+
+def _snapshot_to_api(snapshot) -> dict:
+    return {
+        "roomTypeId": snapshot.room_type_id,
+        "roomTypeName": snapshot.room_type_name,
+        "roomsTotal": snapshot.rooms_total,
+        "roomsOccupied": snapshot.rooms_occupied,
+        "occupancy": round(snapshot.rooms_occupied / snapshot.rooms_total * 100, 1) if snapshot.rooms_total else 0.0,
+        "roomRevenue": snapshot.room_revenue,
+    }
+
+
+def run_night_audit(session, business_date: str, force: bool = False, allow_open: bool = False) -> dict:
+    """
+    Audit `business_date` (YYYY-MM-DD) and commit; returns the report (the stored one if already
+    audited). Raises BusinessDateOpen for the day in progress or later unless `allow_open`.
+    """
+    from backend.db_models import NightAuditDB
+    from backend.notification_outbox import queue_notification
+
+    date.fromisoformat(business_date)  # ValueError for anything but YYYY-MM-DD
+    if business_date >= current_business_date() and not allow_open:
+        raise BusinessDateOpen(f"Business date {business_date} has not ended yet")
+    started = time.monotonic()
+    now = datetime.now(timezone.utc).isoformat()
+
+    audit = session.get(NightAuditDB, business_date)
+    if audit is not None and not force:
+        return dict(audit.report or {}, alreadyRun=True)
+    previous = (audit.report or {}) if audit is not None else {}
+    if audit is None:
+        audit = NightAuditDB(business_date=business_date)
+        session.add(audit)
+    audit.started_at = now
+    try:
+        # Claim the date first: a concurrent run for it waits here, then fails on the key
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        audit = session.get(NightAuditDB, business_date)
+        return dict(audit.report or {}, alreadyRun=True)
+
+    conn = session.connection()
+    since = (date.fromisoformat(business_date) - timedelta(days=CATCHUP_DAYS - 1)).isoformat()
+    params = {"d": business_date, "since": since, "now": now, "now_ms": int(time.time() * 1000)}
+
+    flagged = _flag_no_shows(conn, params)
+    # A forced re-run keeps the no-shows the first run flagged (they are no longer Confirmed)
+    no_shows = [n for n in previous.get("noShows", []) if n["id"] not in {f["id"] for f in flagged}] + flagged
+    overstays = _overstays(conn, params)
+    posted = _post_room_revenue(conn, params, force)
+    stats, snapshots = _roll_up(session, conn, params)
+    stats.no_shows = len(no_shows)
+    stats.overstays = len(overstays)
+    session.add(stats)
+    session.add_all(snapshots)
+
+    report = {
+        "businessDate": business_date,
+        "completedAt": datetime.now(timezone.utc).isoformat(),
+        "durationMs": None,
+        "noShows": no_shows,
+        "overstays": overstays,
+        "roomRevenuePosted": posted,
+        "stats": stats_to_api(stats),
+        "occupancy": [_snapshot_to_api(s) for s in snapshots],
+    }
+    queue_notification(
+        session, "system", "night_audit",
+        title=f"Night Audit: {business_date}",
+        message=(f"{stats.occupancy}% occupancy, ₹{stats.room_revenue:,.2f} room revenue, "
+                 f"{len(no_shows)} no-show(s), {len(overstays)} overstay(s)"),
+        priority="high" if flagged or overstays else "low",
+        metadata={"businessDate": business_date, "noShows": len(no_shows), "overstays": len(overstays)},
+    )
+    report["durationMs"] = round((time.monotonic() - started) * 1000)
+    audit.completed_at = report["completedAt"]
+    audit.report = report
+    session.commit()
+    # No-shows were cancelled with a bulk UPDATE, which the board's session hook doesn't see
+    frontdesk_board.invalidate()
+    return report
+
+
+def dates_due(last_audited: str, now: datetime = None) -> list:
+    """Business dates the scheduled run should close: the last ended day, plus missed ones (capped)."""
+    target = date.fromisoformat(closable_business_date(now))
+    if last_audited is None:
+        return [target.isoformat()]
+    start = max(date.fromisoformat(last_audited) + timedelta(days=1), target - timedelta(days=CATCHUP_DAYS - 1))
+    return [(start + timedelta(days=i)).isoformat() for i in range((target - start).days + 1)]
+
+
+def run_due_audits(session_factory, now: datetime = None) -> list:
+    """Scheduled entry point: audit every business date that is due; returns their reports."""
+    from sqlalchemy import func
+    from backend.db_models import NightAuditDB
+
+    session = session_factory()
+    try:
+        last = session.query(func.max(NightAuditDB.business_date)).scalar()
+    finally:
+        session.close()
+
+    reports = []
+    for business_date in dates_due(last, now):
+        session = session_factory()
+        try:
+            reports.append(run_night_audit(session, business_date))
+        finally:
+            session.close()
+    return reports
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from backend.database import SessionLocal
+    from backend.notification_outbox import register
+
+    parser = argparse.ArgumentParser(description="Close a business date (see backend/night_audit.py)")
+    parser.add_argument("--date", help="Business date to close (default: the day that ended last)")
+    parser.add_argument("--force", action="store_true", help="Recompute a date that was already audited")
+    parser.add_argument("--allow-open", action="store_true",
+                        help="Close the day in progress (its pending arrivals become no-shows)")
+    args = parser.parse_args()
+
+    register(SessionLocal)
+    db = SessionLocal()
+    try:
+        result = run_night_audit(db, args.date or closable_business_date(), force=args.force,
+                                 allow_open=args.allow_open)
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2, default=str))
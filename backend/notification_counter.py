@@ -0,0 +1,192 @@
+"""
+Maintained unread-notification count.
+
+The bell badge used to run COUNT(*) over every unread, undismissed notification
+on each poll, and the table is never purged. The count now lives in a single
+`notification_counters` row that every write keeps in step:
+
+    - on Postgres the change to `notifications` and the counter update are one
+      statement (a data-modifying CTE), so they cannot drift apart;
+    - elsewhere (local SQLite) they are two statements in one transaction.
+
+Reads go to an in-process cache, refreshed from the counter row (a primary-key
+lookup) once it is older than NOTIFICATION_COUNT_CACHE_SECONDS, and updated
+directly by this worker's writes and by events from other workers (see
+backend/notification_stream.py).
+
+`reconcile_unread_counter` recounts from the table and repairs any drift left
+by manual SQL or writes that bypassed these helpers; main.py runs it every
+NOTIFICATION_RECONCILE_SECONDS (and on POST /api/notifications/reconcile).
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+UNREAD = "unread"
+UNREAD_CONDITION = "is_read = FALSE AND is_dismissed = FALSE"
+CACHE_SECONDS = float(os.getenv("NOTIFICATION_COUNT_CACHE_SECONDS", "5"))
+
+_counter_ready = False
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+class UnreadCountCache:
+    def __init__(self, ttl: float = CACHE_SECONDS):
+        self.ttl = ttl
+        self._value = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: int):
+        with self._lock:
+            self._value = max(0, int(value))
+            self._fetched_at = time.monotonic()
+
+    def get(self, engine) -> int:
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return self._value
+        with engine.begin() as conn:
+            ensure_counter(conn)
+            value = conn.execute(
+                text("SELECT value FROM notification_counters WHERE name = :name"), {"name": UNREAD}
+            ).scalar()
+        self.set(value or 0)
+        return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+unread_cache = UnreadCountCache()
+
+
+def ensure_counter(conn):
+    """Create the counter row (seeded from a one-off COUNT) if this database doesn't have it yet."""
+    global _counter_ready
+    if _counter_ready:
+        return
+    conn.execute(
+        text(f"""
+            INSERT INTO notification_counters (name, value, updated_at)
+            SELECT :name, COUNT(*), :now FROM notifications WHERE {UNREAD_CONDITION}
+            ON CONFLICT (name) DO NOTHING
+        """),
+        {"name": UNREAD, "now": _now()}
+    )
+    _counter_ready = True
+
+
+def _remember(value):
+    """Cache a counter value returned by a write; a missing row means ensure_counter's insert was rolled back."""
+    global _counter_ready
+    if value is None:
+        _counter_ready = False
+        unread_cache.invalidate()
+    else:
+        unread_cache.set(value)
+
+
+def insert_notifications(conn, rows: list) -> int:
+    """
+    INSERT notifications (always unread) as one multi-row statement and bump the counter by
+    the number inserted. All rows must have the same columns. Returns the new unread count.
+    """
+    ensure_counter(conn)
+    columns = list(rows[0])
+    values = ", ".join(
+        "(" + ", ".join(f":{c}_{i}" for c in columns) + ")" for i in range(len(rows))
+    )
+    params = {f"{c}_{i}": row[c] for i, row in enumerate(rows) for c in columns}
+    params.update(counter_name=UNREAD, counter_now=_now(), counter_delta=len(rows))
+
+    if conn.dialect.name == "postgresql":
+        value = conn.execute(text(f"""
+            WITH inserted AS (
+                INSERT INTO notifications ({", ".join(columns)}) VALUES {values} RETURNING 1
+            )
+            UPDATE notification_counters
+            SET value = value + (SELECT COUNT(*) FROM inserted), updated_at = :counter_now
+            WHERE name = :counter_name
+            RETURNING value
+        """), params).scalar()
+    else:
+        conn.execute(text(f"INSERT INTO notifications ({', '.join(columns)}) VALUES {values}"), params)
+        value = conn.execute(text("""
+            UPDATE notification_counters SET value = value + :counter_delta, updated_at = :counter_now
+            WHERE name = :counter_name RETURNING value
+        """), params).scalar()
+
+    _remember(value)
+    return value
+
+
+def insert_notification(conn, row: dict) -> int:
+    return insert_notifications(conn, [row])
+
+
+def update_notifications(conn, set_clause: str, where_clause: str, params: dict):
+    """
+    UPDATE notifications SET <set_clause> WHERE <where_clause>, moving the counter by
+    however many matched rows stop being unread. Returns (rows_matched, unread_count).
+    `set_clause` may only mark rows read and/or dismissed, never unread again.
+    """
+    ensure_counter(conn)
+    params = dict(params, counter_name=UNREAD, counter_now=_now())
+
+    if conn.dialect.name == "postgresql":
+        matched, value = conn.execute(text(f"""
+            WITH target AS (
+                SELECT id, ({UNREAD_CONDITION}) AS was_unread
+                FROM notifications WHERE {where_clause}
+                FOR UPDATE
+            ), changed AS (
+                UPDATE notifications SET {set_clause}
+                FROM target WHERE notifications.id = target.id
+                RETURNING target.was_unread
+            )
+            UPDATE notification_counters
+            SET value = value - (SELECT COUNT(*) FROM changed WHERE was_unread), updated_at = :counter_now
+            WHERE name = :counter_name
+            RETURNING (SELECT COUNT(*) FROM changed), value
+        """), params).one()
+    else:
+        matched, was_unread = conn.execute(text(f"""
+            SELECT COUNT(*), COALESCE(SUM(CASE WHEN {UNREAD_CONDITION} THEN 1 ELSE 0 END), 0)
+            FROM notifications WHERE {where_clause}
+        """), params).one()
+        conn.execute(text(f"UPDATE notifications SET {set_clause} WHERE {where_clause}"), params)
+        value = conn.execute(text("""
+            UPDATE notification_counters SET value = value - :delta, updated_at = :counter_now
+            WHERE name = :counter_name RETURNING value
+        """), dict(params, delta=was_unread)).scalar()
+
+    _remember(value)
+    return matched, value
+
+
+def reconcile_unread_counter(engine):
+    """Recount unread notifications and correct the counter. Returns (counter_before, actual)."""
+    with engine.begin() as conn:
+        ensure_counter(conn)
+        lock = " FOR UPDATE" if conn.dialect.name == "postgresql" else ""
+        # Holding the counter row first means every writer that has already moved it is
+        # committed and visible to the recount below, and every later one queues behind us
+        before = conn.execute(
+            text(f"SELECT value FROM notification_counters WHERE name = :name{lock}"), {"name": UNREAD}
+        ).scalar()
+        actual = conn.execute(text(f"SELECT COUNT(*) FROM notifications WHERE {UNREAD_CONDITION}")).scalar() or 0
+        if before != actual:
+            conn.execute(
+                text("UPDATE notification_counters SET value = :value, updated_at = :now WHERE name = :name"),
+                {"value": actual, "now": _now(), "name": UNREAD}
+            )
+    unread_cache.set(actual)
+    return before, actual
@@ -0,0 +1,127 @@
+"""
+Keyset-paginated notification feed (GET /api/notifications).
+
+Pages are addressed by the last row of the previous page rather than by an
+offset, so page 40 costs the same as page 1:
+
+    GET /api/notifications?limit=50                  -> first page
+    GET /api/notifications?limit=50&before=<cursor>  -> the page after it
+
+The cursor for the next page is returned in the X-Next-Cursor header (absent on
+the last page). It is `<created_at>,<id>` for the default newest-first order and
+`<priority>,<created_at>,<id>` for `order=priority` (urgent first, newest first
+within a priority).
+
+Each order is answered as a UNION ALL of branches that are each one ordered
+range of an index, and the outer query only merges their first `limit + 1` rows:
+
+    recent:   unread / read             -> idx_notifications_feed
+    priority: urgent / high / normal / low -> idx_notifications_priority
+              + NULL or unknown priority, ranked (and paged) as normal
+
+Filters (types, booking_id, room_number) are bound parameters applied in every
+branch; booking and room lookups have their own (…, created_at, id) indexes.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+
+from backend.notification_outbox import PRIORITY_RANK
+
+ORDERS = ("recent", "priority")
+MAX_LIMIT = 200
+PRIORITIES = sorted(PRIORITY_RANK, key=PRIORITY_RANK.get, reverse=True)  # urgent -> low
+DEFAULT_PRIORITY = "normal"
+
+
+def parse_cursor(before: str, order: str) -> dict:
+    """Split a cursor from X-Next-Cursor; raises ValueError if it is malformed."""
+    # An unencoded "+00:00" offset arrives as " 00:00"
+    before = before.replace(" ", "+")
+    if order == "priority":
+        priority, created_at, notification_id = before.split(",", 2)
+        if priority not in PRIORITY_RANK:
+            raise ValueError(f"unknown priority {priority!r}")
+    else:
+        priority = None
+        created_at, notification_id = before.split(",", 1)
+    if not notification_id:
+        raise ValueError("missing notification id")
+    return {
+        "priority": priority,
+        "created_at": datetime.fromisoformat(created_at),
+        "id": notification_id,
+    }
+
+
+def encode_cursor(notification: dict, order: str) -> str:
+    """Cursor pointing just past `notification` (an API dict from the feed)."""
+    key = f"{notification['createdAt']},{notification['id']}"
+    if order == "priority":
+        priority = notification["priority"]
+        return f"{priority if priority in PRIORITY_RANK else DEFAULT_PRIORITY},{key}"
+    return key
+
+
+def feed_query(columns: str, dialect: str, unread_only: bool = False, types: list = None,
+               booking_id: str = None, room_number: str = None, cursor: dict = None,
+               order: str = "recent", limit: int = 50):
+    """Build the feed SELECT. Returns (statement, params); the statement fetches `limit + 1` rows."""
+    params = {"limit": limit + 1}
+    filters = ["is_dismissed = FALSE"]
+    if types:
+        filters.append("type IN :types")
+        params["types"] = list(types)
+    if booking_id:
+        filters.append("booking_id = :booking_id")
+        params["booking_id"] = booking_id
+    if room_number:
+        filters.append("room_number = :room_number")
+        params["room_number"] = room_number
+
+    keyset = ""
+    if cursor:
+        # timestamptz on Postgres; ISO text (as written by notification_timestamp) on SQLite
+        created_at = cursor["created_at"]
+        params["before_at"] = created_at if dialect == "postgresql" else created_at.isoformat()
+        params["before_id"] = cursor["id"]
+        keyset = "(created_at, id) < (:before_at, :before_id)"
+
+    if order == "priority":
+        branches = []
+        cursor_rank = PRIORITY_RANK[cursor["priority"]] if cursor else None
+        known = ", ".join(f"'{p}'" for p in PRIORITIES)
+        # Rows with a NULL or unrecognised priority are listed (and paged) as 'normal'
+        catch_all = (f"(priority IS NULL OR priority NOT IN ({known}))", PRIORITY_RANK[DEFAULT_PRIORITY])
+        for condition, rank in [(f"priority = '{p}'", PRIORITY_RANK[p]) for p in PRIORITIES] + [catch_all]:
+            if cursor_rank is not None and rank > cursor_rank:
+                continue  # Already paged past every row of this priority
+            where = filters + [condition]
+            if unread_only:
+                where.append("is_read = FALSE")
+            if cursor_rank == rank:
+                where.append(keyset)
+            branches.append((where, f"{rank} AS priority_rank"))
+        outer_order = "priority_rank DESC, created_at DESC, id DESC"
+    else:
+        branches = []
+        for is_read in (("FALSE",) if unread_only else ("FALSE", "TRUE")):
+            where = filters + [f"is_read = {is_read}"]
+            if keyset:
+                where.append(keyset)
+            branches.append((where, None))
+        outer_order = "created_at DESC, id DESC"
+
+    selects = []
+    for i, (where, extra) in enumerate(branches):
+        select_list = f"{columns}, {extra}" if extra else columns
+        selects.append(
+            f"SELECT * FROM (SELECT {select_list} FROM notifications WHERE {' AND '.join(where)} "
+            f"ORDER BY created_at DESC, id DESC LIMIT :limit) branch_{i}"
+        )
+    sql = f"SELECT {columns} FROM ({' UNION ALL '.join(selects)}) feed ORDER BY {outer_order} LIMIT :limit"
+
+    statement = text(sql)
+    if types:
+        statement = statement.bindparams(bindparam("types", expanding=True))
+    return statement, params
@@ -0,0 +1,187 @@
+"""
+Transactional outbox for notifications raised while a request changes bookings.
+
+`create_notification_internal(db, ...)` used to open its own connection and
+commit each notification separately, after the booking had already been
+committed, so a failure on either side left bookings without notifications or
+notifications for bookings that never saved. Notifications raised with a
+session are now queued on it instead:
+
+    queue_notification(db, "reservation", "new_booking", ...)
+    db.commit()
+
+On commit the queue is coalesced and written with the booking changes, in the
+same transaction, as one multi-row INSERT that also bumps the unread counter
+(backend/notification_counter.py). Only after the commit succeeds does the
+dispatcher push the new notifications to open streams
+(backend/notification_stream.py). A rollback discards the queue.
+
+Coalescing: entries queued with the same `group["key"]` become one notification
+(e.g. a 30-room block raises one "Bulk Booking Created" instead of 31 rows).
+`group` may set category, title, message and priority for the merged row;
+`{count}` and `{rooms}` in the title/message are filled in.
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+OUTBOX_KEY = "notification_outbox"
+DISPATCH_KEY = "notification_dispatch"
+PRIORITY_RANK = {"low": 0, "normal": 1, "high": 2, "urgent": 3}
+
+
+def notification_timestamp() -> str:
+    """created_at/read_at value: timezone-aware UTC (the column is timestamptz on Postgres)."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def new_notification_id() -> str:
+    return f"notif-{str(uuid.uuid4())[:8]}"
+
+
+def queue_notification(session, notif_type: str, category: str, title: str, message: str,
+                       priority: str = "normal", booking_id: str = None, room_number: str = None,
+                       metadata: dict = None, group: dict = None) -> str:
+    """Queue a notification to be written when `session` commits. Returns its id."""
+    entry = {
+        "id": new_notification_id(),
+        "type": notif_type,
+        "category": category,
+        "title": title,
+        "message": message,
+        "priority": priority,
+        "booking_id": booking_id,
+        "room_number": room_number,
+        "metadata": metadata or {},
+        "group": group,
+    }
+    session.info.setdefault(OUTBOX_KEY, []).append(entry)
+    return entry["id"]
+
+
+def coalesce(entries: list) -> list:
+    """Merge grouped entries into one row per group, keeping first-queued order."""
+    merged, groups = [], {}
+    for entry in entries:
+        key = (entry.get("group") or {}).get("key")
+        if key is None:
+            merged.append(entry)
+        elif key in groups:
+            groups[key].append(entry)
+        else:
+            groups[key] = [entry]
+            merged.append(groups[key])
+
+    out = []
+    for item in merged:
+        if isinstance(item, dict):
+            out.append(item)
+        elif len(item) == 1:
+            out.append(item[0])
+        else:
+            out.append(_merge_group(item))
+    return out
+
+
+def _merge_group(entries: list) -> dict:
+    first, spec = entries[0], entries[0]["group"]
+    rooms = [e["room_number"] for e in entries if e.get("room_number")]
+    fill = {"count": len(entries), "rooms": ", ".join(rooms)}
+    return {
+        "id": first["id"],
+        "type": first["type"],
+        "category": spec.get("category", first["category"]),
+        "title": spec.get("title", first["title"]).format(**fill),
+        "message": spec.get("message", first["message"]).format(**fill),
+        "priority": spec.get("priority") or max((e["priority"] for e in entries), key=lambda p: PRIORITY_RANK.get(p, 1)),
+        "booking_id": first["booking_id"],
+        "room_number": rooms[0] if len(set(rooms)) == 1 else None,
+        "metadata": {
+            "count": len(entries),
+            "bookingIds": [e["booking_id"] for e in entries if e.get("booking_id")],
+            "roomNumbers": rooms,
+        },
+        "group": None,
+    }
+
+
+def _to_row(entry: dict, created_at: str) -> dict:
+    return {
+        "id": entry["id"],
+        "type": entry["type"],
+        "category": entry["category"],
+        "title": entry["title"],
+        "message": entry["message"],
+        "priority": entry["priority"],
+        "is_read": False,
+        "is_dismissed": False,
+        "created_at": created_at,
+        "booking_id": entry["booking_id"],
+        "room_number": entry["room_number"],
+        "metadata": json.dumps(entry["metadata"] or {}),
+    }
+
+
+def _to_api(entry: dict, created_at: str) -> dict:
+    return {
+        "id": entry["id"], "type": entry["type"], "category": entry["category"],
+        "title": entry["title"], "message": entry["message"], "priority": entry["priority"],
+        "isRead": False, "isDismissed": False, "createdAt": created_at, "readAt": None,
+        "bookingId": entry["booking_id"], "roomNumber": entry["room_number"],
+        "metadata": entry["metadata"] or {},
+    }
+
+
+def _write_outbox(session):
+    entries = session.info.pop(OUTBOX_KEY, None)
+    if not entries:
+        return
+    from backend.notification_counter import insert_notifications
+
+    # Booking rows must exist before notifications that reference them
+    session.flush()
+    rows = coalesce(entries)
+    created_at = notification_timestamp()
+    unread = insert_notifications(session.connection(), [_to_row(r, created_at) for r in rows])
+    session.info[DISPATCH_KEY] = ([_to_api(r, created_at) for r in rows], unread)
+
+
+def _dispatch(session):
+    pending = session.info.pop(DISPATCH_KEY, None)
+    if not pending:
+        return
+    notifications, unread = pending
+    from backend.notification_counter import unread_cache
+    from backend.notification_stream import notification_broadcaster
+
+    if unread is not None:
+        unread_cache.set(unread)
+    try:
+        with session.get_bind().connect() as conn:
+            for notification in notifications:
+                notification_broadcaster.publish(conn, {
+                    "kind": "notification", "notification": notification, "unreadCount": unread,
+                })
+    except Exception as e:
+        # Rows are committed; clients pick them up on reconnect or the next fetch
+        print(f"Error dispatching notifications: {e}")
+
+
+def _discard(session):
+    session.info.pop(OUTBOX_KEY, None)
+    if session.info.pop(DISPATCH_KEY, None):
+        # The counter value cached by the rolled-back insert never committed
+        from backend.notification_counter import unread_cache
+        unread_cache.invalidate()
+
+
+def register(session_factory):
+    """Hook the outbox into a sessionmaker (done once for backend.database.SessionLocal)."""
+    if getattr(session_factory, "_notification_outbox", False):
+        return
+    event.listen(session_factory, "before_commit", _write_outbox)
+    event.listen(session_factory, "after_commit", _dispatch)
+    event.listen(session_factory, "after_rollback", _discard)
+    session_factory._notification_outbox = True
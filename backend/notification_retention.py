@@ -0,0 +1,154 @@
+"""
+Notification retention: monthly partitions, archiving and partition drops.
+
+On Postgres `notifications` is range-partitioned by month on `created_at`
+(timestamptz); migrate_db.py converts an existing table. Partitions are named
+notifications_yYYYYmMM, with notifications_default catching anything outside
+them. `run_retention` (scheduled from main.py, also POST
+/api/notifications/retention) does three things:
+
+    1. creates the partitions for the next NOTIFICATION_PARTITIONS_AHEAD months;
+    2. moves read or dismissed notifications older than NOTIFICATION_ARCHIVE_DAYS
+       into `notifications_archive`, in batches;
+    3. drops monthly partitions older than NOTIFICATION_RETENTION_MONTHS, after
+       copying whatever is still in them (old unread rows) to the archive.
+
+On other databases (local SQLite) only step 2 runs.
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+ARCHIVE_DAYS = int(os.getenv("NOTIFICATION_ARCHIVE_DAYS", "90"))
+RETENTION_MONTHS = int(os.getenv("NOTIFICATION_RETENTION_MONTHS", "24"))
+PARTITIONS_AHEAD = int(os.getenv("NOTIFICATION_PARTITIONS_AHEAD", "2"))
+ARCHIVE_BATCH_SIZE = 5000
+
+COLUMNS = ("id, type, category, title, message, priority, is_read, is_dismissed, "
+           "created_at, read_at, booking_id, room_number, metadata")
+PARTITION_NAME = re.compile(r"^notifications_y(\d{4})m(\d{2})$")
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"notifications_y{year:04d}m{month:02d}"
+
+
+def _add_months(year: int, month: int, months: int):
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = 'notifications'")).scalar()
+    return kind == "p"
+
+
+def create_month_partition(conn, year: int, month: int) -> bool:
+    """Create the partition for one month if missing. Returns True if it was created."""
+    name = partition_name(year, month)
+    exists = conn.execute(text("SELECT 1 FROM pg_class WHERE relname = :name"), {"name": name}).first()
+    if exists:
+        return False
+    end_year, end_month = _add_months(year, month, 1)
+    conn.execute(text(
+        f"CREATE TABLE {name} PARTITION OF notifications "
+        f"FOR VALUES FROM ('{year:04d}-{month:02d}-01 00:00:00+00') TO ('{end_year:04d}-{end_month:02d}-01 00:00:00+00')"
+    ))
+    return True
+
+
+def ensure_partitions(engine, months_ahead: int = PARTITIONS_AHEAD, now: datetime = None) -> list:
+    now = now or datetime.now(timezone.utc)
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return created
+        for offset in range(months_ahead + 1):
+            year, month = _add_months(now.year, now.month, offset)
+            if create_month_partition(conn, year, month):
+                created.append(partition_name(year, month))
+    return created
+
+
+def archive_notifications(engine, older_than_days: int = ARCHIVE_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                          now: datetime = None) -> int:
+    """Move read/dismissed notifications older than the cutoff into notifications_archive."""
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=older_than_days)
+    moved = 0
+
+    while True:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                count = conn.execute(text(f"""
+                    WITH old AS (
+                        SELECT id, created_at FROM notifications
+                        WHERE (is_read OR is_dismissed) AND created_at < :cutoff
+                        ORDER BY created_at
+                        LIMIT :batch
+                    ), moved AS (
+                        DELETE FROM notifications n USING old
+                        WHERE n.id = old.id AND n.created_at = old.created_at
+                        RETURNING n.*
+                    )
+                    INSERT INTO notifications_archive ({COLUMNS}, archived_at)
+                    SELECT {COLUMNS}, :now FROM moved
+                """), {"cutoff": cutoff, "batch": batch_size, "now": now}).rowcount
+            else:
+                params = {"cutoff": cutoff.isoformat(), "batch": batch_size, "now": now.isoformat()}
+                where = ("id IN (SELECT id FROM notifications WHERE (is_read OR is_dismissed) "
+                         "AND created_at < :cutoff ORDER BY created_at LIMIT :batch)")
+                conn.execute(text(f"""
+                    INSERT INTO notifications_archive ({COLUMNS}, archived_at)
+                    SELECT {COLUMNS}, :now FROM notifications WHERE {where}
+                """), params)
+                count = conn.execute(text(f"DELETE FROM notifications WHERE {where}"), params).rowcount
+        moved += count
+        if count < batch_size:
+            return moved
+
+
+def drop_expired_partitions(engine, keep_months: int = RETENTION_MONTHS, now: datetime = None) -> list:
+    """Drop monthly partitions that ended more than `keep_months` ago, archiving any rows left in them."""
+    now = now or datetime.now(timezone.utc)
+    oldest_kept = _add_months(now.year, now.month, -keep_months)
+    dropped = []
+
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return dropped
+        names = conn.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'notifications'
+        """)).scalars().all()
+
+    for name in sorted(names):
+        match = PARTITION_NAME.match(name)
+        if not match or (int(match.group(1)), int(match.group(2))) >= oldest_kept:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f"""
+                INSERT INTO notifications_archive ({COLUMNS}, archived_at)
+                SELECT {COLUMNS}, :now FROM {name}
+            """), {"now": now})
+            conn.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+def run_retention(engine) -> dict:
+    created = ensure_partitions(engine)
+    archived = archive_notifications(engine)
+    dropped = drop_expired_partitions(engine)
+    if dropped:
+        # Dropped partitions may have held unread notifications
+        from backend.notification_counter import reconcile_unread_counter
+        reconcile_unread_counter(engine)
+    return {"partitionsCreated": created, "archived": archived, "partitionsDropped": dropped}
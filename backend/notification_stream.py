@@ -0,0 +1,150 @@
+"""
+Push channel for notifications (/api/notifications/stream).
+
+Writers call `notification_broadcaster.publish(conn, event)` after committing a
+change to the notifications table. On Postgres the event goes out with
+pg_notify, and every worker process runs one LISTEN connection that fans it out
+to the SSE clients connected to that process, so all workers see the same
+stream. On other databases (local SQLite) events are delivered in-process.
+Other streams (e.g. the service-order queue, backend/service_orders.py) create
+their own broadcaster on a separate channel.
+
+Event shapes:
+    {"kind": "notification", "notification": {...}, "unreadCount": n}
+    {"kind": "unread-count", "unreadCount": n}
+
+Tunables (environment):
+    NOTIFICATION_LISTEN_URL   connection for LISTEN if DATABASE_URL points at a
+                              transaction pooler (e.g. Neon's -pooler host, which
+                              does not support LISTEN)
+"""
+import asyncio
+import json
+import os
+import select
+import threading
+
+CHANNEL = "pms_notifications"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class NotificationBroadcaster:
+    def __init__(self, channel: str = CHANNEL):
+        self.channel = channel
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stop = threading.Event()
+
+    # ---- publishing ----
+
+    def publish(self, conn, event: dict):
+        """Send `event` to every stream. `conn` is the SQLAlchemy connection that made the change."""
+        if conn.dialect.name == "postgresql":
+            from sqlalchemy import text
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": self.channel, "payload": json.dumps(event, default=str)})
+            conn.commit()
+        else:
+            self._dispatch(event)
+
+    # ---- subscribing ----
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a queue on the running event loop; events for this process are pushed onto it."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        self._ensure_listener()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {(loop, q) for loop, q in self._subscribers if q is not queue}
+
+    def _dispatch(self, event: dict):
+        if "unreadCount" in event:
+            # Keep this worker's cached badge count in step with writes made by other workers
+            from backend.notification_counter import unread_cache
+            unread_cache.set(event["unreadCount"])
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; the stream's finally block will unsubscribe it
+                pass
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        if queue.full():
+            # Slow client: drop the oldest event rather than block the listener
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    # ---- LISTEN side (Postgres only) ----
+
+    def _ensure_listener(self):
+        from backend.database import engine
+
+        if engine.dialect.name != "postgresql":
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen_forever, name=f"{self.channel}-listener", daemon=True)
+            self._listener.start()
+
+    def _connect(self):
+        listen_url = os.getenv("NOTIFICATION_LISTEN_URL")
+        if listen_url:
+            import psycopg2
+            conn = psycopg2.connect(listen_url)
+        else:
+            from backend.database import engine
+            pooled = engine.raw_connection()
+            pooled.detach()  # Held for the life of the process; keep it out of the pool
+            conn = pooled.driver_connection
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel};")
+        return conn
+
+    def _listen_forever(self):
+        backoff = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                backoff = 1
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        try:
+                            self._dispatch(json.loads(note.payload))
+                        except ValueError:
+                            print(f"Ignoring malformed notification payload: {note.payload[:100]}")
+            except Exception as e:
+                print(f"Notification listener error ({e}), reconnecting in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def shutdown(self):
+        self._stop.set()
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.join(timeout=6)
+
+
+notification_broadcaster = NotificationBroadcaster()
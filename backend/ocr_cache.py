@@ -0,0 +1,135 @@
+"""
+OCR result cache.
+
+Re-scanning the same ID (retakes, returning guests, front/back toggles) used to
+cost a full Gemini round-trip every time. Results are keyed by a SHA-256 digest
+of the decoded image bytes plus the OCR request type, held in a size-bounded
+in-memory LRU and persisted to the `ocr_cache` table so they survive restarts.
+Table reads and writes go through a short session of their own, never the
+request's, so cache bookkeeping can't commit or roll back the caller's work.
+"""
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("OCR_CACHE_SIZE", "256"))
+
+
+def normalize_image_data(image_data: str) -> bytes:
+    """Strip a data-URL header and whitespace, then decode the base64 payload."""
+    if "base64," in image_data:
+        image_data = image_data.split("base64,", 1)[1]
+    image_data = "".join(image_data.split())
+    return base64.b64decode(image_data)
+
+
+def image_digest(image_bytes: bytes, ocr_type: str) -> str:
+    """Cache key: hash of the raw image bytes, namespaced by OCR request type."""
+    h = hashlib.sha256()
+    h.update((ocr_type or "").encode())
+    h.update(b"\x00")
+    h.update(image_bytes)
+    return h.hexdigest()
+
+
+class OCRResultCache:
+    """Thread-safe LRU of extracted OCR JSON with a write-through DB table."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, text: str):
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str, persist: bool = False):
+        """Return cached text for `key` or None. Falls back to the DB table on a memory miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if persist:
+            from sqlalchemy import func
+            from backend.database import SessionLocal
+            from backend.db_models import OCRCacheDB
+
+            db = SessionLocal()
+            try:
+                row = db.query(OCRCacheDB).filter(OCRCacheDB.digest == key).first()
+                if row:
+                    result = row.result
+                    db.query(OCRCacheDB).filter(OCRCacheDB.digest == key).update(
+                        {OCRCacheDB.hit_count: func.coalesce(OCRCacheDB.hit_count, 0) + 1}, synchronize_session=False)
+                    db.commit()
+                    with self._lock:
+                        self._remember(key, result)
+                        self.hits += 1
+                    return result
+            except Exception as e:
+                print(f"OCR cache lookup failed: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, ocr_type: str, text: str, persist: bool = False):
+        with self._lock:
+            self._remember(key, text)
+
+        if persist:
+            from backend.database import SessionLocal
+            from backend.db_models import OCRCacheDB
+
+            db = SessionLocal()
+            try:
+                row = db.query(OCRCacheDB).filter(OCRCacheDB.digest == key).first()
+                if row:
+                    row.result = text
+                else:
+                    db.add(OCRCacheDB(
+                        digest=key,
+                        ocr_type=ocr_type,
+                        result=text,
+                        created_at=datetime.now().isoformat(),
+                        hit_count=0
+                    ))
+                db.commit()
+            except Exception as e:
+                print(f"OCR cache persist failed: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+ocr_cache = OCRResultCache()
@@ -0,0 +1,190 @@
+"""
+Background PDF rendering for checkout.
+
+Checkout used to render the invoice and receipt with fpdf while the DB
+transaction was still open. Now the financial state is committed first and the
+rendering is handed to a process pool; the endpoint returns a job id that can be
+polled (and downloaded) via /api/billing/jobs/{job_id}.
+
+Workers return PDF bytes; the parent process saves them to the document store
+(see backend/document_store.py).
+
+Tunables (environment):
+    PDF_WORKERS   worker processes (default: CPU count)
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or None
+MAX_TRACKED_JOBS = 1000
+RECORD_PATHS_ATTEMPTS = 3
+
+
+def save_checkout_documents(invoice_num: str, rendered: dict) -> dict:
+    """Put rendered invoice/receipt bytes into the document store; returns their keys."""
+    from backend.document_store import get_document_store, invoice_key, receipt_key
+
+    store = get_document_store()
+    paths = {"invoicePath": invoice_key(invoice_num), "receiptPath": None}
+    store.put(paths["invoicePath"], rendered["invoice"])
+    if rendered.get("receipt"):
+        paths["receiptPath"] = receipt_key(invoice_num)
+        store.put(paths["receiptPath"], rendered["receipt"])
+    return paths
+
+
+class PDFJobQueue:
+    def __init__(self, max_workers=PDF_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            try:
+                # Spawn rather than fork: the API process has live DB connections, listener
+                # threads and locks that a forked child would inherit mid-use
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context("spawn"))
+            except (OSError, NotImplementedError) as e:
+                # Some serverless sandboxes have no working multiprocessing primitives
+                print(f"Process pool unavailable ({e}), rendering PDFs on threads")
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers or 2)
+        return self._executor
+
+    def submit(self, booking_id: str, invoice_num: str, booking_data: dict, property_settings: dict,
+               include_receipt: bool) -> str:
+        from backend.billing_utils import render_checkout_documents
+
+        job_id = f"pdf-{str(uuid.uuid4())[:8]}"
+        job = {
+            "jobId": job_id,
+            "bookingId": booking_id,
+            "invoiceNumber": invoice_num,
+            "status": "queued",
+            "invoicePath": None,
+            "receiptPath": None,
+            "error": None,
+            "createdAt": datetime.now().isoformat(),
+            "finishedAt": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                evicted, _ = self._jobs.popitem(last=False)
+                self._futures.pop(evicted, None)
+
+        with self._lock:
+            pool = self._pool()
+        future = pool.submit(render_checkout_documents, booking_data, property_settings,
+                             invoice_num, include_receipt)
+        with self._lock:
+            if job_id in self._jobs:
+                self._futures[job_id] = future
+        # Stays "queued" until the pool hands it to a worker; get() reports "running" from then on
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id: str, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            self._futures.pop(job_id, None)
+        if job is None:
+            return
+
+        try:
+            rendered = future.result()
+            paths = save_checkout_documents(job["invoiceNumber"], rendered)
+        except Exception as e:
+            print(f"PDF job {job_id} failed: {e}")
+            job.update(status="failed", error=str(e), finishedAt=datetime.now().isoformat())
+            return
+
+        job.update(status="done", finishedAt=datetime.now().isoformat(), **paths)
+        self._record_paths(job["bookingId"], paths)
+
+    @staticmethod
+    def _record_paths(booking_id: str, paths: dict):
+        """Store the rendered paths on the booking in a short transaction of its own."""
+        try:
+            from backend.database import SessionLocal
+            from backend.db_models import BookingDB
+        except Exception:
+            return
+
+        from sqlalchemy.orm.exc import StaleDataError
+
+        db = SessionLocal()
+        try:
+            # The booking may be edited while we render; re-read it if the version moved on
+            for _ in range(RECORD_PATHS_ATTEMPTS):
+                booking = db.query(BookingDB).filter(BookingDB.id == booking_id).first()
+                if not booking:
+                    break
+                booking.invoice_path = paths.get("invoicePath")
+                if paths.get("receiptPath"):
+                    booking.receipt_path = paths["receiptPath"]
+                try:
+                    db.commit()
+                    break
+                except StaleDataError:
+                    db.rollback()
+        except Exception as e:
+            print(f"Error saving PDF paths for {booking_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def render_unordered(self, payloads, max_in_flight: int = None):
+        """
+        Render many bookings' documents on the pool, yielding (tag, rendered) as each finishes.
+        `payloads` is an iterable of (tag, booking_data, property_settings, invoice_num, include_receipt);
+        at most `max_in_flight` renders are queued at once so memory stays flat for large batches.
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        from backend.billing_utils import render_checkout_documents
+
+        with self._lock:
+            pool = self._pool()
+        max_in_flight = max_in_flight or 2 * (self.max_workers or os.cpu_count() or 2)
+        pending = {}
+
+        def drain(block_until):
+            done, _ = wait(list(pending), return_when=block_until)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+        for tag, booking_data, property_settings, invoice_num, include_receipt in payloads:
+            future = pool.submit(render_checkout_documents, booking_data, property_settings,
+                                 invoice_num, include_receipt)
+            pending[future] = tag
+            if len(pending) >= max_in_flight:
+                yield from drain(FIRST_COMPLETED)
+        while pending:
+            yield from drain(FIRST_COMPLETED)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            future = self._futures.get(job_id)
+        if job["status"] == "queued" and future is not None and future.running():
+            job["status"] = "running"
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+pdf_jobs = PDFJobQueue()
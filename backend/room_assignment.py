@@ -0,0 +1,425 @@
+"""
+Automatic room assignment for unassigned bookings (/api/bookings/assign-rooms).
+
+Email-parsed and multi-room bookings arrive with room_number 'Unassigned' and
+used to be placed by hand on the calendar. The solver places every unassigned
+Confirmed/CheckedIn booking arriving in a window, one room type at a time,
+around the stays that already hold a room.
+
+Per room type this is interval partitioning: each booking is an interval
+[check_in, check_out) that needs one room for the whole stay (no mid-stay
+moves), and two bookings may share a room only if their intervals don't
+overlap. Bookings are placed in check-in order, which is optimal on an empty
+grid. Among the rooms a stay fits in, the solver picks the best by score:
+
+    requested room        a room number named in special_requests
+    usual room            the room the guest's profile stayed in last
+    floor hint            "high floor" / "low floor" in special_requests
+    group                 next to rooms already given to the same reservation
+                          (or the same room, for its back-to-back stays)
+                          (its first room is picked where the whole group fits
+                          side by side, in room_numbers order)
+    tight fit             smallest idle gap before and after the stay, which
+                          keeps long free runs open for later arrivals
+
+VIP preferences count double, and VIPs choose first among same-day arrivals.
+A booking that fits in no room gets one repair attempt: a stay the solver
+placed earlier is moved (whole) to another free room if that frees one.
+Whatever is still unplaced is reported with the nights on which the room type
+is overbooked (demand above its rooms). If there is no such night, the stay is
+"fragmented": every night has a free room, but not one room for the whole stay.
+
+Result shape:
+    {"start", "end", "applied",
+     "assignments": [{"bookingId", "guestName", "reservationId", "roomTypeId",
+                      "roomNumber", "checkIn", "checkOut", "reasons"}],
+     "unplaced": [{"bookingId", ..., "reason"}],
+     "overbooking": [{"date", "roomTypeId", "roomTypeName", "rooms", "demand", "short"}],
+     "stats": {"bookings", "assigned", "unplaced", "solveMs"}}
+
+Tunables (environment):
+    ROOM_ASSIGNMENT_WINDOW_DAYS   arrival window when no end date is given (default 30)
+"""
+import os
+import re
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, text
+
+WINDOW_DAYS = int(os.getenv("ROOM_ASSIGNMENT_WINDOW_DAYS", "30"))
+UNASSIGNED = "Unassigned"
+PENDING_STATUSES = ("Confirmed", "CheckedIn")
+
+# Scores (higher wins); preferences outrank packing
+W_REQUESTED_ROOM = 100
+W_USUAL_ROOM = 60
+W_GROUP = 50
+W_FLOOR = 30
+VIP_FACTOR = 2
+MAX_GAP_DAYS = 7  # idle days beyond this count the same as an empty room
+
+ROOM_HINT = re.compile(r"\broom\s*(?:no\.?|number|#)?\s*([A-Z]?\d+[A-Z]?)\b", re.I)
+HIGH_FLOOR_HINT = re.compile(r"\b(high|higher|upper|top)\s+floor", re.I)
+LOW_FLOOR_HINT = re.compile(r"\b(low|lower|ground)\s+floor", re.I)
+
+
+def _days(start: str, end: str) -> int:
+    return (date.fromisoformat(end) - date.fromisoformat(start)).days
+
+
+def _nights(check_in: str, check_out: str):
+    day = date.fromisoformat(check_in)
+    last = date.fromisoformat(check_out)
+    while day < last:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def _floor(room_number: str):
+    digits = re.sub(r"\D", "", room_number)
+    return int(digits) // 100 if digits else None
+
+
+class _RoomSchedule:
+    """One room's stays as (check_in, check_out, booking_id, fixed), sorted by check-in."""
+
+    __slots__ = ("starts", "stays")
+
+    def __init__(self):
+        self.starts = []
+        self.stays = []
+
+    def _around(self, check_in: str):
+        i = bisect_left(self.starts, check_in)
+        before = self.stays[i - 1] if i > 0 else None
+        after = self.stays[i] if i < len(self.stays) else None
+        return before, after
+
+    def fits(self, check_in: str, check_out: str) -> bool:
+        i = bisect_left(self.starts, check_in)
+        if i < len(self.starts) and self.starts[i] < check_out:
+            return False
+        return i == 0 or self.stays[i - 1][1] <= check_in
+
+    def gap_days(self, check_in: str, check_out: str) -> int:
+        before, after = self._around(check_in)
+        gap_before = _days(before[1], check_in) if before else MAX_GAP_DAYS
+        gap_after = _days(check_out, after[0]) if after else MAX_GAP_DAYS
+        return min(gap_before, MAX_GAP_DAYS) + min(gap_after, MAX_GAP_DAYS)
+
+    def add(self, stay: tuple):
+        i = bisect_left(self.starts, stay[0])
+        self.starts.insert(i, stay[0])
+        self.stays.insert(i, stay)
+
+    def remove(self, booking_id: str):
+        i = next(i for i, stay in enumerate(self.stays) if stay[2] == booking_id)
+        del self.starts[i]
+        del self.stays[i]
+
+    def overlapping(self, check_in: str, check_out: str) -> list:
+        return [s for s in self.stays if s[0] < check_out and s[1] > check_in]
+
+
+def preference_hints(booking: dict, by_upper: dict, usual_room: str = None) -> dict:
+    """What the booking asks for, limited to this room type's rooms (`by_upper`: upper-cased number -> room)."""
+    notes = booking.get("specialRequests") or ""
+    requested = [m.upper() for m in ROOM_HINT.findall(notes)]
+    floor = "high" if HIGH_FLOOR_HINT.search(notes) else "low" if LOW_FLOOR_HINT.search(notes) else None
+    return {
+        "requested": [by_upper[r] for r in requested if r in by_upper],
+        "usual": usual_room if usual_room in by_upper.values() else None,
+        "floor": floor,
+    }
+
+
+class _TypeSolver:
+    """Places one room type's pending bookings around its fixed stays."""
+
+    def __init__(self, room_type: dict, fixed: list):
+        self.rooms = list(room_type["roomNumbers"])
+        self.index = {room: i for i, room in enumerate(self.rooms)}
+        self.by_upper = {room.upper(): room for room in self.rooms}
+        self.schedule = {room: _RoomSchedule() for room in self.rooms}
+        for room, check_in, check_out, booking_id in fixed:
+            if room in self.schedule:
+                self.schedule[room].add((check_in, check_out, booking_id, True))
+        floors = [f for f in (_floor(r) for r in self.rooms) if f is not None]
+        self.floor_range = (min(floors), max(floors)) if floors else (0, 0)
+        self.placed = {}  # booking id -> room
+
+    def _floor_score(self, room: str, wanted: str) -> float:
+        low, high = self.floor_range
+        floor = _floor(room)
+        if not wanted or floor is None or high == low:
+            return 0.0
+        position = (floor - low) / (high - low)
+        return W_FLOOR * (position if wanted == "high" else 1 - position)
+
+    def choose(self, booking: dict, hints: dict, mates: list, group_size: int):
+        """Best room for `booking` and why, or (None, None) when it fits nowhere."""
+        check_in, check_out = booking["checkIn"], booking["checkOut"]
+        factor = VIP_FACTOR if booking.get("isVIP") else 1
+        mate_indexes = [self.index[room] for room in mates]
+        free = [self.schedule[room].fits(check_in, check_out) for room in self.rooms]
+        # runs[i]: free rooms side by side from room_numbers[i] onwards
+        runs = [0] * (len(self.rooms) + 1)
+        for i in range(len(self.rooms) - 1, -1, -1):
+            runs[i] = runs[i + 1] + 1 if free[i] else 0
+        best = None
+        for i, room in enumerate(self.rooms):
+            if not free[i]:
+                continue
+            schedule = self.schedule[room]
+            score, reasons = 0.0, []
+            if room in hints["requested"]:
+                score += W_REQUESTED_ROOM * factor
+                reasons.append("requested room")
+            elif room == hints["usual"]:
+                score += W_USUAL_ROOM * factor
+                reasons.append("usual room")
+            floor_score = self._floor_score(room, hints["floor"]) * factor
+            if floor_score:
+                score += floor_score
+                if floor_score >= W_FLOOR * factor / 2:
+                    reasons.append(f"{hints['floor']} floor")
+            if mate_indexes:
+                # Distance 0: a mate's back-to-back stay in the same room, the best a group can do
+                distance = min(abs(i - m) for m in mate_indexes)
+                score += W_GROUP / max(distance, 1)
+                if distance == 0:
+                    reasons.append("same room as group")
+                elif distance == 1:
+                    reasons.append("next to group")
+            elif group_size > 1:
+                score += W_GROUP * min(runs[i], group_size) / group_size
+            score -= schedule.gap_days(check_in, check_out)
+            # Ties go to the earlier room in room_numbers order
+            if best is None or score > best[0]:
+                best = (score, room, reasons)
+        return (best[1], best[2]) if best else (None, None)
+
+    def place(self, booking: dict, room: str):
+        self.schedule[room].add((booking["checkIn"], booking["checkOut"], booking["id"], False))
+        self.placed[booking["id"]] = room
+
+    def repair(self, booking: dict, bookings_by_id: dict):
+        """
+        Make room for `booking` by moving one stay this solver placed (whole) to another free
+        room. Returns (room, moved booking id, its new room) or None.
+        """
+        check_in, check_out = booking["checkIn"], booking["checkOut"]
+        for room in self.rooms:
+            blocking = self.schedule[room].overlapping(check_in, check_out)
+            if len(blocking) != 1 or blocking[0][3]:
+                continue
+            moved = bookings_by_id[blocking[0][2]]
+            self.schedule[room].remove(moved["id"])
+            for other in self.rooms:
+                if other != room and self.schedule[other].fits(moved["checkIn"], moved["checkOut"]):
+                    self.place(moved, other)
+                    self.place(booking, room)
+                    return room, moved["id"], other
+            self.schedule[room].add(blocking[0])
+        return None
+
+
+def _units(bookings: list) -> list:
+    """Bookings in placement order, with each reservation's rooms kept together."""
+    groups = {}
+    for b in bookings:
+        groups.setdefault(b.get("reservationId") or b["id"], []).append(b)
+    units = [sorted(members, key=lambda b: (b["checkIn"], b["id"])) for members in groups.values()]
+    # Check-in order; VIPs, then longer stays, pick first on the same day
+    units.sort(key=lambda members: (
+        members[0]["checkIn"],
+        not any(b.get("isVIP") for b in members),
+        -_days(members[0]["checkIn"], members[0]["checkOut"]),
+        members[0]["id"],
+    ))
+    return units
+
+
+def _overbooked_nights(room_type: dict, fixed: list, bookings: list, unplaced: list) -> list:
+    """Nights of the unplaced stays on which the type's demand exceeds its rooms."""
+    rooms = set(room_type["roomNumbers"])
+    wanted = {night for b in unplaced for night in _nights(b["checkIn"], b["checkOut"])}
+    demand = Counter()
+    for room, check_in, check_out, _ in fixed:
+        if room in rooms:
+            demand.update(n for n in _nights(check_in, check_out) if n in wanted)
+    for b in bookings:
+        demand.update(n for n in _nights(b["checkIn"], b["checkOut"]) if n in wanted)
+    return [{
+        "date": night,
+        "roomTypeId": room_type["id"],
+        "roomTypeName": room_type["name"],
+        "rooms": len(rooms),
+        "demand": demand[night],
+        "short": demand[night] - len(rooms),
+    } for night in sorted(wanted) if demand[night] > len(rooms)]
+
+
+def solve(room_types: list, fixed: list, bookings: list, usual_rooms: dict = None) -> dict:
+    """
+    Assign rooms to `bookings` (dicts with id, reservationId, guestName, roomTypeId, checkIn,
+    checkOut, isVIP, specialRequests, profileId) around `fixed` stays
+    ((room, check_in, check_out, booking_id) tuples). `usual_rooms` maps
+    (profile id, room type id) to the guest's last room.
+    """
+    started = time.perf_counter()
+    usual_rooms = usual_rooms or {}
+    types_by_id = {rt["id"]: rt for rt in room_types}
+    by_type = {}
+    for b in bookings:
+        by_type.setdefault(b["roomTypeId"], []).append(b)
+
+    assignments, unplaced, overbooking = [], [], []
+    for type_id, type_bookings in sorted(by_type.items()):
+        room_type = types_by_id.get(type_id)
+        if not room_type or not room_type["roomNumbers"]:
+            unplaced.extend({**_summary(b), "reason": "no rooms configured for this room type"} for b in type_bookings)
+            continue
+        solver = _TypeSolver(room_type, fixed)
+        bookings_by_id = {b["id"]: b for b in type_bookings}
+        reasons_by_id, missed = {}, []
+        for members in _units(type_bookings):
+            for b in members:
+                hints = preference_hints(b, solver.by_upper, usual_rooms.get((b.get("profileId"), type_id)))
+                mates = [solver.placed[m["id"]] for m in members if m["id"] in solver.placed]
+                room, reasons = solver.choose(b, hints, mates, len(members))
+                if room is None:
+                    missed.append(b)
+                    continue
+                solver.place(b, room)
+                reasons_by_id[b["id"]] = reasons
+
+        still_missed = []
+        for b in missed:
+            repaired = solver.repair(b, bookings_by_id)
+            if repaired is None:
+                still_missed.append(b)
+                continue
+            _, moved_id, _ = repaired
+            reasons_by_id[b["id"]] = []
+            reasons_by_id[moved_id] = ["moved to make room"]
+
+        for b in type_bookings:
+            room = solver.placed.get(b["id"])
+            if room is not None:
+                assignments.append({**_summary(b), "roomNumber": room, "reasons": reasons_by_id.get(b["id"], [])})
+
+        if still_missed:
+            nights = _overbooked_nights(room_type, fixed, type_bookings, still_missed)
+            overbooking.extend(nights)
+            short = {n["date"] for n in nights}
+            for b in still_missed:
+                overlaps = any(n in short for n in _nights(b["checkIn"], b["checkOut"]))
+                unplaced.append({**_summary(b), "reason": "overbooked" if overlaps else
+                                 "fragmented: no single room is free for the whole stay"})
+
+    assignments.sort(key=lambda a: (a["checkIn"], a["roomTypeId"], a["roomNumber"]))
+    unplaced.sort(key=lambda u: (u["checkIn"], u["bookingId"]))
+    return {
+        "assignments": assignments,
+        "unplaced": unplaced,
+        "overbooking": overbooking,
+        "stats": {
+            "bookings": len(bookings),
+            "assigned": len(assignments),
+            "unplaced": len(unplaced),
+            "solveMs": round((time.perf_counter() - started) * 1000, 2),
+        },
+    }
+
+
+def _summary(b: dict) -> dict:
+    return {
+        "bookingId": b["id"],
+        "guestName": b["guestName"],
+        "reservationId": b.get("reservationId"),
+        "roomTypeId": b["roomTypeId"],
+        "checkIn": b["checkIn"],
+        "checkOut": b["checkOut"],
+        "isVIP": bool(b.get("isVIP")),
+    }
+
+
+# ---- loading from the database ----
+
+def default_window(start: str = None, end: str = None, today: str = None) -> tuple:
+    start = start or today or date.today().isoformat()
+    end = end or (date.fromisoformat(start) + timedelta(days=WINDOW_DAYS)).isoformat()
+    date.fromisoformat(end)  # ValueError for a malformed end
+    return start, end
+
+
+def pending_bookings(session, start: str, end: str) -> list:
+    """Unassigned Confirmed/CheckedIn BookingDB rows arriving in [start, end)."""
+    from sqlalchemy import or_
+    from backend.db_models import BookingDB
+
+    return (
+        session.query(BookingDB)
+        .filter(or_(BookingDB.room_number.is_(None), BookingDB.room_number == UNASSIGNED))
+        .filter(BookingDB.status.in_(PENDING_STATUSES))
+        .filter(BookingDB.check_in >= start, BookingDB.check_in < end)
+        .order_by(BookingDB.check_in, BookingDB.id)
+        .all()
+    )
+
+
+def booking_input(db_booking) -> dict:
+    return {
+        "id": db_booking.id,
+        "reservationId": db_booking.reservation_id,
+        "guestName": db_booking.guest_name,
+        "roomTypeId": db_booking.room_type_id,
+        "checkIn": db_booking.check_in,
+        "checkOut": db_booking.check_out,
+        "isVIP": bool(db_booking.is_vip),
+        "specialRequests": db_booking.special_requests,
+        "profileId": db_booking.guest_profile_id,
+    }
+
+
+def load_problem(session, bookings: list, excluded_statuses) -> tuple:
+    """Room types, the fixed stays overlapping the pending ones, and the guests' usual rooms."""
+    from backend.db_models import RoomTypeDB
+
+    room_types = [{"id": rt.id, "name": rt.name, "roomNumbers": list(rt.room_numbers or [])}
+                  for rt in session.query(RoomTypeDB).order_by(RoomTypeDB.id).all()]
+    if not bookings:
+        return room_types, [], {}
+
+    horizon_start = min(b["checkIn"] for b in bookings)
+    horizon_end = max(b["checkOut"] for b in bookings)
+    fixed = session.execute(text("""
+        SELECT room_number, check_in, check_out, id FROM bookings
+        WHERE room_number IS NOT NULL AND room_number <> :unassigned
+          AND status NOT IN :excluded
+          AND check_in < :horizon_end AND check_out > :horizon_start
+    """).bindparams(bindparam("excluded", expanding=True)), {
+        "unassigned": UNASSIGNED, "excluded": list(excluded_statuses),
+        "horizon_start": horizon_start, "horizon_end": horizon_end,
+    }).fetchall()
+
+    usual_rooms = {}
+    profile_ids = sorted({b["profileId"] for b in bookings if b["profileId"]})
+    if profile_ids:
+        # Newest first per guest (idx_bookings_guest_profile_checkin); keep the first seen per type
+        history = session.execute(text("""
+            SELECT guest_profile_id, room_type_id, room_number FROM bookings
+            WHERE guest_profile_id IN :profiles AND check_in < :horizon_start
+              AND room_number IS NOT NULL AND room_number <> :unassigned
+            ORDER BY guest_profile_id, check_in DESC
+        """).bindparams(bindparam("profiles", expanding=True)), {
+            "profiles": profile_ids, "horizon_start": horizon_start, "unassigned": UNASSIGNED,
+        }).fetchall()
+        for profile_id, room_type_id, room_number in history:
+            usual_rooms.setdefault((profile_id, room_type_id), room_number)
+
+    return room_types, [tuple(row) for row in fixed], usual_rooms
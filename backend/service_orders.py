@@ -0,0 +1,120 @@
+"""
+In-room service orders (guest menu, laundry) and the department queues.
+
+The guest menu used to PUT the whole booking back with one more folio item, and
+update_booking spotted the order by comparing folio lengths. An order is now
+POSTed to /api/bookings/{id}/orders: the endpoint appends a single FolioItem to
+the booking and inserts one service_orders row in the same transaction, so the
+charge and the queue entry can't disagree.
+
+Each department (F&B, Laundry) works its queue through
+
+    Received -> InProgress -> Ready -> Delivered
+    Received / InProgress -> Cancelled   (the unpaid folio charge is removed)
+
+and staff screens follow it on /api/orders/stream, which sends the open queue on
+connect and then every new order and status change. Events go through a
+NotificationBroadcaster on its own channel (pg_notify across workers).
+
+Event shape:
+    {"kind": "order", "order": {...}}
+"""
+import uuid
+from datetime import datetime, timezone
+
+from backend.notification_stream import NotificationBroadcaster
+
+ORDER_CHANNEL = "pms_service_orders"
+DEPARTMENTS = ("F&B", "Laundry")
+TRANSITIONS = {
+    "Received": {"InProgress", "Cancelled"},
+    "InProgress": {"Ready", "Cancelled"},
+    "Ready": {"Delivered"},
+    "Delivered": set(),
+    "Cancelled": set(),
+}
+OPEN_STATUSES = ("Received", "InProgress", "Ready")
+# Folio description prefix per department
+FOLIO_LABELS = {"F&B": "In-Room Dining", "Laundry": "Laundry"}
+
+order_broadcaster = NotificationBroadcaster(ORDER_CHANNEL)
+
+
+def order_timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def new_order_id() -> str:
+    return f"ord-{uuid.uuid4().hex[:8]}"
+
+
+def order_number(order_id: str) -> str:
+    """Short number read out to the guest and shown on tickets."""
+    return order_id[-4:].upper()
+
+
+def order_amount(items: list) -> float:
+    return round(sum(item["price"] * item.get("quantity", 1) for item in items), 2)
+
+
+def new_order_row(order_id: str, db_booking, order) -> dict:
+    """Column values for a ServiceOrderDB row placed against `db_booking` (order: ServiceOrderCreate)."""
+    items = [item.dict() for item in order.items]
+    now = order_timestamp()
+    return {
+        "id": order_id,
+        "booking_id": db_booking.id,
+        "room_number": db_booking.room_number,
+        "guest_name": db_booking.guest_name,
+        "department": order.department,
+        "status": "Received",
+        "items": items,
+        "amount": order_amount(items),
+        "instructions": order.instructions,
+        "folio_item_id": f"fi-{order_id}",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def folio_item_for(row) -> dict:
+    """The FolioItem charged for an order row."""
+    names = ", ".join(
+        f"{item['name']} x{item['quantity']}" if item.get("quantity", 1) > 1 else item["name"]
+        for item in row.items
+    )
+    return {
+        "id": row.folio_item_id,
+        "description": f"{FOLIO_LABELS[row.department]} - Order #{order_number(row.id)} ({names})",
+        "amount": row.amount,
+        "category": row.department,
+        "timestamp": row.created_at,
+    }
+
+
+def order_to_api(row) -> dict:
+    return {
+        "id": row.id,
+        "number": order_number(row.id),
+        "bookingId": row.booking_id,
+        "roomNumber": row.room_number,
+        "guestName": row.guest_name,
+        "department": row.department,
+        "status": row.status,
+        "items": row.items or [],
+        "amount": row.amount,
+        "instructions": row.instructions,
+        "folioItemId": row.folio_item_id,
+        "createdAt": row.created_at,
+        "updatedAt": row.updated_at,
+    }
+
+
+def publish_order(engine, order: dict):
+    """Push a committed order (new or changed) to open /api/orders/stream clients."""
+    try:
+        with engine.connect() as conn:
+            order_broadcaster.publish(conn, {"kind": "order", "order": order})
+    except Exception as e:
+        # Streams are best-effort; screens reload the queue on reconnect
+        print(f"Error publishing service order event: {e}")
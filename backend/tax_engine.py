@@ -0,0 +1,127 @@
+"""
+GST computation for a booking's bill.
+
+Single source of truth for invoice tax: the PDF invoice, receipts, exports and
+the UI all read the breakdown produced here (cached on `bookings.tax_breakdown`)
+instead of recomputing totals on their own.
+
+Rules:
+    - Room rent and folio items with category 'Room' use the accommodation rate.
+      If Property Settings define `roomGstSlabs` ([{"upTo": 7500, "rate": 12}, {"upTo": None, "rate": 18}]),
+      the slab is picked by the per-night tariff; otherwise the flat `gstRate` applies.
+    - 'F&B' lines use `foodGstRate`; 'Laundry' and 'Other' use `otherGstRate`.
+    - Folio items flagged `isInclusive` already contain tax; the taxable value is backed out.
+    - Tax is computed and rounded per line (half-up to the paisa), then split into equal
+      CGST/SGST halves, each rounded; totals are sums of the rounded line figures.
+"""
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+PAISA = Decimal("0.01")
+
+TAX_CLASS_BY_CATEGORY = {
+    "Room": "accommodation",
+    "F&B": "food",
+    "Laundry": "other",
+    "Other": "other",
+}
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(PAISA, rounding=ROUND_HALF_UP)
+
+
+def _rate(value) -> Decimal:
+    return Decimal(str(value or 0))
+
+
+def room_rate_for_tariff(per_night: Decimal, property_settings: dict) -> Decimal:
+    """Accommodation GST rate for a per-night tariff (slabs if configured, else the flat rate)."""
+    slabs = property_settings.get("roomGstSlabs") or []
+    if slabs:
+        ordered = sorted(slabs, key=lambda s: float("inf") if s.get("upTo") is None else float(s["upTo"]))
+        for slab in ordered:
+            if slab.get("upTo") is None or per_night <= _rate(slab["upTo"]):
+                return _rate(slab.get("rate"))
+    return _rate(property_settings.get("gstRate", 12))
+
+
+def _line(description, category, tax_class, quantity, amount: Decimal, gst_rate: Decimal, inclusive=False):
+    if inclusive:
+        taxable = _money(amount * 100 / (100 + gst_rate))
+        tax = _money(amount) - taxable
+    else:
+        taxable = _money(amount)
+        tax = _money(taxable * gst_rate / 100)
+    cgst = _money(tax / 2)
+    sgst = tax - cgst
+    return {
+        "description": description,
+        "category": category,
+        "taxClass": tax_class,
+        "quantity": quantity,
+        "rate": float(_money(taxable / quantity)) if quantity else float(taxable),
+        "taxableValue": taxable,
+        "gstRate": gst_rate,
+        "cgst": cgst,
+        "sgst": sgst,
+        "tax": tax,
+        "total": taxable + tax,
+    }
+
+
+def compute_tax_breakdown(booking_data: dict, property_settings: dict) -> dict:
+    """Per-line and per-rate GST for a booking (camelCase dicts, as produced by the Pydantic models)."""
+    check_in = datetime.strptime(booking_data["checkIn"], "%Y-%m-%d")
+    check_out = datetime.strptime(booking_data["checkOut"], "%Y-%m-%d")
+    nights = max(1, (check_out - check_in).days)
+
+    room_total = _money(booking_data.get("amount"))
+    room_gst = room_rate_for_tariff(room_total / nights, property_settings)
+    class_rates = {
+        "accommodation": room_gst,
+        "food": _rate(property_settings.get("foodGstRate", 5)),
+        "other": _rate(property_settings.get("otherGstRate", 18)),
+    }
+
+    used_classes = {"accommodation"}
+    lines = [_line(
+        f"Room Rent (#{booking_data.get('roomNumber')}) - {booking_data.get('roomTypeName', 'Standard')}",
+        "Room", "accommodation", nights, room_total, room_gst
+    )]
+    for item in booking_data.get("folio") or []:
+        tax_class = TAX_CLASS_BY_CATEGORY.get(item.get("category"), "other")
+        used_classes.add(tax_class)
+        lines.append(_line(
+            item.get("description", ""), item.get("category", "Other"), tax_class, 1,
+            _money(item.get("amount")), class_rates[tax_class], inclusive=bool(item.get("isInclusive"))
+        ))
+
+    by_rate = {}
+    for line in lines:
+        bucket = by_rate.setdefault(line["gstRate"], {"taxableValue": Decimal(0), "cgst": Decimal(0), "sgst": Decimal(0), "tax": Decimal(0)})
+        for field in bucket:
+            bucket[field] += line[field]
+
+    taxable = sum((l["taxableValue"] for l in lines), Decimal(0))
+    cgst = sum((l["cgst"] for l in lines), Decimal(0))
+    sgst = sum((l["sgst"] for l in lines), Decimal(0))
+    total_tax = cgst + sgst
+
+    def out(d):
+        return {k: float(v) if isinstance(v, Decimal) else v for k, v in d.items()}
+
+    return {
+        "nights": nights,
+        "lines": [out(l) for l in lines],
+        "byRate": [out({"gstRate": rate, **vals}) for rate, vals in sorted(by_rate.items())],
+        "roomTotal": float(room_total),
+        "folioTotal": float(sum((l["taxableValue"] for l in lines[1:]), Decimal(0))),
+        "taxableValue": float(taxable),
+        "cgst": float(cgst),
+        "sgst": float(sgst),
+        "totalTax": float(total_tax),
+        "grandTotal": float(taxable + total_tax),
+        # Only the classes this booking uses, so a rate change elsewhere leaves the cached value equal
+        "rates": {k: float(v) for k, v in class_rates.items() if k in used_classes},
+    }
@@ -18,10 +18,10 @@ import {
   PointerSensor,
   KeyboardSensor
 } from '@dnd-kit/core';
-import { RoomType, SyncEvent, Booking, GuestDetails, RoomSecurityStatus, ChannelStatus, OTAConnection, FolioItem, Payment, PropertySettings } from '../types';
+import { RoomType, SyncEvent, Booking, GuestDetails, RoomSecurityStatus, ChannelStatus, OTAConnection, FolioItem, Payment, PropertySettings, FrontDeskToday, FrontDeskBoardRow } from '../types';
 import GuestProfilePage from './GuestProfilePage';
 import NewBookingModal from './NewBookingModal';
-import { createBulkBookings, updateBooking, transferBooking, lookupGuest, fetchBookings } from '../api';
+import { createBulkBookings, updateBooking, patchBooking, updateBookingStatus, transferBooking, lookupGuest, fetchBooking, fetchBookings, fetchFrontDeskToday, BookingConflictError } from '../api';
 import { NATIONALITIES } from '../constants';
 
 interface FrontDeskViewProps {
@@ -38,6 +38,8 @@ const CELL_WIDTH = 140;
 const CELL_HEIGHT = 48;
 const HEADER_HEIGHT = 48; // Matching room row height
 const STICKY_HEADER_TOTAL_HEIGHT = 104; // Monthly row (24) + Date row (48) + padding-y (16*2)
+// The board is revalidated by ETag, so a poll with nothing new costs a 304
+const BOARD_POLL_MS = 30000;
 
 const STATUS_STYLES: Record<string, string> = {
   'Confirmed': 'bg-blue-600 text-white shadow-blue-900/10',
@@ -336,25 +338,59 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     return assignedBookings.filter(b => (b as any).reservationId === resId);
   }, [selectedBooking, assignedBookings]);
 
-  const todayStr = new Date().toISOString().split('T')[0];
+  // The desk's day (arrivals, departures, in-house, unassigned, room status) comes from the
+  // server-computed board, not from the full booking list; the tape chart still uses syncEvents
+  const [todayBoard, setTodayBoard] = useState<FrontDeskToday | null>(null);
+  const [boardRevision, setBoardRevision] = useState(0);
+  const refreshBoard = () => setBoardRevision(r => r + 1);
+  useEffect(() => {
+    let cancelled = false;
+    const load = () => fetchFrontDeskToday()
+      .then(board => { if (!cancelled && board) setTodayBoard(board); })
+      .catch(err => console.error("Failed to load the front desk board", err));
+    const timer = setTimeout(load, 300);
+    const interval = setInterval(load, BOARD_POLL_MS);
+    return () => { cancelled = true; clearTimeout(timer); clearInterval(interval); };
+  }, [boardRevision]);
 
   // Group arrivals by reservationId to show one entry per multi-room booking
   const todaysArrivals = useMemo(() => {
-    const arrivals = assignedBookings.filter(b => b.checkIn === todayStr && b.status === 'Confirmed');
-    const grouped: Record<string, Booking[]> = {};
-    arrivals.forEach(b => {
-      const key = (b as any).reservationId || b.id;
+    const grouped: Record<string, FrontDeskBoardRow[]> = {};
+    (todayBoard?.arrivals ?? []).forEach(row => {
+      const key = row.reservationId || row.id;
       if (!grouped[key]) grouped[key] = [];
-      grouped[key].push(b);
+      grouped[key].push(row);
     });
     return Object.values(grouped).map(group => ({
       ...group[0],
       _roomCount: group.length,
       _allRooms: group
-    })).sort((a, b) => a.guestName.localeCompare(b.guestName));
-  }, [assignedBookings, todayStr]);
+    }));
+  }, [todayBoard]);
+
+  const todaysDepartures = todayBoard?.departures ?? [];
+
+  // Board rows are slim; load the whole booking when one is opened
+  const openBoardBooking = async (bookingId: string) => {
+    try {
+      setSelectedBooking(await fetchBooking(bookingId));
+    } catch (err: any) {
+      setToastMessage(`Error: ${err.message}`);
+      setTimeout(() => setToastMessage(null), 3000);
+    }
+  };
+
+  // Keep the server's copy after a write (it carries the new version)
+  const applyServerBooking = (saved: Booking) => {
+    setSyncEvents(prev => prev.map(e => e.id === saved.id && e.type === 'booking' ? { ...saved, type: 'booking' } as SyncEvent : e));
+    setSelectedBooking(prev => prev?.id === saved.id ? saved : prev);
+    refreshBoard();
+  };
 
-  const todaysDepartures = useMemo(() => assignedBookings.filter(b => b.checkOut === todayStr && b.status === 'CheckedIn').sort((a, b) => a.guestName.localeCompare(b.guestName)), [assignedBookings, todayStr]);
+  // Someone else saved first: drop the optimistic edit and show what is there now
+  const handleWriteConflict = (err: any) => {
+    if (err instanceof BookingConflictError && err.current) applyServerBooking(err.current);
+  };
 
   const handleDragStart = (event: any) => {
     const booking = assignedBookings.find(b => b.id === event.active.id);
@@ -407,8 +443,9 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
       // Update local state and then persist
       setSyncEvents(prev => prev.map(e => e.id === active.id && e.type === 'booking' ? { ...updatedBooking, type: 'booking' } as SyncEvent : e));
 
-      updateBooking(updatedBooking).catch(err => {
+      patchBooking(currentBooking.id, { roomNumber: newRoomNumber, roomTypeId: newRoomTypeId, checkIn: updatedBooking.checkIn, checkOut: updatedBooking.checkOut }).then(applyServerBooking).catch(err => {
         console.error("Failed to persist drag update", err);
+        handleWriteConflict(err);
         setToastMessage(`Persistence Error: ${err.message}`);
         setTimeout(() => setToastMessage(null), 3000);
       });
@@ -427,9 +464,10 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     setSyncEvents(prev => prev.map(e => e.id === bookingId && e.type === 'booking' ? { ...updated, type: 'booking' } as SyncEvent : e));
 
     try {
-      await updateBooking(updated);
+      applyServerBooking(await patchBooking(bookingId, { checkOut: updated.checkOut }));
     } catch (err: any) {
       console.error("Failed to persist resize update", err);
+      handleWriteConflict(err);
       setToastMessage(`Persistence Error: ${err.message}`);
       setTimeout(() => setToastMessage(null), 3000);
     }
@@ -448,9 +486,10 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     if (selectedBooking?.id === bookingId) setSelectedBooking(updated);
 
     try {
-      await updateBooking(updated);
+      applyServerBooking(await updateBookingStatus(bookingId, updated.status));
     } catch (err: any) {
       console.error("Failed to persist status update", err);
+      handleWriteConflict(err);
       setToastMessage(`Persistence Error: ${err.message}`);
       setTimeout(() => setToastMessage(null), 3000);
     }
@@ -466,9 +505,10 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     if (selectedBooking?.id === bookingId) setSelectedBooking(updated);
 
     try {
-      await updateBooking(updated);
+      applyServerBooking(await patchBooking(bookingId, { isVIP: updated.isVIP }));
     } catch (err: any) {
       console.error("Failed to persist VIP toggle", err);
+      handleWriteConflict(err);
       // We could revert local state here if needed
     }
   };
@@ -483,11 +523,12 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     if (selectedBooking?.id === bookingId) setSelectedBooking(updated);
 
     try {
-      await updateBooking(updated);
+      applyServerBooking(await patchBooking(bookingId, { isSettled: updated.isSettled }));
       setToastMessage(updated.isSettled ? "Folio marked as Settled" : "Folio marked as Unsettled");
       setTimeout(() => setToastMessage(null), 3000);
     } catch (err: any) {
       console.error("Failed to persist settlement update", err);
+      handleWriteConflict(err);
       setToastMessage(`Persistence Error: ${err.message}`);
       setTimeout(() => setToastMessage(null), 3000);
     }
@@ -503,11 +544,12 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     if (selectedBooking?.id === bookingId) setSelectedBooking(updated);
 
     try {
-      await updateBooking(updated);
+      applyServerBooking(await patchBooking(bookingId, { folio: updatedFolio }, booking.version));
       setToastMessage("Folio updated successfully");
       setTimeout(() => setToastMessage(null), 3000);
     } catch (err: any) {
       console.error("Failed to update folio", err);
+      handleWriteConflict(err);
       setToastMessage(`Persistence Error: ${err.message}`);
       setTimeout(() => setToastMessage(null), 3000);
     }
@@ -523,11 +565,12 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     if (selectedBooking?.id === bookingId) setSelectedBooking(updated);
 
     try {
-      await updateBooking(updated);
+      applyServerBooking(await patchBooking(bookingId, { specialRequests: requests }));
       setToastMessage("Guest requests updated");
       setTimeout(() => setToastMessage(null), 3000);
     } catch (err: any) {
       console.error("Failed to update special requests", err);
+      handleWriteConflict(err);
       setToastMessage(`Persistence Error: ${err.message}`);
       setTimeout(() => setToastMessage(null), 3000);
     }
@@ -543,11 +586,12 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     if (selectedBooking?.id === bookingId) setSelectedBooking(updated);
 
     try {
-      await updateBooking(updated);
+      applyServerBooking(await patchBooking(bookingId, { payments }, booking.version));
       setToastMessage("Payment recorded successfully");
       setTimeout(() => setToastMessage(null), 3000);
     } catch (err: any) {
       console.error("Failed to update payments", err);
+      handleWriteConflict(err);
       setToastMessage(`Persistence Error: ${err.message}`);
       setTimeout(() => setToastMessage(null), 3000);
     }
@@ -562,10 +606,12 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
       const response = await updateBooking(updatedBooking);
       setSyncEvents(prev => prev.map(e => e.id === updatedBooking.id && e.type === 'booking' ? { ...response, type: 'booking' } as SyncEvent : e));
       if (selectedBooking?.id === updatedBooking.id) setSelectedBooking(response);
+      refreshBoard();
       setToastMessage("Booking updated successfully");
       setTimeout(() => setToastMessage(null), 3000);
     } catch (err: any) {
       console.error("Failed to update booking", err);
+      handleWriteConflict(err);
       setToastMessage(`Persistence Error: ${err.message}`);
       setTimeout(() => setToastMessage(null), 3000);
     }
@@ -698,6 +744,7 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
     try {
       const savedBookings = await createBulkBookings(newBookings);
       setSyncEvents(prev => [...prev, ...savedBookings.map(b => ({ ...b, type: 'booking' } as SyncEvent))]);
+      refreshBoard();
       setIsNewBookingModalOpen(false);
       setToastMessage(`Successfully booked ${savedBookings.length} rooms!`);
       setTimeout(() => setToastMessage(null), 3000);
@@ -1084,6 +1131,32 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
         <div className="w-56 bg-white border-l border-slate-200 h-full overflow-y-auto hidden xl:flex flex-col shrink-0 z-30 shadow-2xl custom-scrollbar">
           <div className="p-6 border-b border-slate-100 bg-slate-50/50"><h3 className="text-lg font-black text-slate-900 tracking-tight flex items-center gap-2"><Zap className="w-5 h-5 text-amber-500" />Live Activity</h3><p className="text-xs text-slate-500 font-bold mt-1 uppercase tracking-widest">{new Date().toLocaleDateString('en-US', { weekday: 'long', month: 'short', day: 'numeric' })}</p></div>
           <div className="flex-1 p-6 space-y-8">
+            {todayBoard && (
+              <div className="space-y-3 p-4 bg-slate-50 rounded-2xl border border-slate-100">
+                <div className="flex items-center justify-between"><h4 className="text-[10px] font-black text-slate-400 uppercase tracking-[0.2em]">Tonight</h4><span className="text-[10px] font-black text-slate-500">{todayBoard.businessDate}</span></div>
+                <div className="grid grid-cols-2 gap-2">
+                  {([
+                    ['In House', todayBoard.counts.inHouse, 'text-emerald-600'],
+                    ['Occupied', todayBoard.counts.rooms.occupied, 'text-emerald-600'],
+                    ['Departing', todayBoard.counts.rooms.departing, 'text-rose-600'],
+                    ['Arriving', todayBoard.counts.rooms.arriving, 'text-indigo-600'],
+                    ['Vacant', todayBoard.counts.rooms.vacant, 'text-slate-600'],
+                    ['Unassigned', todayBoard.counts.unassigned, 'text-amber-600'],
+                  ] as [string, number, string][]).map(([label, count, color]) => (
+                    <div key={label} className="bg-white rounded-xl border border-slate-100 px-2.5 py-2">
+                      <p className={`text-lg font-black leading-none ${color}`}>{count}</p>
+                      <p className="text-[8px] font-black text-slate-400 uppercase tracking-widest mt-1">{label}</p>
+                    </div>
+                  ))}
+                </div>
+                {todayBoard.unassigned.map(row => (
+                  <button key={row.id} onClick={() => openBoardBooking(row.id)} className="w-full flex items-center justify-between gap-2 px-3 py-2 bg-white rounded-xl border border-amber-100 hover:border-amber-300 text-left transition-all">
+                    <span className="text-[10px] font-black text-slate-900 uppercase tracking-tighter truncate">{row.guestName}</span>
+                    <span className="text-[8px] font-black text-amber-600 uppercase tracking-widest shrink-0">{row.checkIn} · No Room</span>
+                  </button>
+                ))}
+              </div>
+            )}
             <div className="space-y-4 p-4 bg-indigo-50/40 rounded-2xl border border-indigo-100/50">
               <div className="flex items-center justify-between"><h4 className="text-[10px] font-black text-slate-400 uppercase tracking-[0.2em]">Today's Arrivals</h4><span className="text-[10px] font-black bg-indigo-600 text-white px-2 py-0.5 rounded-lg shadow-md">{todaysArrivals.length}</span></div>
               {todaysArrivals.length === 0 ? (<div className="text-center py-6 text-slate-400 text-[10px] font-black uppercase tracking-widest bg-white rounded-2xl border border-slate-100">All Checked In</div>) : (todaysArrivals.map((b: any) => (
@@ -1104,7 +1177,7 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
                       <span className="font-black text-indigo-600 ml-1 bg-indigo-50 px-1.5 py-0.5 rounded shadow-sm">#{b.roomNumber || 'TBD'}</span>
                     </div>
                   </div>
-                  <button onClick={() => setSelectedBooking(b)} className="w-full py-2.5 bg-indigo-600 hover:bg-indigo-700 text-white text-[10px] font-black uppercase tracking-[0.2em] rounded-2xl transition-all shadow-xl shadow-indigo-200 flex items-center justify-center gap-3">Check-In <ArrowRightCircle className="w-4 h-4" /></button>
+                  <button onClick={() => openBoardBooking(b.id)} className="w-full py-2.5 bg-indigo-600 hover:bg-indigo-700 text-white text-[10px] font-black uppercase tracking-[0.2em] rounded-2xl transition-all shadow-xl shadow-indigo-200 flex items-center justify-center gap-3">Check-In <ArrowRightCircle className="w-4 h-4" /></button>
                 </div>
               )))}
             </div>
@@ -1126,7 +1199,7 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
                   <div className="flex items-center justify-between mb-3 px-1">
                     <div className="text-[10px] text-slate-500 font-bold uppercase tracking-widest">Room <span className="font-black text-rose-600 ml-1 bg-rose-50 px-1.5 py-0.5 rounded shadow-sm">#{b.roomNumber}</span></div>
                   </div>
-                  <button onClick={() => setSelectedBooking(b)} className="w-full py-2.5 bg-slate-900 hover:bg-black text-white text-[10px] font-black uppercase tracking-[0.2em] rounded-2xl transition-all shadow-xl flex items-center justify-center gap-3">Process Check-Out <LogOut className="w-4 h-4" /></button>
+                  <button onClick={() => openBoardBooking(b.id)} className="w-full py-2.5 bg-slate-900 hover:bg-black text-white text-[10px] font-black uppercase tracking-[0.2em] rounded-2xl transition-all shadow-xl flex items-center justify-center gap-3">Process Check-Out <LogOut className="w-4 h-4" /></button>
                 </div>
               )))}
             </div>
@@ -1161,6 +1234,7 @@ const FrontDeskView: React.FC<FrontDeskViewProps> = ({ roomTypes, connections, s
                   keepRate,
                   transferFolio
                 });
+                refreshBoard();
 
                 // Update local state
                 setSyncEvents(prev => {
@@ -9,8 +9,8 @@ import {
   Minus, ArrowRightCircle, AlertTriangle, Printer, Check, History, IndianRupee,
   Camera, Upload, Loader2, Keyboard, Save
 } from 'lucide-react';
-import { Booking, RoomType, SyncEvent, FolioItem, GuestDetails, Payment, PropertySettings } from '../types';
-import { fetchGuestHistory, updateBooking, lookupGuest } from '../api';
+import { Booking, RoomType, SyncEvent, FolioItem, GuestDetails, Payment, PropertySettings, GuestSuggestion } from '../types';
+import { fetchGuestHistory, updateBooking, suggestGuests, fetchGuestProfile } from '../api';
 import { NATIONALITIES } from '../constants';
 
 interface GuestProfilePageProps {
@@ -130,7 +130,7 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
   const [pendingDeleteSide, setPendingDeleteSide] = useState<{ side: typeof activeSide; addIdx: number } | null>(null);
 
   // Repeat Guest Lookup State
-  const [lookupResults, setLookupResults] = useState<any[]>([]);
+  const [lookupResults, setLookupResults] = useState<GuestSuggestion[]>([]);
   const [isLookupLoading, setIsLookupLoading] = useState(false);
   const [showLookupDropdown, setShowLookupDropdown] = useState(false);
 
@@ -420,7 +420,7 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
     if (field === 'phoneNumber' && value && value.length >= 4) {
       setIsLookupLoading(true);
       try {
-        const results = await lookupGuest(undefined, value);
+        const results = await suggestGuests(value);
         if (results && results.length > 0) {
           setLookupResults(results);
           setShowLookupDropdown(true);
@@ -437,7 +437,15 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
     }
   };
 
-  const selectGuestFromLookup = (guest: any) => {
+  const selectGuestFromLookup = async (suggestion: GuestSuggestion) => {
+    let guest: any;
+    try {
+      guest = await fetchGuestProfile(suggestion.id);
+    } catch (err) {
+      console.error("Failed to load guest profile", err);
+      setToastMessage("Could not load guest profile.");
+      return;
+    }
     setEditableDetails(prev => ({
       ...prev,
       profileId: guest.profileId || guest.id,
@@ -709,7 +717,7 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
     const loadHistory = async () => {
       setLoadingHistory(true);
       try {
-        const data = await fetchGuestHistory(booking.guestName, editableDetails?.phoneNumber, booking.id);
+        const data = await fetchGuestHistory(booking.guestName, editableDetails?.phoneNumber, booking.id, editableDetails?.profileId || booking.guestProfileId);
         setHistory(data);
       } catch (err) {
         console.error("Failed to load visit history:", err);
@@ -718,7 +726,7 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
       }
     };
     loadHistory();
-  }, [booking.id, booking.guestName, editableDetails?.phoneNumber]);
+  }, [booking.id, booking.guestName, editableDetails?.phoneNumber, editableDetails?.profileId]);
 
   const frontSrc = idImages.front;
   const backSrc = idImages.back;
@@ -1038,11 +1046,22 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
     let totalFolioTax = 0;
     let totalFolioBase = 0;
 
-    const folioRows = (booking.folio || []).map(item => {
-      const rate = item.category === 'F&B' ? foodGstRate : otherGstRate;
+    // Prefer the backend's cached GST breakdown so the printout matches the PDF invoice
+    const breakdown = booking.taxBreakdown;
+    const breakdownLines = breakdown && breakdown.lines.length === (booking.folio || []).length + 1
+      ? breakdown.lines.slice(1)
+      : null;
+
+    const folioRows = (booking.folio || []).map((item, idx) => {
+      const line = breakdownLines?.[idx];
+      let rate = item.category === 'F&B' ? foodGstRate : otherGstRate;
       let base, tax;
 
-      if (item.isInclusive) {
+      if (line) {
+        rate = line.gstRate;
+        base = line.taxableValue;
+        tax = line.tax;
+      } else if (item.isInclusive) {
         // Derive base from total (inclusive)
         base = item.amount / (1 + rate / 100);
         tax = item.amount - base;
@@ -1064,11 +1083,11 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
       };
     });
 
-    const netSubtotal = roomBaseTotal + totalFolioBase;
-    const totalTax = roomTax + totalFolioTax;
-    const finalNetInvoiceTotal = netSubtotal + totalTax;
-    const cgst = totalTax / 2;
-    const sgst = totalTax / 2;
+    const netSubtotal = breakdownLines ? breakdown!.taxableValue : roomBaseTotal + totalFolioBase;
+    const totalTax = breakdownLines ? breakdown!.totalTax : roomTax + totalFolioTax;
+    const finalNetInvoiceTotal = breakdownLines ? breakdown!.grandTotal : netSubtotal + totalTax;
+    const cgst = breakdownLines ? breakdown!.cgst : totalTax / 2;
+    const sgst = breakdownLines ? breakdown!.sgst : totalTax / 2;
 
     const invoiceHtml = `
       <html>
@@ -1559,9 +1578,9 @@ const GuestProfilePage: React.FC<GuestProfilePageProps> = ({
                                 <div className="flex-1 overflow-hidden">
                                   <div className="flex items-center justify-between">
                                     <p className="text-xs font-black text-slate-900 truncate uppercase">{guest.name}</p>
-                                    <span className="text-[8px] font-black text-slate-400">ID: #{guest.profileId || guest.id}</span>
+                                    <span className="text-[8px] font-black text-slate-400">ID: #{guest.id}</span>
                                   </div>
-                                  <p className="text-[9px] font-bold text-slate-500 truncate">{guest.idType}: {guest.idNumber}</p>
+                                  <p className="text-[9px] font-bold text-slate-500 truncate">{guest.phoneMasked} · {guest.stayCount} stay{guest.stayCount === 1 ? '' : 's'}</p>
                                 </div>
                                 <ArrowRightCircle className="w-4 h-4 text-indigo-500" />
                               </button>
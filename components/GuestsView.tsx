@@ -9,7 +9,7 @@ import {
 } from 'lucide-react';
 import { Booking, RoomType, SyncEvent } from '../types';
 import GuestProfilePage from './GuestProfilePage';
-import { updateBooking } from '../api';
+import { patchBooking, updateBookingStatus } from '../api';
 
 interface GuestsViewProps {
   syncEvents: SyncEvent[];
@@ -122,7 +122,8 @@ const GuestsView: React.FC<GuestsViewProps> = ({ syncEvents, setSyncEvents, room
     setActiveMenu(null);
 
     try {
-      await updateBooking(updated);
+      const saved = await updateBookingStatus(bookingId, updated.status);
+      setSyncEvents(prev => prev.map(e => e.id === bookingId && e.type === 'booking' ? { ...saved, type: 'booking' } as SyncEvent : e));
     } catch (err) {
       console.error("Failed to persist status update in GuestsView", err);
     }
@@ -138,7 +139,8 @@ const GuestsView: React.FC<GuestsViewProps> = ({ syncEvents, setSyncEvents, room
     if (selectedBooking?.id === bookingId) setSelectedBooking(updated);
 
     try {
-      await updateBooking(updated);
+      const saved = await patchBooking(bookingId, { isVIP: updated.isVIP });
+      setSyncEvents(prev => prev.map(e => e.id === bookingId && e.type === 'booking' ? { ...saved, type: 'booking' } as SyncEvent : e));
     } catch (err) {
       console.error("Failed to persist VIP toggle in GuestsView", err);
     }
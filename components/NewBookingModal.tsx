@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useMemo, useRef, useCallback } from 'react';
 import { X, Plus, Minus, Calendar, Bed, User, ArrowRight, CheckCircle2, AlertTriangle, Search, Smartphone, Mail, Sparkles, RotateCcw, Globe } from 'lucide-react';
-import { RoomType, Booking, SyncEvent, GuestDetails } from '../types';
-import { lookupGuest } from '../api';
+import { RoomType, Booking, SyncEvent, GuestDetails, GuestSuggestion } from '../types';
+import { suggestGuests, fetchGuestProfile } from '../api';
 
 interface NewBookingModalProps {
     isOpen: boolean;
@@ -69,7 +69,7 @@ export default function NewBookingModal({ isOpen, onClose, roomTypes, syncEvents
             setIsSearching(true);
             debounceTimeoutRef.current = setTimeout(async () => {
                 try {
-                    const data = await lookupGuest(undefined, phoneNumber);
+                    const data = await suggestGuests(phoneNumber);
                     if (Array.isArray(data) && data.length > 0) {
                         setFoundGuest(data);
                     } else {
@@ -94,8 +94,15 @@ export default function NewBookingModal({ isOpen, onClose, roomTypes, syncEvents
         };
     }, [phoneNumber]);
 
-    const applyGuestDetails = (guest: any) => {
-        if (!guest) return;
+    const applyGuestDetails = async (suggestion: GuestSuggestion) => {
+        if (!suggestion) return;
+        let guest: any;
+        try {
+            guest = await fetchGuestProfile(suggestion.id);
+        } catch (err) {
+            console.error("Failed to load guest profile", err);
+            return;
+        }
         setGuestName(guest.name || '');
         setPhoneNumber(guest.phone_number || phoneNumber);
         setEmail(guest.email || '');
@@ -377,7 +384,7 @@ export default function NewBookingModal({ isOpen, onClose, roomTypes, syncEvents
                                         </button>
                                     </div>
                                     <div className="space-y-3 max-h-[240px] overflow-y-auto custom-scrollbar">
-                                        {foundGuest.map((guest: any, idx: number) => (
+                                        {foundGuest.map((guest: GuestSuggestion, idx: number) => (
                                             <div
                                                 key={guest.id || idx}
                                                 className="p-5 bg-indigo-600 rounded-2xl text-white shadow-xl relative overflow-hidden group hover:bg-indigo-700 transition-all cursor-pointer"
@@ -395,7 +402,7 @@ export default function NewBookingModal({ isOpen, onClose, roomTypes, syncEvents
                                                             <h3 className="text-lg font-black truncate max-w-[200px]">{guest.name}</h3>
                                                             <div className="flex items-center gap-3 mt-0.5">
                                                                 <p className="text-[10px] font-bold opacity-70">
-                                                                    {guest.idType}: {guest.idNumber ? `••••${guest.idNumber.slice(-4)}` : 'Verified'}
+                                                                    {guest.phoneMasked} · {guest.stayCount} stay{guest.stayCount === 1 ? '' : 's'}
                                                                 </p>
                                                                 {guest.lastCheckIn && (
                                                                     <p className="text-[10px] font-bold opacity-50">
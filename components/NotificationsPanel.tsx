@@ -1,7 +1,7 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { Bell, X, Check, CheckCheck, Trash2, Calendar, CreditCard, Users, Home, AlertTriangle, Settings, Filter } from 'lucide-react';
 import { Notification, NotificationType } from '../types';
-import { fetchNotifications, markNotificationRead, markAllNotificationsRead, dismissNotification } from '../api';
+import { fetchNotificationPage, markNotificationRead, markAllNotificationsRead, dismissNotification } from '../api';
 
 interface NotificationsPanelProps {
     isOpen: boolean;
@@ -43,6 +43,8 @@ const FILTER_TABS: { id: string; label: string; types: NotificationType[] | null
     { id: 'system', label: 'System', types: ['system', 'housekeeping', 'guest_request'] }
 ];
 
+const PAGE_SIZE = 30;
+
 const formatTimeAgo = (dateString: string): string => {
     const date = new Date(dateString);
     const now = new Date();
@@ -62,18 +64,46 @@ const NotificationsPanel: React.FC<NotificationsPanelProps> = ({ isOpen, onClose
     const [notifications, setNotifications] = useState<Notification[]>([]);
     const [loading, setLoading] = useState(true);
     const [activeTab, setActiveTab] = useState('all');
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const sentinelRef = useRef<HTMLDivElement>(null);
+    const requestRef = useRef(0);
+
+    const activeTypes = FILTER_TABS.find(t => t.id === activeTab)?.types ?? undefined;
 
     const loadNotifications = useCallback(async () => {
+        const request = ++requestRef.current;
         setLoading(true);
         try {
-            const data = await fetchNotifications();
-            setNotifications(data);
+            const page = await fetchNotificationPage({ types: activeTypes, limit: PAGE_SIZE });
+            if (request !== requestRef.current) return; // Tab changed while loading
+            setNotifications(page.notifications);
+            setNextCursor(page.nextCursor);
         } catch (error) {
             console.error('Failed to load notifications:', error);
         } finally {
-            setLoading(false);
+            if (request === requestRef.current) setLoading(false);
+        }
+    }, [activeTab]);
+
+    const loadMore = useCallback(async () => {
+        if (!nextCursor || loadingMore) return;
+        const request = requestRef.current;
+        setLoadingMore(true);
+        try {
+            const page = await fetchNotificationPage({ types: activeTypes, before: nextCursor, limit: PAGE_SIZE });
+            if (request !== requestRef.current) return;
+            setNotifications(prev => {
+                const seen = new Set(prev.map(n => n.id));
+                return [...prev, ...page.notifications.filter(n => !seen.has(n.id))];
+            });
+            setNextCursor(page.nextCursor);
+        } catch (error) {
+            console.error('Failed to load more notifications:', error);
+        } finally {
+            setLoadingMore(false);
         }
-    }, []);
+    }, [activeTab, nextCursor, loadingMore]);
 
     useEffect(() => {
         if (isOpen) {
@@ -81,6 +111,17 @@ const NotificationsPanel: React.FC<NotificationsPanelProps> = ({ isOpen, onClose
         }
     }, [isOpen, loadNotifications]);
 
+    // Infinite scroll: fetch the next page when the end of the list comes into view
+    useEffect(() => {
+        const sentinel = sentinelRef.current;
+        if (!sentinel || !nextCursor) return;
+        const observer = new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) loadMore();
+        }, { rootMargin: '200px' });
+        observer.observe(sentinel);
+        return () => observer.disconnect();
+    }, [nextCursor, loadMore]);
+
     const handleMarkRead = async (notificationId: string) => {
         try {
             await markNotificationRead(notificationId);
@@ -110,11 +151,8 @@ const NotificationsPanel: React.FC<NotificationsPanelProps> = ({ isOpen, onClose
         }
     };
 
-    const filteredNotifications = notifications.filter(n => {
-        const tab = FILTER_TABS.find(t => t.id === activeTab);
-        if (!tab || !tab.types) return true;
-        return tab.types.includes(n.type);
-    });
+    // Tabs are filtered server-side; this only guards against rows from a previous tab
+    const filteredNotifications = notifications.filter(n => !activeTypes || activeTypes.includes(n.type));
 
     const unreadCount = notifications.filter(n => !n.isRead).length;
 
@@ -250,6 +288,13 @@ const NotificationsPanel: React.FC<NotificationsPanelProps> = ({ isOpen, onClose
                             </div>
                         ))
                     )}
+                    {!loading && nextCursor && (
+                        <div ref={sentinelRef} className="flex items-center justify-center py-3">
+                            {loadingMore && (
+                                <div className="w-5 h-5 border-2 border-blue-500 border-t-transparent rounded-full animate-spin" />
+                            )}
+                        </div>
+                    )}
                 </div>
             </div>
 
@@ -0,0 +1,63 @@
+"""
+Shared setup for the API tests.
+
+backend/database.py binds its engine to DATABASE_URL when main is first imported,
+so the whole pytest run shares one throwaway SQLite database, configured here
+before any test module is collected. Tests pick their own ids (and room types)
+so they don't see each other's rows.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["BILLING_DIR"] = os.path.join(_tmp, "Billing")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# A manual Gemini model probe (needs an API key), not a test
+collect_ignore = ["test_models.py"]
+
+
+@pytest.fixture(scope="session")
+def app_db():
+    """The `main` module with its database connected; refuses anything but the test database."""
+    import main
+
+    main._load_db_imports()
+    # backend/database.py lets .env.local override DATABASE_URL; never seed a real database
+    assert main.USE_DATABASE()
+    assert main.engine.url.get_backend_name() == "sqlite", "refusing to run against a non-test database"
+    return main
+
+
+@pytest.fixture(scope="session")
+def client(app_db):
+    from fastapi.testclient import TestClient
+
+    return TestClient(app_db.app)
+
+
+@pytest.fixture(scope="session")
+def room_type(app_db):
+    """Create a room type once per run: room_type(id, room_numbers, base_price=1000) -> id."""
+    from backend.database import SessionLocal
+    from backend.db_models import RoomTypeDB
+
+    def create(room_type_id, room_numbers, base_price=1000):
+        db = SessionLocal()
+        try:
+            if not db.get(RoomTypeDB, room_type_id):
+                db.add(RoomTypeDB(
+                    id=room_type_id, name=room_type_id, total_capacity=len(room_numbers), base_price=base_price,
+                    floor_price=base_price * 0.8, ceiling_price=base_price * 2, base_occupancy=2,
+                    room_numbers=list(room_numbers)
+                ))
+                db.commit()
+        finally:
+            db.close()
+        return room_type_id
+
+    return create
@@ -1,10 +1,10 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, Response, Body, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from collections import defaultdict
+from contextlib import asynccontextmanager
 import json
 
 # ========== LAZY IMPORTS FOR VERCEL COMPATIBILITY ==========
@@ -27,9 +27,16 @@ from backend.models import (
     Hotel, 
     RoomType, 
     Booking, 
+    BookingStatusUpdate,
+    RoomAssignment,
+    RoomAutoAssignRequest,
+    FolioItem,
+    ServiceOrderCreate,
+    ServiceOrderStatusUpdate,
     OTAConnection, 
     RateRulesConfig, 
     RoomTransferRequest, 
+    NightAuditRequest,
     GuestProfile, 
     PropertySettings,
     OCRRequest,
@@ -85,6 +92,14 @@ def _load_db_imports():
             pass
         Base.metadata.create_all(bind=engine)
         
+        # Notifications queued on a session are written in its commit (backend/notification_outbox.py)
+        from backend.database import SessionLocal as _SessionLocal
+        from backend.notification_outbox import register as _register_outbox
+        _register_outbox(_SessionLocal)
+        # Booking commits refresh the cached front desk board (backend/frontdesk_board.py)
+        from backend.frontdesk_board import register as _register_board
+        _register_board(_SessionLocal)
+        
         _USE_DATABASE = True
         print("✓ Connected to PostgreSQL database")
         
@@ -108,14 +123,54 @@ def get_db():
     else:
         yield None
 
-app = FastAPI(title="SyncGuard PMS API")
+NOTIFICATION_RECONCILE_SECONDS = float(os.getenv("NOTIFICATION_RECONCILE_SECONDS", "900"))
+NOTIFICATION_RETENTION_SECONDS = float(os.getenv("NOTIFICATION_RETENTION_SECONDS", "86400"))
+NIGHT_AUDIT_CHECK_SECONDS = float(os.getenv("NIGHT_AUDIT_CHECK_SECONDS", "900"))
 
-# Mount Billing folder for PDF access (only if directory can be created)
-try:
-    os.makedirs("Billing", exist_ok=True)
-    app.mount("/billing", StaticFiles(directory="Billing"), name="billing")
-except Exception:
-    pass  # Skip on Vercel where filesystem is read-only
+async def _run_periodically(interval: float, job, label: str):
+    import asyncio
+    from starlette.concurrency import run_in_threadpool
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(job)
+        except Exception as e:
+            print(f"{label} failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the shared upstream clients, the PDF worker pool and background jobs for the life of the process."""
+    import asyncio
+    from backend.clients import client_registry
+    app.state.clients = client_registry
+    jobs = []
+    if NOTIFICATION_RECONCILE_SECONDS > 0:
+        jobs.append(asyncio.create_task(_run_periodically(
+            NOTIFICATION_RECONCILE_SECONDS, reconcile_notification_count, "Notification counter reconciliation")))
+    if NOTIFICATION_RETENTION_SECONDS > 0:
+        jobs.append(asyncio.create_task(_run_periodically(
+            NOTIFICATION_RETENTION_SECONDS, run_notification_retention, "Notification retention")))
+    if NIGHT_AUDIT_CHECK_SECONDS > 0:
+        jobs.append(asyncio.create_task(_run_periodically(
+            NIGHT_AUDIT_CHECK_SECONDS, run_due_night_audits, "Night audit")))
+    yield
+    for job in jobs:
+        job.cancel()
+    client_registry.close()
+    
+    from backend.pdf_jobs import pdf_jobs
+    pdf_jobs.shutdown()
+    
+    from backend.notification_stream import notification_broadcaster
+    notification_broadcaster.shutdown()
+    
+    from backend.service_orders import order_broadcaster
+    order_broadcaster.shutdown()
+
+app = FastAPI(title="SyncGuard PMS API", lifespan=lifespan)
+
+# Invoices/receipts are served from the document store by the /billing/{filename} route below
+# (backend/document_store.py), so no writable Billing/ mount is needed.
 
 @app.get("/ping")
 def ping():
@@ -260,59 +315,95 @@ from pydantic import BaseModel
 #     image: str # Base64 string
 #     type: str # 'id' or 'form'
 
-@app.post("/api/ocr")
-def process_ocr(request: OCRRequest, db=Depends(get_db)):
-    # 1. Get API Key from DB
+OCR_MAX_UPLOAD_BYTES = int(float(os.getenv("OCR_MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+OCR_MAX_UPLOAD_PAGES = int(os.getenv("OCR_MAX_UPLOAD_PAGES", "4"))
+# Whole-request budget for /api/ocr/upload: every page at the cap plus multipart boundaries and form fields
+OCR_MAX_REQUEST_BYTES = OCR_MAX_UPLOAD_BYTES * OCR_MAX_UPLOAD_PAGES + 64 * 1024
+
+class _OCRUploadLimit:
+    """
+    ASGI wrapper that enforces OCR_MAX_REQUEST_BYTES while the multipart body is still
+    arriving. FastAPI parses (and Starlette spools) the form before the endpoint runs,
+    so a check inside the endpoint only fires after the whole body is on disk. Here an
+    oversized Content-Length is refused before the first chunk is read, and chunked
+    bodies are cut off as soon as they pass the budget.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/api/ocr/upload":
+            return await self.app(scope, receive, send)
+
+        too_large = HTTPException(status_code=413, detail=f"OCR uploads are limited to {OCR_MAX_UPLOAD_PAGES} pages of {OCR_MAX_UPLOAD_BYTES // (1024 * 1024)}MB")
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > OCR_MAX_REQUEST_BYTES:
+            # Raised from receive so the route's exception handling turns it into a 413
+            async def reject():
+                raise too_large
+            return await self.app(scope, reject, send)
+
+        received = 0
+
+        async def bounded_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > OCR_MAX_REQUEST_BYTES:
+                    raise too_large
+            return message
+
+        await self.app(scope, bounded_receive, send)
+
+app.add_middleware(_OCRUploadLimit)
+
+def _get_gemini_api_key(db):
+    """Gemini key from Property Settings, falling back to the env var for dev."""
     api_key = None
     if USE_DATABASE() and db:
         prop = db.query(PropertySettingsDB).filter(PropertySettingsDB.id == "default").first()
         if prop and prop.gemini_api_key:
             api_key = prop.gemini_api_key
     
-    # Fallback to env var if not in DB (for dev)
     if not api_key:
         api_key = os.getenv("GEMINI_API_KEY")
 
     if not api_key:
         raise HTTPException(status_code=400, detail="Gemini API Key not configured in Property Settings")
-
-    try:
-        # Lazy import google-genai to avoid import-time failures on Vercel
-        from google import genai
-        from google.genai import types
-        
-        # Use the newer google-genai SDK
-        client = genai.Client(api_key=api_key)
-        
-        # Clean base64 header if present
-        image_data = request.image
-        if "base64," in image_data:
-            image_data = image_data.split("base64,")[1]
-            
-        try:
-             image_bytes = base64.b64decode(image_data)
-        except:
-             raise HTTPException(status_code=400, detail="Invalid image data")
-
-        prompt = ""
-        if request.type in ['id', 'id_front']:
-            prompt = "Extract guest name, ID number, address, DOB (YYYY-MM-DD), gender, nationality from this ID card. Return as clean JSON with these keys: name, idNumber, address, dob, gender, nationality. Only return the JSON."
-        elif request.type == 'id_back':
-            prompt = "Extract the full address, PIN code, and Father/Husband name from this ID card (Back Side). Return as clean JSON with these keys: address, pinCode, fatherName. Ensure the 'address' field contains the complete address text found."
-        else:
-            prompt = "Extract all guest information from this registration form. Return as clean JSON. Only return the JSON."
-
-        # List of models to try (prioritizing stable ones with higher/separate quota)
-        models_to_try = [
-            'gemini-flash-latest', 
-            'gemini-1.5-flash',
-            'gemini-1.5-flash-8b',
-            'gemini-2.0-flash' 
-        ]
-
-        response = None
-        last_error = None
-
+    return api_key
+
+def _ocr_prompt(ocr_type: str) -> str:
+    if ocr_type in ['id', 'id_front']:
+        return "Extract guest name, ID number, address, DOB (YYYY-MM-DD), gender, nationality from this ID card. Return as clean JSON with these keys: name, idNumber, address, dob, gender, nationality. Only return the JSON."
+    elif ocr_type == 'id_back':
+        return "Extract the full address, PIN code, and Father/Husband name from this ID card (Back Side). Return as clean JSON with these keys: address, pinCode, fatherName. Ensure the 'address' field contains the complete address text found."
+    elif ocr_type == 'visa':
+        return "Extract visa number, visa type, place of issue, issue date (YYYY-MM-DD) and expiry date (YYYY-MM-DD) from this visa page. Return as clean JSON with these keys: visaNumber, visaType, visaPlaceIssue, visaIssueDate, visaExpiry. Only return the JSON."
+    return "Extract all guest information from this registration form. Return as clean JSON. Only return the JSON."
+
+def _run_ocr_model(image_bytes: bytes, ocr_type: str, api_key: str, mime_type: str = 'image/jpeg'):
+    """Send one image to Gemini. Returns (text, is_json). Safe to call from worker threads (no DB access)."""
+    # Lazy import google-genai to avoid import-time failures on Vercel
+    from google.genai import types
+    from backend.clients import client_registry
+    
+    # Shared client per API key (keeps the HTTP pool warm across scans)
+    client = client_registry.gemini(api_key)
+    prompt = _ocr_prompt(ocr_type)
+
+    # List of models to try (prioritizing stable ones with higher/separate quota)
+    models_to_try = [
+        'gemini-flash-latest', 
+        'gemini-1.5-flash',
+        'gemini-1.5-flash-8b',
+        'gemini-2.0-flash' 
+    ]
+
+    response = None
+    last_error = None
+
+    with client_registry.slot("gemini"):
         for model_name in models_to_try:
             try:
                 print(f"Attempting OCR with model: {model_name}")
@@ -320,7 +411,7 @@ def process_ocr(request: OCRRequest, db=Depends(get_db)):
                     model=model_name,
                     contents=[
                         prompt,
-                        types.Part.from_bytes(data=image_bytes, mime_type='image/jpeg')
+                        types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
                     ]
                 )
                 if response:
@@ -329,23 +420,131 @@ def process_ocr(request: OCRRequest, db=Depends(get_db)):
                 print(f"Model {model_name} failed: {e}")
                 last_error = e
                 # Continue to next model
-        
-        if not response:
-            raise last_error or HTTPException(status_code=500, detail="All OCR models failed")
-        
-        text = response.text
-        # Clean markdown
-        json_match = re.search(r'(\{[\s\S]*\})', text)
-        if json_match:
-            return {"text": json_match.group(1)}
-        else:
-            return {"text": text}
+    
+    if not response:
+        raise last_error or HTTPException(status_code=500, detail="All OCR models failed")
+    
+    text = response.text
+    # Clean markdown
+    json_match = re.search(r'(\{[\s\S]*\})', text)
+    if json_match:
+        return json_match.group(1), True
+    return text, False
+
+@app.post("/api/ocr")
+def process_ocr(request: OCRRequest, db=Depends(get_db)):
+    """Base64-in-JSON OCR. Kept as a compatibility shim; prefer /api/ocr/upload."""
+    from backend.ocr_cache import ocr_cache, normalize_image_data, image_digest
+
+    # 0. Decode once and check the digest cache before spending a Gemini call
+    try:
+        image_bytes = normalize_image_data(request.image)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+
+    persist = USE_DATABASE()
+    cache_key = image_digest(image_bytes, request.type)
+    cached_text = ocr_cache.get(cache_key, persist)
+    if cached_text is not None:
+        return {"text": cached_text, "cached": True}
+
+    # 1. Get API Key
+    api_key = _get_gemini_api_key(db)
+
+    try:
+        text, is_json = _run_ocr_model(image_bytes, request.type, api_key)
+        if is_json:
+            # Only cache results that look like extracted JSON, never raw model chatter
+            ocr_cache.put(cache_key, request.type, text, persist)
+        return {"text": text, "cached": False}
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _read_upload(upload: UploadFile, max_bytes: int, chunk_size: int = 256 * 1024) -> bytes:
+    """
+    Read an uploaded page in bounded chunks, giving up with a 413 as soon as it passes
+    max_bytes rather than pulling an oversized part into memory. The request as a whole
+    is already capped by _OCRUploadLimit while it streams in.
+    """
+    chunks = []
+    size = 0
+    while chunk := upload.file.read(chunk_size):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"{upload.filename} exceeds the {max_bytes // (1024 * 1024)}MB upload limit")
+        chunks.append(chunk)
+    if size == 0:
+        raise HTTPException(status_code=400, detail=f"Empty upload: {upload.filename}")
+    return b"".join(chunks)
+
+@app.post("/api/ocr/upload")
+def process_ocr_upload(files: List[UploadFile] = File(...), types: List[str] = Form(...), db=Depends(get_db)):
+    """
+    Multipart OCR for one or more pages (e.g. id_front, id_back, visa) in a single request.
+    Send `files` and a matching `types` field per page, in the same order.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.ocr_cache import ocr_cache, image_digest
+
+    if len(files) != len(types):
+        raise HTTPException(status_code=400, detail="Each uploaded file needs a matching 'types' entry")
+    if len(files) > OCR_MAX_UPLOAD_PAGES:
+        raise HTTPException(status_code=413, detail=f"At most {OCR_MAX_UPLOAD_PAGES} pages per OCR upload")
+
+    persist = USE_DATABASE()
+    pages = []
+    for upload, ocr_type in zip(files, types):
+        image_bytes = _read_upload(upload, OCR_MAX_UPLOAD_BYTES)
+        cache_key = image_digest(image_bytes, ocr_type)
+        cached_text = ocr_cache.get(cache_key, persist)
+        pages.append({
+            "type": ocr_type,
+            "filename": upload.filename,
+            "mime_type": upload.content_type or 'image/jpeg',
+            "key": cache_key,
+            "bytes": None if cached_text is not None else image_bytes,
+            "text": cached_text,
+            "cached": cached_text is not None
+        })
+
+    misses = [p for p in pages if not p["cached"]]
+    if misses:
+        api_key = _get_gemini_api_key(db)
+        try:
+            # Pages are independent; the Gemini slot limit still bounds total concurrency
+            with ThreadPoolExecutor(max_workers=len(misses)) as pool:
+                results = list(pool.map(
+                    lambda p: _run_ocr_model(p["bytes"], p["type"], api_key, p["mime_type"]),
+                    misses
+                ))
+        except HTTPException:
+            raise
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=str(e))
+
+        for page, (text, is_json) in zip(misses, results):
+            page["text"] = text
+            if is_json:
+                ocr_cache.put(page["key"], page["type"], text, persist)
+
+    return {
+        "pages": [
+            {"type": p["type"], "filename": p["filename"], "text": p["text"], "cached": p["cached"]}
+            for p in pages
+        ]
+    }
+
+@app.get("/api/ocr/cache-stats")
+def get_ocr_cache_stats():
+    """Hit/miss counters for the OCR digest cache"""
+    from backend.ocr_cache import ocr_cache
+    return ocr_cache.stats()
+
 # ========== EMAIL RESERVATION PARSER ==========
 @app.post("/api/webhooks/inbound-email")
 def handle_inbound_email(email: InboundEmail, db=Depends(get_db)):
@@ -382,9 +581,8 @@ def handle_inbound_email(email: InboundEmail, db=Depends(get_db)):
 
     # 3. Call Gemini to parse
     try:
-        from google import genai
-        from google.genai import types
-        client = genai.Client(api_key=api_key)
+        from backend.clients import client_registry
+        client = client_registry.gemini(api_key)
         
         # We prefer TextBody but can use HTML as fallback
         content_to_parse = email.TextBody or email.HtmlBody or ""
@@ -417,18 +615,19 @@ def handle_inbound_email(email: InboundEmail, db=Depends(get_db)):
         response = None
         last_err = None
         
-        for model_name in models_to_try:
-            try:
-                print(f"Attempting Email Parsing with model: {model_name}")
-                response = client.models.generate_content(
-                    model=model_name,
-                    contents=[prompt, content_to_parse]
-                )
-                if response and response.text:
-                    break
-            except Exception as e:
-                print(f"Model {model_name} failed for email parsing: {e}")
-                last_err = e
+        with client_registry.slot("gemini"):
+            for model_name in models_to_try:
+                try:
+                    print(f"Attempting Email Parsing with model: {model_name}")
+                    response = client.models.generate_content(
+                        model=model_name,
+                        contents=[prompt, content_to_parse]
+                    )
+                    if response and response.text:
+                        break
+                except Exception as e:
+                    print(f"Model {model_name} failed for email parsing: {e}")
+                    last_err = e
         
         if not response or not response.text:
              raise last_err or HTTPException(status_code=500, detail="All AI models failed to parse email content")
@@ -479,6 +678,7 @@ def handle_inbound_email(email: InboundEmail, db=Depends(get_db)):
         )
         
         if USE_DATABASE() and db:
+            _refresh_tax_breakdown(db, new_booking)
             db.add(new_booking)
             db.commit()
             db.refresh(new_booking)
@@ -526,8 +726,8 @@ def create_razorpay_order(request: RazorpayOrderRequest, db=Depends(get_db)):
         raise HTTPException(status_code=400, detail="Razorpay credentials not configured. Please set them in Property Setup > Integrations.")
     
     try:
-        import razorpay
-        client = razorpay.Client(auth=(key_id, key_secret))
+        from backend.clients import client_registry
+        client = client_registry.razorpay(key_id, key_secret)
         
         # Amount in paise (INR * 100)
         order_data = {
@@ -540,7 +740,8 @@ def create_razorpay_order(request: RazorpayOrderRequest, db=Depends(get_db)):
             }
         }
         
-        order = client.order.create(data=order_data)
+        with client_registry.slot("razorpay"):
+            order = client.order.create(data=order_data, timeout=client_registry.razorpay_timeout)
         return {
             "order_id": order["id"],
             "amount": request.amount,
@@ -549,9 +750,13 @@ def create_razorpay_order(request: RazorpayOrderRequest, db=Depends(get_db)):
         }
     except ImportError:
         raise HTTPException(status_code=500, detail="Razorpay SDK not installed. Run: pip install razorpay")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create Razorpay order: {str(e)}")
 
+RAZORPAY_WRITE_ATTEMPTS = 3
+
 @app.post("/api/razorpay/verify-payment")
 def verify_razorpay_payment(request: RazorpayVerifyRequest, db=Depends(get_db)):
     """Verify Razorpay payment signature and record payment"""
@@ -578,47 +783,59 @@ def verify_razorpay_payment(request: RazorpayVerifyRequest, db=Depends(get_db)):
     
     # Payment verified! Now add to booking
     if USE_DATABASE() and db:
-        booking = db.query(BookingDB).filter(BookingDB.id == request.bookingId).first()
-        if not booking:
-            raise HTTPException(status_code=404, detail="Booking not found")
-        
-        # Create payment record
-        new_payment = {
-            "id": request.razorpay_payment_id,
-            "amount": request.amount,
-            "method": "Card",  # Razorpay handles multiple methods
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
-            "category": "Partial",
-            "description": f"Online Payment (Razorpay)",
-            "status": "Completed"
-        }
+        from sqlalchemy.orm.exc import StaleDataError
         
-        # Add to payments list
-        current_payments = booking.payments or []
-        if isinstance(current_payments, str):
-            import json
-            current_payments = json.loads(current_payments)
-        current_payments.append(new_payment)
-        booking.payments = current_payments
-        
-        # Auto-reconcile: Mark unpaid folio items as paid (oldest first)
-        remaining = request.amount
-        current_folio = booking.folio or []
-        if isinstance(current_folio, str):
-            import json
-            current_folio = json.loads(current_folio)
-        
-        for item in current_folio:
-            if remaining <= 0:
+        # A callback has no one to show a 409 to: re-read the booking and re-apply on a version clash
+        for attempt in range(RAZORPAY_WRITE_ATTEMPTS):
+            booking = db.query(BookingDB).filter(BookingDB.id == request.bookingId).first()
+            if not booking:
+                raise HTTPException(status_code=404, detail="Booking not found")
+            
+            # Add to payments list
+            current_payments = booking.payments or []
+            if isinstance(current_payments, str):
+                import json
+                current_payments = json.loads(current_payments)
+            if any(p.get('id') == request.razorpay_payment_id for p in current_payments):
+                break  # Already recorded (e.g. a retried callback)
+            
+            # Create payment record
+            new_payment = {
+                "id": request.razorpay_payment_id,
+                "amount": request.amount,
+                "method": "Card",  # Razorpay handles multiple methods
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "category": "Partial",
+                "description": f"Online Payment (Razorpay)",
+                "status": "Completed"
+            }
+            booking.payments = current_payments + [new_payment]
+            
+            # Auto-reconcile: Mark unpaid folio items as paid (oldest first)
+            remaining = request.amount
+            current_folio = booking.folio or []
+            if isinstance(current_folio, str):
+                import json
+                current_folio = json.loads(current_folio)
+            current_folio = [dict(item) for item in current_folio]
+            
+            for item in current_folio:
+                if remaining <= 0:
+                    break
+                if not item.get('isPaid', False):
+                    item['isPaid'] = True
+                    item['paymentMethod'] = 'Card'
+                    item['paymentId'] = request.razorpay_payment_id
+                    remaining -= item.get('amount', 0)
+            
+            booking.folio = current_folio
+            try:
+                db.commit()
                 break
-            if not item.get('isPaid', False):
-                item['isPaid'] = True
-                item['paymentMethod'] = 'Card'
-                item['paymentId'] = request.razorpay_payment_id
-                remaining -= item.get('amount', 0)
-        
-        booking.folio = current_folio
-        db.commit()
+            except StaleDataError:
+                db.rollback()
+        else:
+            raise HTTPException(status_code=409, detail="Booking kept changing while recording the payment; retry")
         
         return {"status": "success", "payment_id": request.razorpay_payment_id, "message": "Payment recorded successfully"}
     
@@ -639,6 +856,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # --- Fallback Data (lazy) ---
@@ -786,8 +1004,11 @@ def db_booking_to_pydantic(db_booking):
         receiptPath=db_booking.receipt_path,
         isAutoGenerated=getattr(db_booking, 'is_auto_generated', False),
         externalReferenceId=getattr(db_booking, 'external_reference_id', None),
+        guestProfileId=getattr(db_booking, 'guest_profile_id', None),
+        version=getattr(db_booking, 'version', None),
         folio=safe_json_list(db_booking.folio),
-        payments=safe_json_list(db_booking.payments)
+        payments=safe_json_list(db_booking.payments),
+        taxBreakdown=getattr(db_booking, 'tax_breakdown', None)
     )
 
 def db_connection_to_pydantic(db_conn):
@@ -830,117 +1051,14 @@ def db_property_to_pydantic(db_prop):
         lastInvoiceNumber=db_prop.last_invoice_number if hasattr(db_prop, 'last_invoice_number') else 0,
         checkInTime=db_prop.check_in_time if hasattr(db_prop, 'check_in_time') else "12:00",
         checkOutTime=db_prop.check_out_time if hasattr(db_prop, 'check_out_time') else "11:00",
-        loyaltyTiers=db_prop.loyalty_tiers if hasattr(db_prop, 'loyalty_tiers') else []
+        loyaltyTiers=db_prop.loyalty_tiers if hasattr(db_prop, 'loyalty_tiers') else [],
+        roomGstSlabs=db_prop.room_gst_slabs if getattr(db_prop, 'room_gst_slabs', None) else []
     )
 
 def _sync_guest_profile(gd, check_in_date, db):
-    """Helper to sync GuestDetails with GuestProfileDB"""
-    if not gd or not gd.name or not gd.phoneNumber:
-        return None
-        
-    existing_profile = None
-    if gd.profileId:
-        existing_profile = db.query(GuestProfileDB).filter(GuestProfileDB.id == gd.profileId).first()
-    
-    if not existing_profile:
-        # Try exact name + phone match first
-        existing_profile = db.query(GuestProfileDB).filter(
-            GuestProfileDB.name == gd.name,
-            GuestProfileDB.phone_number == gd.phoneNumber
-        ).first()
-        
-    if not existing_profile:
-        # Fallback to phone number only (useful for slight name variations)
-        existing_profile = db.query(GuestProfileDB).filter(
-            GuestProfileDB.phone_number == gd.phoneNumber
-        ).order_by(GuestProfileDB.last_check_in.desc()).first()
-        
-    if existing_profile:
-        # Update...
-        if gd.idType: existing_profile.id_type = gd.idType
-        if gd.idNumber: existing_profile.id_number = gd.idNumber
-        if gd.address: existing_profile.address = gd.address
-        if gd.dob: existing_profile.dob = gd.dob
-        if gd.nationality: existing_profile.nationality = gd.nationality
-        if gd.gender: existing_profile.gender = gd.gender
-        if gd.email: existing_profile.email = gd.email
-        if gd.passportNumber: existing_profile.passport_number = gd.passportNumber
-        if gd.passportPlaceIssue: existing_profile.passport_place_issue = gd.passportPlaceIssue
-        if gd.passportIssueDate: existing_profile.passport_issue_date = gd.passportIssueDate
-        if gd.passportExpiry: existing_profile.passport_expiry = gd.passportExpiry
-        if gd.visaNumber: existing_profile.visa_number = gd.visaNumber
-        if gd.visaType: existing_profile.visa_type = gd.visaType
-        if gd.visaPlaceIssue: existing_profile.visa_place_issue = gd.visaPlaceIssue
-        if gd.visaIssueDate: existing_profile.visa_issue_date = gd.visaIssueDate
-        if gd.visaExpiry: existing_profile.visa_expiry = gd.visaExpiry
-        if gd.arrivedFrom: existing_profile.arrived_from = gd.arrivedFrom
-        if gd.arrivalDateIndia: existing_profile.arrival_date_india = gd.arrivalDateIndia
-        if gd.arrivalPort: existing_profile.arrival_port = gd.arrivalPort
-        if gd.nextDestination: existing_profile.next_destination = gd.nextDestination
-        if gd.purposeOfVisit: existing_profile.purpose_of_visit = gd.purposeOfVisit
-        if gd.idImage: existing_profile.id_image = gd.idImage
-        if gd.idImageBack: existing_profile.id_image_back = gd.idImageBack
-        if gd.visaPage: existing_profile.visa_page = gd.visaPage
-        if gd.additionalDocs: existing_profile.additional_docs = gd.additionalDocs
-        if gd.formPages: existing_profile.form_pages = gd.formPages
-        if gd.serialNumber: existing_profile.serial_number = gd.serialNumber
-        if gd.fatherOrHusbandName: existing_profile.father_or_husband_name = gd.fatherOrHusbandName
-        if gd.city: existing_profile.city = gd.city
-        if gd.state: existing_profile.state = gd.state
-        if gd.pinCode: existing_profile.pin_code = gd.pinCode
-        if gd.country: existing_profile.country = gd.country
-        if gd.arrivalTime: existing_profile.arrival_time = gd.arrivalTime
-        if gd.departureTime: existing_profile.departure_time = gd.departureTime
-        if gd.signature: existing_profile.signature = gd.signature
-        
-        existing_profile.last_check_in = check_in_date
-        db.flush()
-        return existing_profile.id
-    else:
-        # Create...
-        new_profile = GuestProfileDB(
-            name=gd.name,
-            phone_number=gd.phoneNumber or "",
-            id_type=gd.idType,
-            id_number=gd.idNumber,
-            address=gd.address,
-            dob=gd.dob,
-            nationality=gd.nationality,
-            gender=gd.gender,
-            email=gd.email,
-            passport_number=gd.passportNumber,
-            passport_place_issue=gd.passportPlaceIssue,
-            passport_issue_date=gd.passportIssueDate,
-            passport_expiry=gd.passportExpiry,
-            visa_number=gd.visaNumber,
-            visa_type=gd.visaType,
-            visa_place_issue=gd.visaPlaceIssue,
-            visa_issue_date=gd.visaIssueDate,
-            visa_expiry=gd.visaExpiry,
-            arrived_from=gd.arrivedFrom,
-            arrival_date_india=gd.arrivalDateIndia,
-            arrival_port=gd.arrivalPort,
-            next_destination=gd.nextDestination,
-            purpose_of_visit=gd.purposeOfVisit,
-            id_image=gd.idImage,
-            id_image_back=gd.idImageBack,
-            visa_page=gd.visaPage,
-            additional_docs=gd.additionalDocs or [],
-            form_pages=gd.formPages or [],
-            serial_number=gd.serialNumber,
-            father_or_husband_name=gd.fatherOrHusbandName,
-            city=gd.city,
-            state=gd.state,
-            pin_code=gd.pinCode,
-            country=gd.country,
-            arrival_time=gd.arrivalTime,
-            departure_time=gd.departureTime,
-            signature=gd.signature,
-            last_check_in=check_in_date
-        )
-        db.add(new_profile)
-        db.flush()
-        return new_profile.id
+    """Helper to sync GuestDetails with GuestProfileDB (one upsert, see backend/guest_profile_sync.py)"""
+    from backend.guest_profile_sync import upsert_guest_profiles
+    return upsert_guest_profiles(db, [(gd, check_in_date)])[0]
 
 @app.get("/")
 def read_root():
@@ -1072,7 +1190,13 @@ def get_property_settings(db=Depends(get_db)):
         prop = db.query(PropertySettingsDB).filter(PropertySettingsDB.id == "default").first()
         if not prop:
             return get_fallback_property()
-        return db_property_to_pydantic(prop)
+        settings = db_property_to_pydantic(prop)
+        try:
+            from backend.invoice_sequence import current_invoice_number
+            settings.lastInvoiceNumber = current_invoice_number(engine)
+        except Exception as e:
+            print(f"Error reading invoice sequence: {e}")
+        return settings
     return get_fallback_property()
 
 @app.put("/api/property")
@@ -1083,6 +1207,27 @@ def update_property_settings(settings: PropertySettings, db=Depends(get_db)):
             prop = PropertySettingsDB(id="default")
             db.add(prop)
         
+        from backend.invoice_sequence import current_invoice_number, set_last_invoice_number
+        # Numbering can only be moved forward from here: a settings form loaded before
+        # a checkout would otherwise wind the counter back and re-issue numbers.
+        current_serial = current_invoice_number(engine)
+        if settings.lastInvoiceNumber and settings.lastInvoiceNumber > current_serial:
+            set_last_invoice_number(engine, settings.lastInvoiceNumber)
+            current_serial = settings.lastInvoiceNumber
+        
+        new_slabs = [s.dict() for s in settings.roomGstSlabs] if settings.roomGstSlabs is not None else (prop.room_gst_slabs or [])
+        rates_changed = (
+            prop.gst_rate != settings.gstRate or
+            prop.food_gst_rate != settings.foodGstRate or
+            prop.other_gst_rate != settings.otherGstRate or
+            (prop.room_gst_slabs or []) != new_slabs
+        )
+        credentials_changed = (
+            prop.gemini_api_key != settings.geminiApiKey or
+            prop.razorpay_key_id != settings.razorpayKeyId or
+            prop.razorpay_key_secret != settings.razorpayKeySecret
+        )
+        
         prop.name = settings.name
         prop.address = settings.address
         prop.phone = settings.phone
@@ -1093,88 +1238,152 @@ def update_property_settings(settings: PropertySettings, db=Depends(get_db)):
         prop.other_gst_rate = settings.otherGstRate
         prop.razorpay_key_id = settings.razorpayKeyId
         prop.razorpay_key_secret = settings.razorpayKeySecret
-        prop.last_invoice_number = settings.lastInvoiceNumber or 0
         prop.public_base_url = settings.publicBaseUrl
         prop.gemini_api_key = settings.geminiApiKey
         prop.check_in_time = settings.checkInTime
         prop.check_out_time = settings.checkOutTime
         if settings.loyaltyTiers is not None:
             prop.loyalty_tiers = [t.dict() for t in settings.loyaltyTiers]
+        prop.room_gst_slabs = new_slabs
         
         db.commit()
         db.refresh(prop)
-        return db_property_to_pydantic(prop)
+        
+        if rates_changed:
+            # Cached breakdowns of open bookings were computed with the old rates;
+            # checked-out bookings keep the tax that was actually invoiced.
+            from sqlalchemy.orm.exc import StaleDataError
+            prop_dict = db_property_to_pydantic(prop).dict()
+            room_type_names = {rt.id: rt.name for rt in db.query(RoomTypeDB).all()}
+            # The settings are already saved; a booking written meanwhile just means another pass
+            for _ in range(3):
+                open_bookings = db.query(BookingDB).filter(BookingDB.status.notin_(['CheckedOut', 'Cancelled', 'Rejected'])).all()
+                for b in open_bookings:
+                    _refresh_tax_breakdown(db, b, prop_dict, room_type_names)
+                try:
+                    db.commit()
+                    break
+                except StaleDataError:
+                    db.rollback()
+            else:
+                print("Tax breakdowns not refreshed after a rate change; they update on each booking's next write")
+        
+        if credentials_changed:
+            # Rebuild upstream clients (and their pools) with the new keys on next use
+            from backend.clients import client_registry
+            client_registry.invalidate()
+        
+        updated = db_property_to_pydantic(prop)
+        updated.lastInvoiceNumber = current_serial
+        return updated
     
     # Fallback update not persisted globally for simplicity in fallback mode
     return settings
 
+def _guest_profile_to_dict(profile):
+    """Full guest profile in the API's format (documents and signature included)"""
+    return {
+        "profileId": profile.id,
+        "id": profile.id,
+        "name": profile.name,
+        "phone_number": profile.phone_number,
+        "email": profile.email,
+        "idType": profile.id_type,
+        "idNumber": profile.id_number,
+        "address": profile.address,
+        "dob": profile.dob,
+        "nationality": profile.nationality,
+        "preferences": profile.preferences,
+        "gender": profile.gender,
+        "passportNumber": profile.passport_number,
+        "passportPlaceIssue": profile.passport_place_issue,
+        "passportIssueDate": profile.passport_issue_date,
+        "passportExpiry": profile.passport_expiry,
+        "visaNumber": profile.visa_number,
+        "visaType": profile.visa_type,
+        "visaPlaceIssue": profile.visa_place_issue,
+        "visaIssueDate": profile.visa_issue_date,
+        "visaExpiry": profile.visa_expiry,
+        "arrivedFrom": profile.arrived_from,
+        "arrivalDateIndia": profile.arrival_date_india,
+        "arrivalPort": profile.arrival_port,
+        "nextDestination": profile.next_destination,
+        "purposeOfVisit": profile.purpose_of_visit,
+        "idImage": profile.id_image,
+        "idImageBack": profile.id_image_back,
+        "visaPage": profile.visa_page,
+        "additionalDocs": profile.additional_docs or [],
+        "formPages": profile.form_pages or [],
+        "serialNumber": profile.serial_number,
+        "fatherOrHusbandName": profile.father_or_husband_name,
+        "city": profile.city,
+        "state": profile.state,
+        "pinCode": profile.pin_code,
+        "country": profile.country,
+        "arrivalTime": profile.arrival_time,
+        "departureTime": profile.departure_time,
+        "signature": profile.signature,
+        "lastCheckIn": profile.last_check_in
+    }
+
 @app.get("/api/guest/lookup")
-def lookup_guest(name: Optional[str] = None, phone: Optional[str] = None, db=Depends(get_db)):
+def lookup_guest(name: Optional[str] = None, phone: Optional[str] = None, limit: int = 20, db=Depends(get_db)):
     if USE_DATABASE() and db:
-        query = db.query(GuestProfileDB)
-        if name:
-            query = query.filter(GuestProfileDB.name.ilike(f"%{name}%"))
-        if phone:
-            query = query.filter(GuestProfileDB.phone_number == phone)
-        
-        profiles = query.order_by(GuestProfileDB.last_check_in.desc()).all()
-        
-        if profiles:
-            results = []
-            for profile in profiles:
-                results.append({
-                    "profileId": profile.id,
-                    "id": profile.id,
-                    "name": profile.name,
-                    "phone_number": profile.phone_number,
-                    "email": profile.email,
-                    "idType": profile.id_type,
-                    "idNumber": profile.id_number,
-                    "address": profile.address,
-                    "dob": profile.dob,
-                    "nationality": profile.nationality,
-                    "preferences": profile.preferences,
-                    "gender": profile.gender,
-                    "passportNumber": profile.passport_number,
-                    "passportPlaceIssue": profile.passport_place_issue,
-                    "passportIssueDate": profile.passport_issue_date,
-                    "passportExpiry": profile.passport_expiry,
-                    "visaNumber": profile.visa_number,
-                    "visaType": profile.visa_type,
-                    "visaPlaceIssue": profile.visa_place_issue,
-                    "visaIssueDate": profile.visa_issue_date,
-                    "visaExpiry": profile.visa_expiry,
-                    "arrivedFrom": profile.arrived_from,
-                    "arrivalDateIndia": profile.arrival_date_india,
-                    "arrivalPort": profile.arrival_port,
-                    "nextDestination": profile.next_destination,
-                    "purposeOfVisit": profile.purpose_of_visit,
-                    "idImage": profile.id_image,
-                    "idImageBack": profile.id_image_back,
-                    "visaPage": profile.visa_page,
-                    "additionalDocs": profile.additional_docs or [],
-                    "formPages": profile.form_pages or [],
-                    "serialNumber": profile.serial_number,
-                    "fatherOrHusbandName": profile.father_or_husband_name,
-                    "city": profile.city,
-                    "state": profile.state,
-                    "pinCode": profile.pin_code,
-                    "country": profile.country,
-                    "arrivalTime": profile.arrival_time,
-                    "departureTime": profile.departure_time,
-                    "signature": profile.signature,
-                    "lastCheckIn": profile.last_check_in
-                })
-            return results
+        from backend.guest_search import search_profiles
+        # Best name similarity first (pg_trgm), capped; phone matched in E.164 form
+        profiles = search_profiles(
+            db.query(GuestProfileDB), GuestProfileDB, name=name, phone=phone,
+            dialect=engine.dialect.name, limit=limit
+        ).all()
+        return [_guest_profile_to_dict(profile) for profile in profiles]
     return []
-    
+
+@app.get("/api/guest/suggest")
+def suggest_guests(q: str, limit: int = 8, db=Depends(get_db)):
+    """Typeahead: a few small rows matching a name or phone prefix. Load the pick with /api/guest/{id}."""
+    if not (USE_DATABASE() and db) or len(q.strip()) < 2:
+        return []
+    from backend.guest_search import suggest_profiles, mask_phone
+    query = suggest_profiles(
+        db.query(GuestProfileDB.id, GuestProfileDB.name, GuestProfileDB.phone_number, GuestProfileDB.last_check_in),
+        GuestProfileDB, q, limit=limit
+    )
+    if query is None:
+        return []
+    profiles = query.all()
+    
+    stays = {}
+    if profiles:
+        # One grouped count over idx_bookings_guest_profile_checkin for the page of suggestions
+        from sqlalchemy import func
+        stays = dict(db.query(BookingDB.guest_profile_id, func.count(BookingDB.id)).filter(
+            BookingDB.guest_profile_id.in_([p.id for p in profiles]),
+            BookingDB.status.notin_(["Cancelled", "Rejected"])
+        ).group_by(BookingDB.guest_profile_id).all())
+    
+    return [{
+        "id": p.id,
+        "name": p.name,
+        "phoneMasked": mask_phone(p.phone_number),
+        "lastCheckIn": p.last_check_in,
+        "stayCount": stays.get(p.id, 0),
+    } for p in profiles]
+
 @app.get("/api/guest/history")
-def get_guest_history(name: str, phone: Optional[str] = None, exclude_booking_id: Optional[str] = None, db=Depends(get_db)):
+def get_guest_history(name: Optional[str] = None, phone: Optional[str] = None, exclude_booking_id: Optional[str] = None,
+                      profile_id: Optional[int] = None, db=Depends(get_db)):
+    """Past stays of a guest, newest first: by profile (indexed FK), falling back to the name for unlinked bookings"""
     if USE_DATABASE() and db:
-        query = db.query(BookingDB).filter(BookingDB.guest_name == name)
-        
-        # If phone is provided, it's safer to match by it too if we can find it in guest_details
-        # But for history, name matching is the standard first step.
+        if profile_id is None and exclude_booking_id:
+            # The booking being viewed knows its guest
+            profile_id = db.query(BookingDB.guest_profile_id).filter(BookingDB.id == exclude_booking_id).scalar()
+        
+        if profile_id is not None:
+            query = db.query(BookingDB).filter(BookingDB.guest_profile_id == profile_id)
+        elif name:
+            query = db.query(BookingDB).filter(BookingDB.guest_name == name)
+        else:
+            return []
         
         if exclude_booking_id:
             query = query.filter(BookingDB.id != exclude_booking_id)
@@ -1183,6 +1392,15 @@ def get_guest_history(name: str, phone: Optional[str] = None, exclude_booking_id
         return [db_booking_to_pydantic(b) for b in history]
     return []
 
+@app.get("/api/guest/{profile_id}")
+def get_guest_profile(profile_id: int, db=Depends(get_db)):
+    if not (USE_DATABASE() and db):
+        raise HTTPException(status_code=503, detail="Database not available")
+    profile = db.query(GuestProfileDB).filter(GuestProfileDB.id == profile_id).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Guest profile not found")
+    return _guest_profile_to_dict(profile)
+
 @app.get("/api/bookings")
 def get_bookings(db=Depends(get_db)):
     if USE_DATABASE() and db:
@@ -1302,9 +1520,116 @@ def get_statistics(db=Depends(get_db)):
         }
     }
 
+def run_due_night_audits():
+    """Scheduled: close every business date that has ended and not been audited yet"""
+    if not USE_DATABASE():
+        return []
+    from backend.database import SessionLocal
+    from backend.night_audit import run_due_audits
+    reports = run_due_audits(SessionLocal)
+    for report in reports:
+        if not report.get("alreadyRun"):
+            print(f"Night audit {report['businessDate']}: {len(report['noShows'])} no-shows, "
+                  f"{report['roomRevenuePosted']} room nights posted in {report['durationMs']}ms")
+    return reports
+
+@app.post("/api/night-audit")
+def run_night_audit(request: NightAuditRequest, db=Depends(get_db)):
+    """
+    Close a business date (default: the last one that has ended): flag no-shows, post nightly
+    room revenue, roll up daily stats and occupancy. Runs once per date unless `force` is set;
+    the day in progress is refused (409) unless `allowOpen` is set.
+    """
+    from backend.night_audit import run_night_audit as _run, closable_business_date, BusinessDateOpen
+    
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=503, detail="Database not available")
+    try:
+        return _run(db, request.businessDate or closable_business_date(), force=request.force,
+                    allow_open=request.allowOpen)
+    except BusinessDateOpen as e:
+        raise HTTPException(status_code=409, detail=f"{e}; pass allowOpen to close it anyway")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="businessDate must be YYYY-MM-DD")
+
+@app.get("/api/night-audit")
+def list_night_audits(limit: int = 30, db=Depends(get_db)):
+    """Latest audit reports, newest first (without the no-show / overstay lists)"""
+    from backend.db_models import NightAuditDB
+    
+    if not USE_DATABASE() or not db:
+        return []
+    audits = db.query(NightAuditDB).order_by(NightAuditDB.business_date.desc()).limit(max(1, min(limit, 366))).all()
+    return [{
+        "businessDate": a.business_date,
+        "completedAt": a.completed_at,
+        "noShows": len((a.report or {}).get("noShows", [])),
+        "overstays": len((a.report or {}).get("overstays", [])),
+        "stats": (a.report or {}).get("stats"),
+    } for a in audits]
+
+@app.get("/api/night-audit/{business_date}")
+def get_night_audit(business_date: str, db=Depends(get_db)):
+    """The stored report for an audited business date"""
+    from backend.db_models import NightAuditDB
+    
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=503, detail="Database not available")
+    audit = db.query(NightAuditDB).filter(NightAuditDB.business_date == business_date).first()
+    if not audit:
+        raise HTTPException(status_code=404, detail="No night audit for that date")
+    return audit.report
+
+@app.get("/api/statistics/daily")
+def get_daily_statistics(start: Optional[str] = None, end: Optional[str] = None, db=Depends(get_db)):
+    """Daily rollups written by the night audit (occupancy, ADR, RevPAR, ...), oldest first"""
+    from backend.db_models import DailyStatsDB
+    from backend.night_audit import stats_to_api
+    
+    if not USE_DATABASE() or not db:
+        return []
+    query = db.query(DailyStatsDB)
+    if start:
+        query = query.filter(DailyStatsDB.business_date >= start)
+    if end:
+        query = query.filter(DailyStatsDB.business_date <= end)
+    if not start and not end:
+        # Default: the last 30 audited days
+        recent = query.order_by(DailyStatsDB.business_date.desc()).limit(30).all()
+        return [stats_to_api(s) for s in reversed(recent)]
+    return [stats_to_api(s) for s in query.order_by(DailyStatsDB.business_date).all()]
+
+@app.get("/api/frontdesk/today")
+def get_frontdesk_today(request: Request, response: Response, date: Optional[str] = None, db=Depends(get_db)):
+    """
+    Arrivals, departures, in-house guests, unassigned bookings and room status for one business
+    date (default: the day in progress), served from a cache that booking commits keep current.
+    The board's ETag is a hash of its content; If-None-Match gets a 304.
+    """
+    from backend.frontdesk_board import frontdesk_board, build_board, on_board, ROW_COLUMNS
+    from backend.night_audit import current_business_date
+    
+    business_date = date or current_business_date()
+    try:
+        datetime.strptime(business_date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+    
+    if not USE_DATABASE() or not db:
+        rows = [{field: getattr(b, field) for field in ROW_COLUMNS.values()} for b in get_fallback_bookings()]
+        room_types = [{"id": rt.id, "name": rt.name, "roomNumbers": rt.roomNumbers or []} for rt in get_fallback_room_types()]
+        return build_board(business_date, [r for r in rows if on_board(r, business_date)], room_types)
+    
+    board, etag = frontdesk_board.get(engine, business_date)
+    if etag in [t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return board
+
 @app.post("/api/bookings")
 def create_booking(booking: Booking, db=Depends(get_db)):
     if USE_DATABASE() and db:
+        profile_id = None
         if booking.guestDetails:
             profile_id = _sync_guest_profile(booking.guestDetails, booking.checkIn, db)
             if profile_id:
@@ -1314,6 +1639,7 @@ def create_booking(booking: Booking, db=Depends(get_db)):
 
         db_booking = BookingDB(
             id=booking.id,
+            guest_profile_id=profile_id,
             room_type_id=booking.roomTypeId,
             room_number=booking.roomNumber,
             guest_name=booking.guestName,
@@ -1330,11 +1656,10 @@ def create_booking(booking: Booking, db=Depends(get_db)):
             pax=booking.pax or 1,
             folio=[f.dict() for f in booking.folio] if booking.folio else []
         )
+        _refresh_tax_breakdown(db, db_booking)
         db.add(db_booking)
-        db.commit()
-        db.refresh(db_booking)
         
-        # Create notification for new booking
+        # Create notification for new booking (written in the same commit)
         create_notification_internal(
             db,
             notif_type="reservation",
@@ -1346,6 +1671,7 @@ def create_booking(booking: Booking, db=Depends(get_db)):
             room_number=booking.roomNumber
         )
         db.commit()
+        db.refresh(db_booking)
         
         return db_booking_to_pydantic(db_booking)
     
@@ -1353,34 +1679,82 @@ def create_booking(booking: Booking, db=Depends(get_db)):
     get_fallback_bookings().append(booking)
     return booking
 
+BLOCKING_STATUSES_EXCLUDED = ('Cancelled', 'Rejected', 'CheckedOut')
+
+def _find_booking_conflicts(db, bookings):
+    """
+    Check every requested room/date range against existing bookings and against the other
+    requests in one query (the requests are joined as a VALUES list). 'Unassigned' rooms
+    never conflict. Returns a list of {"roomNumber", "bookingId", "conflictsWith", "message"}.
+    """
+    from sqlalchemy import text
+    
+    requested = [(i, b) for i, b in enumerate(bookings) if b.roomNumber and b.roomNumber != 'Unassigned']
+    if not requested:
+        return []
+    
+    params = {f"excluded_{i}": status for i, status in enumerate(BLOCKING_STATUSES_EXCLUDED)}
+    rows = []
+    for i, b in requested:
+        rows.append(f"(:idx_{i}, :room_{i}, :ci_{i}, :co_{i})")
+        params.update({f"idx_{i}": i, f"room_{i}": b.roomNumber, f"ci_{i}": b.checkIn, f"co_{i}": b.checkOut})
+    excluded = ", ".join(f":excluded_{i}" for i in range(len(BLOCKING_STATUSES_EXCLUDED)))
+    
+    found = db.execute(text(f"""
+        WITH req (idx, room, check_in, check_out) AS (VALUES {", ".join(rows)})
+        SELECT r.idx, r.room, b.id, b.check_in, b.check_out
+        FROM req r
+        JOIN bookings b ON b.room_number = r.room
+            AND b.status NOT IN ({excluded})
+            AND b.check_in < r.check_out AND b.check_out > r.check_in
+        UNION ALL
+        SELECT r.idx, r.room, NULL, o.check_in, o.check_out
+        FROM req r
+        JOIN req o ON o.room = r.room AND o.idx < r.idx
+            AND o.check_in < r.check_out AND o.check_out > r.check_in
+        ORDER BY 2, 1
+    """), params).fetchall()
+    
+    conflicts = []
+    for idx, room, other_id, other_in, other_out in found:
+        b = bookings[idx]
+        with_what = f"booking {other_id}" if other_id else "another room in this request"
+        conflicts.append({
+            "roomNumber": room,
+            "bookingId": b.id,
+            "conflictsWith": other_id,
+            "message": f"Room {room} ({b.checkIn} to {b.checkOut}) overlaps {with_what} ({other_in} to {other_out})"
+        })
+    return conflicts
+
 @app.post("/api/bookings/bulk")
 def create_bulk_bookings(bookings: List[Booking], db=Depends(get_db)):
     if USE_DATABASE() and db:
         try:
+            # Availability for the whole request in one query; report every clash, not just the first
+            conflicts = _find_booking_conflicts(db, bookings)
+            if conflicts:
+                rooms = sorted({c["roomNumber"] for c in conflicts})
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Room{'s' if len(rooms) > 1 else ''} {', '.join(rooms)} "
+                           f"{'are' if len(rooms) > 1 else 'is'} already occupied for these dates. "
+                           + "; ".join(c["message"] for c in conflicts)
+                )
+            
+            # Every guest of the group in one upsert
+            from backend.guest_profile_sync import upsert_guest_profiles
+            profile_ids = upsert_guest_profiles(db, [(b.guestDetails, b.checkIn) for b in bookings])
+            
             db_bookings = []
-            for booking in bookings:
-                # Basic availability check (server-side)
-                # Skip conflict check for 'Unassigned' rooms to allow multi-room unassigned bookings
-                if booking.roomNumber and booking.roomNumber != 'Unassigned':
-                    conflict = db.query(BookingDB).filter(
-                        BookingDB.room_number == booking.roomNumber,
-                        BookingDB.status.notin_(['Cancelled', 'Rejected', 'CheckedOut']),
-                        BookingDB.check_in < booking.checkOut,
-                        BookingDB.check_out > booking.checkIn
-                    ).first()
-                    
-                    if conflict:
-                        raise HTTPException(status_code=409, detail=f"Room {booking.roomNumber} is already occupied for these dates.")
-
-                if booking.guestDetails:
-                    profile_id = _sync_guest_profile(booking.guestDetails, booking.checkIn, db)
-                    if profile_id:
-                        # Update the Pydantic model's guestDetails before converting to DB model
-                        if booking.guestDetails: # Check again to be safe
-                            booking.guestDetails.profileId = profile_id
+            for booking, profile_id in zip(bookings, profile_ids):
+                if profile_id:
+                    # Update the Pydantic model's guestDetails before converting to DB model
+                    booking.guestDetails.profileId = profile_id
 
                 db_booking = BookingDB(
                     id=booking.id,
+                    guest_profile_id=profile_id,
                     room_type_id=booking.roomTypeId,
                     room_number=booking.roomNumber,
                     guest_name=booking.guestName,
@@ -1404,44 +1778,40 @@ def create_bulk_bookings(bookings: List[Booking], db=Depends(get_db)):
                 )
                 db_bookings.append(db_booking)
             
+            prop = db.query(PropertySettingsDB).filter(PropertySettingsDB.id == "default").first()
+            prop_dict = db_property_to_pydantic(prop).dict() if prop else get_fallback_property().dict()
+            room_type_names = {rt.id: rt.name for rt in db.query(RoomTypeDB).all()}
+            # A multi-room request coalesces into one grouped notification (one INSERT with the bookings)
+            first_b = db_bookings[0] if db_bookings else None
+            group = {
+                "key": f"bulk:{first_b.id}",
+                "category": "bulk_booking",
+                "title": "Bulk Booking Created",
+                "message": f"Group booking for {first_b.guest_name} ({{count}} rooms: {{rooms}}) created",
+                "priority": "high"
+            } if first_b else None
             for db_b in db_bookings:
+                _refresh_tax_breakdown(db, db_b, prop_dict, room_type_names)
                 db.add(db_b)
+                create_notification_internal(
+                    db,
+                    notif_type="reservation",
+                    category="new_booking",
+                    title="New Reservation",
+                    message=f"{db_b.guest_name or 'Guest'} arriving {db_b.check_in} - Room {db_b.room_number or 'Unassigned'}",
+                    priority="normal",
+                    booking_id=db_b.id,
+                    room_number=db_b.room_number,
+                    group=group
+                )
             
+            # One multi-row INSERT for the bookings (plus the grouped notification); build the
+            # response from the flushed objects rather than reloading each one after commit
+            db.flush()
+            created = [db_booking_to_pydantic(db_b) for db_b in db_bookings]
             db.commit()
             
-            try:
-                # Create notifications for each booking in the bulk request
-                for db_b in db_bookings:
-                    create_notification_internal(
-                        db,
-                        notif_type="reservation",
-                        category="new_booking",
-                        title="New Reservation",
-                        message=f"{db_b.guest_name or 'Guest'} arriving {db_b.check_in} - Room {db_b.room_number or 'Unassigned'}",
-                        priority="normal",
-                        booking_id=db_b.id,
-                        room_number=db_b.room_number
-                    )
-                
-                # If it's a multi-room booking, add a summary notification
-                if len(db_bookings) > 1:
-                    first_b = db_bookings[0]
-                    create_notification_internal(
-                        db,
-                        notif_type="reservation",
-                        category="bulk_booking",
-                        title="Bulk Booking Created",
-                        message=f"Group booking for {first_b.guest_name} ({len(db_bookings)} rooms) created",
-                        priority="high",
-                        booking_id=first_b.id
-                    )
-                
-                db.commit()
-            except Exception as e:
-                print(f"Error creating bulk notifications: {e}")
-                db.rollback()
-            
-            return [db_booking_to_pydantic(db_b) for db_b in db_bookings]
+            return created
         except Exception as e:
             db.rollback()
             if isinstance(e, HTTPException): raise e
@@ -1452,16 +1822,128 @@ def create_bulk_bookings(bookings: List[Booking], db=Depends(get_db)):
         get_fallback_bookings().append(b)
     return bookings
 
+@app.post("/api/bookings/import")
+def import_historical_bookings(file: UploadFile = File(...), format: Optional[str] = Form(None)):
+    """
+    Load bookings exported from a previous PMS (NDJSON, or CSV with a header row) as a
+    background job; see backend/booking_import.py. Poll /api/bookings/import/{job_id} for
+    progress and download rejected rows from /api/bookings/import/{job_id}/errors.
+    """
+    from backend.booking_import import booking_imports, detect_format
+
+    if not USE_DATABASE():
+        raise HTTPException(status_code=400, detail="Database required for booking import")
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return booking_imports.submit(engine, file.file, file.filename, fmt)
+
+@app.get("/api/bookings/import/{job_id}")
+def get_booking_import(job_id: str):
+    """Progress of a booking import: rows read, imported, rejected and skipped as duplicates"""
+    from backend.booking_import import booking_imports
+    job = booking_imports.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+@app.get("/api/bookings/import/{job_id}/errors")
+def download_booking_import_errors(job_id: str):
+    """Rejected and skipped rows of an import as NDJSON ({"line", "errors", "record"} per row)"""
+    from fastapi.responses import FileResponse
+    from backend.booking_import import booking_imports
+
+    path = booking_imports.error_file(job_id)
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Import not found")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"{job_id}.errors.ndjson")
+
+def _booking_etag(version) -> str:
+    return f'"{version}"'
+
+def _requested_version(if_match: Optional[str], body_version: Optional[int] = None):
+    """The version a write was based on: the If-Match ETag, else `version` from the body; None = unconditional."""
+    if if_match and if_match.strip() != "*":
+        tag = if_match.split(",")[0].strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        try:
+            return int(tag.strip('"'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="If-Match must be a booking ETag")
+    return body_version
+
+def _booking_conflict(db, booking_id: str) -> HTTPException:
+    """A 409 carrying the booking as it is now, for a write based on an older version."""
+    db.rollback()
+    current = db.query(BookingDB).filter(BookingDB.id == booking_id).first()
+    if not current:
+        return HTTPException(status_code=404, detail="Booking not found")
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": "This booking was changed elsewhere; review the current version and try again",
+            "current": db_booking_to_pydantic(current).dict()
+        },
+        headers={"ETag": _booking_etag(current.version)}
+    )
+
+def _check_booking_version(db, db_booking, expected):
+    """Fail fast, before any slow work, if the client edited an older version than the one loaded."""
+    if expected is not None and expected != db_booking.version:
+        raise _booking_conflict(db, db_booking.id)
+
+def _commit_booking(db, db_booking, response: Response = None):
+    """
+    Flush and commit a booking write. The UPDATE carries WHERE version = <version loaded>, so a
+    concurrent write in between turns into a 409 instead of being overwritten. Returns the booking.
+    """
+    from sqlalchemy.orm.exc import StaleDataError
+    try:
+        db.flush()
+        # Built before commit so the row is not reloaded
+        updated = db_booking_to_pydantic(db_booking)
+        db.commit()
+    except StaleDataError:
+        raise _booking_conflict(db, db_booking.id)
+    if response is not None:
+        response.headers["ETag"] = _booking_etag(updated.version)
+    return updated
+
+@app.get("/api/bookings/{booking_id}")
+def get_booking(booking_id: str, request: Request, response: Response, db=Depends(get_db)):
+    """One booking, with its version as the ETag (If-None-Match gets a 304)"""
+    if not USE_DATABASE() or not db:
+        booking = next((b for b in get_fallback_bookings() if b.id == booking_id), None)
+        if not booking:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        return booking
+    
+    db_booking = db.query(BookingDB).filter(BookingDB.id == booking_id).first()
+    if not db_booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    etag = _booking_etag(db_booking.version)
+    if etag in [t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return db_booking_to_pydantic(db_booking)
+
 @app.put("/api/bookings/{booking_id}")
-def update_booking(booking_id: str, booking: Booking, db=Depends(get_db)):
+def update_booking(booking_id: str, booking: Booking, response: Response, if_match: Optional[str] = Header(None),
+                   db=Depends(get_db)):
+    """
+    Replace a booking. Send the `version` it was read at (or If-Match: its ETag); a booking
+    changed since then is answered with 409 and the current state instead of being overwritten.
+    """
     if USE_DATABASE() and db:
         db_booking = db.query(BookingDB).filter(BookingDB.id == booking_id).first()
         if not db_booking:
             raise HTTPException(status_code=404, detail="Booking not found")
+        _check_booking_version(db, db_booking, _requested_version(if_match, booking.version))
         
         # Track old status for notification triggers
         old_status = db_booking.status
-        new_status = booking.status
         
         # Save or update guest profile whenever guest details are present
         if booking.guestDetails and booking.guestDetails.name and booking.guestDetails.phoneNumber:
@@ -1471,8 +1953,10 @@ def update_booking(booking_id: str, booking: Booking, db=Depends(get_db)):
                 updated_gd = booking.guestDetails.dict() if booking.guestDetails else {}
                 updated_gd['profileId'] = profile_id
                 db_booking.guest_details = updated_gd
+                db_booking.guest_profile_id = profile_id
         else:
             db_booking.guest_details = None # Clear if no guest details provided
+            db_booking.guest_profile_id = None
 
         # Track folio count for service order notifications
         old_folio_count = len(db_booking.folio or [])
@@ -1499,78 +1983,452 @@ def update_booking(booking_id: str, booking: Booking, db=Depends(get_db)):
         db_booking.invoice_number = booking.invoiceNumber
         db_booking.folio = [f.dict() for f in booking.folio] if booking.folio else []
         db_booking.payments = [p.dict() for p in booking.payments] if booking.payments else []
+        # An issued invoice keeps the tax it was issued with
+        if not (old_status == 'CheckedOut' and db_booking.invoice_number and db_booking.tax_breakdown):
+            _refresh_tax_breakdown(db, db_booking)
         
         # Since we are using BigInteger for timestamp, ensure it's an int
         import time
         db_booking.timestamp = int(time.time() * 1000)
 
-        db.commit()
-        db.refresh(db_booking)
+        # Notifications are queued on the session and written in the same commit as the update
+        _notify_booking_changes(db, db_booking, old_status,
+                                booking.folio[-1] if new_folio_count > old_folio_count else None)
 
-        # Notification for new folio items (Service Orders)
-        if new_folio_count > old_folio_count:
-            try:
-                last_item = booking.folio[-1]
-                create_notification_internal(
-                    db,
-                    notif_type="housekeeping" if last_item.category == 'Laundry' else "guest_request",
-                    category="service_order",
-                    title=f"New {last_item.category} Order",
-                    message=f"Order for {last_item.description} (₹{last_item.amount}) received from Room {booking.roomNumber}",
-                    priority="normal",
-                    booking_id=booking_id,
-                    room_number=booking.roomNumber
-                )
-                db.commit()
-            except Exception as e:
-                print(f"Error creating folio notification: {e}")
-                db.rollback()
-        
-        # Create notifications for status changes
-        if old_status != new_status:
-            try:
-                guest_name = booking.guestName or 'Guest'
-                room_info = f"Room {booking.roomNumber}" if booking.roomNumber else ""
-                
-                if new_status == 'CheckedIn':
-                    create_notification_internal(
-                        db,
-                        notif_type="checkin",
-                        category="guest_arrival",
-                        title="Guest Checked In",
-                        message=f"{guest_name} has checked in to {room_info}",
-                        priority="high",
-                        booking_id=booking_id,
-                        room_number=booking.roomNumber
-                    )
-                elif new_status == 'CheckedOut':
-                    create_notification_internal(
-                        db,
-                        notif_type="checkout",
-                        category="guest_departure",
-                        title="Guest Checked Out",
-                        message=f"{guest_name} has checked out from {room_info}",
-                        priority="normal",
-                        booking_id=booking_id,
-                        room_number=booking.roomNumber
-                    )
-                elif new_status == 'Cancelled':
-                    create_notification_internal(
-                        db,
-                        notif_type="reservation",
-                        category="cancellation",
-                        title="Booking Cancelled",
-                        message=f"Reservation for {guest_name} ({booking.checkIn}) has been cancelled",
-                        priority="high",
-                        booking_id=booking_id,
-                        room_number=booking.roomNumber
-                    )
-                db.commit()
-            except Exception as e:
-                print(f"Error creating status notification: {e}")
-                db.rollback() # Rollback the notification part but booking update was already committed
-        
+        return _commit_booking(db, db_booking, response)
+
+def _notify_booking_changes(db, db_booking, old_status, new_folio_item=None):
+    """Queue the service-order and status-change notifications for a booking write (caller commits)."""
+    booking_id = db_booking.id
+    if new_folio_item is not None:
+        create_notification_internal(
+            db,
+            notif_type="housekeeping" if new_folio_item.category == 'Laundry' else "guest_request",
+            category="service_order",
+            title=f"New {new_folio_item.category} Order",
+            message=f"Order for {new_folio_item.description} (₹{new_folio_item.amount}) received from Room {db_booking.room_number}",
+            priority="normal",
+            booking_id=booking_id,
+            room_number=db_booking.room_number
+        )
+    
+    new_status = db_booking.status
+    if old_status == new_status:
+        return
+    guest_name = db_booking.guest_name or 'Guest'
+    room_info = f"Room {db_booking.room_number}" if db_booking.room_number else ""
+    
+    if new_status == 'CheckedIn':
+        create_notification_internal(
+            db,
+            notif_type="checkin",
+            category="guest_arrival",
+            title="Guest Checked In",
+            message=f"{guest_name} has checked in to {room_info}",
+            priority="high",
+            booking_id=booking_id,
+            room_number=db_booking.room_number
+        )
+    elif new_status == 'CheckedOut':
+        create_notification_internal(
+            db,
+            notif_type="checkout",
+            category="guest_departure",
+            title="Guest Checked Out",
+            message=f"{guest_name} has checked out from {room_info}",
+            priority="normal",
+            booking_id=booking_id,
+            room_number=db_booking.room_number
+        )
+    elif new_status == 'Cancelled':
+        create_notification_internal(
+            db,
+            notif_type="reservation",
+            category="cancellation",
+            title="Booking Cancelled",
+            message=f"Reservation for {guest_name} ({db_booking.check_in}) has been cancelled",
+            priority="high",
+            booking_id=booking_id,
+            room_number=db_booking.room_number
+        )
+
+def _get_booking_for_write(db, booking_id: str, expected_version: Optional[int] = None):
+    """Load a booking for a targeted write; no row lock, the UPDATE's version check catches concurrent writes."""
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=400, detail="Database required for booking updates")
+    db_booking = db.query(BookingDB).filter(BookingDB.id == booking_id).first()
+    if not db_booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    _check_booking_version(db, db_booking, expected_version)
+    return db_booking
+
+def _apply_booking_side_effects(db, db_booking, changed, old_status, new_folio_item=None):
+    """Tax refresh, timestamp and notifications for the fields that changed (caller commits)."""
+    from backend.booking_patch import TAX_FIELDS
+    
+    # An issued invoice keeps the tax it was issued with
+    frozen = old_status == 'CheckedOut' and db_booking.invoice_number and db_booking.tax_breakdown
+    if TAX_FIELDS.intersection(changed) and not frozen:
+        _refresh_tax_breakdown(db, db_booking)
+    db_booking.timestamp = int(time.time() * 1000)
+    _notify_booking_changes(db, db_booking, old_status, new_folio_item)
+
+def _commit_booking_fields(db, db_booking, changed, old_status, new_folio_item=None, response: Response = None):
+    """Side effects for the fields that actually changed, then commit; returns the updated booking."""
+    if not changed:
+        if response is not None:
+            response.headers["ETag"] = _booking_etag(db_booking.version)
         return db_booking_to_pydantic(db_booking)
+    _apply_booking_side_effects(db, db_booking, changed, old_status, new_folio_item)
+    return _commit_booking(db, db_booking, response)
+
+@app.patch("/api/bookings/{booking_id}")
+def patch_booking(booking_id: str, response: Response, patch: Dict[str, Any] = Body(...),
+                  if_match: Optional[str] = Header(None), db=Depends(get_db)):
+    """
+    JSON Merge Patch (RFC 7386) of a booking: only the named fields are written, and the
+    guest profile is re-synced only when guestDetails is part of the patch
+    (see backend/booking_patch.py). If-Match (or a `version` member) makes it conditional.
+    """
+    from pydantic import ValidationError
+    from backend.booking_patch import COLUMNS, READ_ONLY_FIELDS, apply_merge_patch, assign_fields
+    
+    patch = dict(patch)
+    expected_version = _requested_version(if_match, patch.pop("version", None))
+    read_only = sorted(READ_ONLY_FIELDS.intersection(patch))
+    if read_only:
+        raise HTTPException(status_code=400, detail=f"Cannot patch {', '.join(read_only)}")
+    unknown = sorted(set(patch) - set(COLUMNS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown booking fields: {', '.join(unknown)}")
+    
+    db_booking = _get_booking_for_write(db, booking_id, expected_version)
+    current = db_booking_to_pydantic(db_booking)
+    try:
+        booking = Booking(**apply_merge_patch(current.dict(), patch))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    
+    old_status = db_booking.status
+    fields = [f for f in patch if f != "guestDetails"]
+    changed = assign_fields(db_booking, booking, fields)
+    
+    if "guestDetails" in patch:
+        gd = booking.guestDetails
+        profile_id = None
+        if gd and gd.name and gd.phoneNumber:
+            profile_id = _sync_guest_profile(gd, booking.checkIn, db)
+            if profile_id:
+                gd.profileId = profile_id
+        db_booking.guest_details = gd.dict() if gd else None
+        db_booking.guest_profile_id = profile_id
+        changed.append("guestDetails")
+    
+    old_folio = current.folio or []
+    new_folio_item = booking.folio[-1] if "folio" in changed and len(booking.folio or []) > len(old_folio) else None
+    return _commit_booking_fields(db, db_booking, changed, old_status, new_folio_item, response)
+
+FOLIO_APPEND_ATTEMPTS = 3
+
+@app.post("/api/bookings/{booking_id}/folio")
+def append_folio_item(booking_id: str, item: FolioItem, response: Response, db=Depends(get_db)):
+    """Add one charge to a booking's folio without sending the rest of the booking"""
+    from sqlalchemy.orm.exc import StaleDataError
+    
+    # Appending doesn't depend on what else changed, so a version clash is re-read and re-applied, not a 409
+    for attempt in range(FOLIO_APPEND_ATTEMPTS):
+        db_booking = _get_booking_for_write(db, booking_id)
+        folio = list(db_booking.folio or [])
+        if any(existing.get("id") == item.id for existing in folio if isinstance(existing, dict)):
+            raise HTTPException(status_code=409, detail=f"Folio item {item.id} already exists")
+        db_booking.folio = folio + [item.dict()]
+        _apply_booking_side_effects(db, db_booking, ["folio"], db_booking.status, item)
+        try:
+            db.flush()
+            updated = db_booking_to_pydantic(db_booking)
+            db.commit()
+            break
+        except StaleDataError:
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Booking kept changing while adding the charge; retry")
+    
+    response.headers["ETag"] = _booking_etag(updated.version)
+    return updated
+
+@app.put("/api/bookings/{booking_id}/status")
+def change_booking_status(booking_id: str, update: BookingStatusUpdate, response: Response,
+                          if_match: Optional[str] = Header(None), db=Depends(get_db)):
+    """Change a booking's status (check-in, cancel, reject, ...) and raise the matching notification"""
+    db_booking = _get_booking_for_write(db, booking_id, _requested_version(if_match))
+    old_status = db_booking.status
+    changed = []
+    if old_status != update.status:
+        db_booking.status = update.status
+        changed.append("status")
+    if update.rejectionReason is not None and update.rejectionReason != db_booking.rejection_reason:
+        db_booking.rejection_reason = update.rejectionReason
+        changed.append("rejectionReason")
+    return _commit_booking_fields(db, db_booking, changed, old_status, response=response)
+
+@app.put("/api/bookings/{booking_id}/room")
+def assign_booking_room(booking_id: str, assignment: RoomAssignment, response: Response,
+                        if_match: Optional[str] = Header(None), db=Depends(get_db)):
+    """Put a booking in a room (e.g. an 'Unassigned' email booking); 409 if the room is taken for its dates"""
+    db_booking = _get_booking_for_write(db, booking_id, _requested_version(if_match))
+    room_type_id = assignment.roomTypeId or db_booking.room_type_id
+    room_type = db.query(RoomTypeDB).filter(RoomTypeDB.id == room_type_id).first()
+    if not room_type:
+        raise HTTPException(status_code=404, detail="Room type not found")
+    if assignment.roomNumber != 'Unassigned' and assignment.roomNumber not in (room_type.room_numbers or []):
+        raise HTTPException(status_code=400, detail=f"Room {assignment.roomNumber} is not a {room_type.name} room")
+    
+    candidate = db_booking_to_pydantic(db_booking).copy(update={"roomNumber": assignment.roomNumber})
+    conflicts = [c for c in _find_booking_conflicts(db, [candidate]) if c["conflictsWith"] != booking_id]
+    if conflicts:
+        raise HTTPException(status_code=409, detail="; ".join(c["message"] for c in conflicts))
+    
+    changed = []
+    if db_booking.room_number != assignment.roomNumber:
+        db_booking.room_number = assignment.roomNumber
+        changed.append("roomNumber")
+    if db_booking.room_type_id != room_type_id:
+        db_booking.room_type_id = room_type_id
+        changed.append("roomTypeId")
+    return _commit_booking_fields(db, db_booking, changed, db_booking.status, response=response)
+
+ROOM_ASSIGNMENT_ATTEMPTS = 3
+
+@app.post("/api/bookings/assign-rooms")
+def auto_assign_rooms(request: RoomAutoAssignRequest, db=Depends(get_db)):
+    """
+    Place unassigned bookings arriving in [start, end) into rooms (backend/room_assignment.py).
+    Dry run by default; with `apply` the plan is written in one commit, each booking through
+    its version check. Bookings that can't be placed come back in `unplaced`, with the
+    overbooked nights in `overbooking`.
+    """
+    from sqlalchemy.orm.exc import StaleDataError
+    from backend.night_audit import current_business_date
+    from backend.room_assignment import default_window, pending_bookings, booking_input, load_problem, solve
+    
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=503, detail="Database not available")
+    try:
+        start, end = default_window(request.start, request.end, today=current_business_date())
+        datetime.strptime(start, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    
+    # A booking written (or a room taken) between the solve and the commit re-runs the solve
+    for attempt in range(ROOM_ASSIGNMENT_ATTEMPTS):
+        pending = pending_bookings(db, start, end)
+        bookings = [booking_input(b) for b in pending]
+        room_types, fixed, usual_rooms = load_problem(db, bookings, BLOCKING_STATUSES_EXCLUDED)
+        plan = solve(room_types, fixed, bookings, usual_rooms)
+        plan.update({"start": start, "end": end, "applied": False})
+        if not request.apply or not plan["assignments"]:
+            db.rollback()
+            return plan
+        
+        by_id = {b.id: b for b in pending}
+        candidates = [db_booking_to_pydantic(by_id[a["bookingId"]]).copy(update={"roomNumber": a["roomNumber"]})
+                      for a in plan["assignments"]]
+        if _find_booking_conflicts(db, candidates):
+            # Someone took one of the planned rooms after it was read
+            db.rollback()
+            continue
+        for a in plan["assignments"]:
+            db_booking = by_id[a["bookingId"]]
+            db_booking.room_number = a["roomNumber"]
+            _apply_booking_side_effects(db, db_booking, ["roomNumber"], db_booking.status)
+        try:
+            db.flush()
+            create_notification_internal(
+                db,
+                notif_type="system",
+                category="room_assignment",
+                title="Rooms Assigned",
+                message=(f"{len(plan['assignments'])} booking(s) placed for {start} to {end}"
+                         + (f"; {len(plan['unplaced'])} could not be placed" if plan["unplaced"] else "")),
+                priority="high" if plan["unplaced"] else "normal",
+                metadata={"start": start, "end": end, "assigned": len(plan["assignments"]),
+                          "unplaced": [u["bookingId"] for u in plan["unplaced"]]}
+            )
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            continue
+        plan["applied"] = True
+        return plan
+    raise HTTPException(status_code=409, detail="Bookings kept changing while rooms were being assigned; try again")
+
+SERVICE_ORDER_WRITE_ATTEMPTS = 3
+
+@app.post("/api/bookings/{booking_id}/orders", status_code=201)
+def place_service_order(booking_id: str, order: ServiceOrderCreate, response: Response, db=Depends(get_db)):
+    """
+    Guest menu / laundry order: appends one FolioItem to the booking and queues the order
+    for its department in the same commit (see backend/service_orders.py).
+    Returns {"order", "booking"}; re-sending the same order id returns the existing order.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.orm.exc import StaleDataError
+    from backend.db_models import ServiceOrderDB
+    from backend.service_orders import new_order_id, new_order_row, folio_item_for, order_to_api, publish_order
+    
+    if not order.items:
+        raise HTTPException(status_code=400, detail="An order needs at least one item")
+    if any(item.quantity < 1 or item.price < 0 for item in order.items):
+        raise HTTPException(status_code=400, detail="Item quantities must be positive and prices non-negative")
+    order_id = order.id or new_order_id()
+    
+    # Orders only append, so a version clash with another write is re-read and re-applied, not a 409
+    for attempt in range(SERVICE_ORDER_WRITE_ATTEMPTS):
+        db_booking = _get_booking_for_write(db, booking_id)
+        existing = db.query(ServiceOrderDB).filter(ServiceOrderDB.id == order_id).first()
+        if existing:
+            if existing.booking_id != booking_id:
+                raise HTTPException(status_code=409, detail=f"Order {order_id} belongs to another booking")
+            response.headers["ETag"] = _booking_etag(db_booking.version)
+            return {"order": order_to_api(existing), "booking": db_booking_to_pydantic(db_booking)}
+        if db_booking.status != 'CheckedIn':
+            raise HTTPException(status_code=409, detail="Orders can only be placed for checked-in guests")
+        
+        row = ServiceOrderDB(**new_order_row(order_id, db_booking, order))
+        item = FolioItem(**folio_item_for(row))
+        db.add(row)
+        db_booking.folio = list(db_booking.folio or []) + [item.dict()]
+        _apply_booking_side_effects(db, db_booking, ["folio"], db_booking.status, item)
+        try:
+            db.flush()
+            updated = db_booking_to_pydantic(db_booking)
+            placed = order_to_api(row)
+            db.commit()
+            break
+        except (StaleDataError, IntegrityError):
+            # IntegrityError: an identical submit won the race for the order id; the next pass returns its order
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Booking kept changing while placing the order; retry")
+    
+    publish_order(engine, placed)
+    response.headers["ETag"] = _booking_etag(updated.version)
+    return {"order": placed, "booking": updated}
+
+@app.get("/api/orders")
+def list_service_orders(department: Optional[str] = None, status: Optional[str] = "open",
+                        bookingId: Optional[str] = None, limit: int = 200, db=Depends(get_db)):
+    """A department's queue, oldest first. status: 'open' (default), 'all' or one status."""
+    from backend.db_models import ServiceOrderDB
+    from backend.service_orders import OPEN_STATUSES, order_to_api
+    
+    if not USE_DATABASE() or not db:
+        return []
+    query = db.query(ServiceOrderDB)
+    if department:
+        query = query.filter(ServiceOrderDB.department == department)
+    if status == "open":
+        query = query.filter(ServiceOrderDB.status.in_(OPEN_STATUSES))
+    elif status and status != "all":
+        query = query.filter(ServiceOrderDB.status == status)
+    if bookingId:
+        query = query.filter(ServiceOrderDB.booking_id == bookingId)
+    rows = query.order_by(ServiceOrderDB.created_at, ServiceOrderDB.id).limit(max(1, min(limit, 1000))).all()
+    return [order_to_api(row) for row in rows]
+
+@app.put("/api/orders/{order_id}/status")
+def update_service_order_status(order_id: str, update: ServiceOrderStatusUpdate, db=Depends(get_db)):
+    """Move an order along its queue; cancelling removes its (unpaid) charge from the folio"""
+    from sqlalchemy.orm.exc import StaleDataError
+    from backend.db_models import ServiceOrderDB
+    from backend.service_orders import TRANSITIONS, order_timestamp, order_to_api, publish_order
+    
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=400, detail="Database required for service orders")
+    
+    for attempt in range(SERVICE_ORDER_WRITE_ATTEMPTS):
+        row = db.query(ServiceOrderDB).filter(ServiceOrderDB.id == order_id).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if row.status == update.status:
+            return order_to_api(row)
+        if update.status not in TRANSITIONS[row.status]:
+            raise HTTPException(status_code=409, detail=f"A {row.status} order cannot be moved to {update.status}")
+        
+        row.status = update.status
+        row.updated_at = order_timestamp()
+        if update.status == 'Cancelled':
+            db_booking = db.query(BookingDB).filter(BookingDB.id == row.booking_id).first()
+            folio = list(db_booking.folio or []) if db_booking else []
+            charge = next((f for f in folio if isinstance(f, dict) and f.get("id") == row.folio_item_id), None)
+            if charge and charge.get("isPaid"):
+                raise HTTPException(status_code=409, detail="This order's charge is already paid; refund it from the folio")
+            if charge:
+                db_booking.folio = [f for f in folio if f is not charge]
+                _apply_booking_side_effects(db, db_booking, ["folio"], db_booking.status)
+        try:
+            db.flush()
+            changed = order_to_api(row)
+            db.commit()
+            break
+        except StaleDataError:
+            # Another screen moved the order (or the booking changed): re-check against the new state
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Order kept changing; reload the queue")
+    
+    publish_order(engine, changed)
+    return changed
+
+@app.get("/api/orders/stream")
+async def stream_service_orders(request: Request, department: Optional[str] = None):
+    """
+    Server-sent events for staff screens: the open queue on connect, then an `order` event
+    for every new order and status change (optionally for one department).
+    """
+    import asyncio
+    from fastapi.responses import StreamingResponse
+    from starlette.concurrency import run_in_threadpool
+    from backend.service_orders import order_broadcaster
+    
+    if not USE_DATABASE():
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    def open_queue():
+        from backend.database import SessionLocal
+        session = SessionLocal()
+        try:
+            return list_service_orders(department=department, db=session)
+        finally:
+            session.close()
+    
+    async def events():
+        # Subscribe before reading the queue so nothing slips in between
+        queue = order_broadcaster.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            for order in await run_in_threadpool(open_queue):
+                yield _sse("order", order)
+            yield _sse("ready", {})
+            
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                order = event.get("order")
+                if event.get("kind") == "order" and (not department or order["department"] == department):
+                    yield _sse("order", order)
+        finally:
+            order_broadcaster.unsubscribe(queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 @app.get("/api/init-db")
 def init_db():
@@ -1661,12 +2519,11 @@ def transfer_booking(booking_id: str, transfer: RoomTransferRequest, db=Depends(
                 rt = db.query(RoomTypeDB).filter(RoomTypeDB.id == transfer.newRoomTypeId).first()
                 if rt:
                     db_booking.amount = rt.base_price
+            _refresh_tax_breakdown(db, db_booking)
             
             import time
             db_booking.timestamp = int(time.time() * 1000)
-            db.commit()
-            db.refresh(db_booking)
-            return db_booking_to_pydantic(db_booking)
+            return _commit_booking(db, db_booking)
         
         # Mid-stay split (Room Switch)
         import uuid
@@ -1701,6 +2558,7 @@ def transfer_booking(booking_id: str, transfer: RoomTransferRequest, db=Depends(
             reservation_id=res_id,
             folio=new_folio,
             guest_details=db_booking.guest_details,
+            guest_profile_id=db_booking.guest_profile_id,
             number_of_rooms=db_booking.number_of_rooms,
             pax=db_booking.pax,
             accessory_guests=db_booking.accessory_guests,
@@ -1712,10 +2570,11 @@ def transfer_booking(booking_id: str, transfer: RoomTransferRequest, db=Depends(
         
         db_booking.check_out = transfer.effectiveDate
         db_booking.reservation_id = res_id
+        _refresh_tax_breakdown(db, db_booking)
+        _refresh_tax_breakdown(db, new_booking)
         
         db.add(new_booking)
-        db.commit()
-        db.refresh(new_booking)
+        _commit_booking(db, db_booking)
         return db_booking_to_pydantic(new_booking)
     raise HTTPException(status_code=400, detail="Database mode required for transfers")
 
@@ -1735,7 +2594,9 @@ def checkout_booking(booking_id: str, db=Depends(get_db)):
     import os
     import time
     from datetime import datetime, timedelta
-    from backend.billing_utils import generate_invoice_pdf, generate_receipt_pdf
+    from backend.pdf_jobs import pdf_jobs
+    from backend.document_store import invoice_key, receipt_key
+    from backend.invoice_sequence import allocate_invoice_number, void_invoice_number
 
     # --- DURATION ADJUSTMENT LOGIC ---
     try:
@@ -1785,13 +2646,12 @@ def checkout_booking(booking_id: str, db=Depends(get_db)):
     except Exception as e:
         print(f"Warning: Failed to recalculate checkout duration: {e}")
 
-    # Generate Invoice Number
-    year = time.strftime("%Y")
-    new_serial = (prop.last_invoice_number or 0) + 1
-    invoice_num = f"INV-{year}-{new_serial:04d}"
-    
-    # Update Property Settings
-    prop.last_invoice_number = new_serial
+    # Generate Invoice Number (own short transaction; never locks property_settings)
+    try:
+        invoice_num, _, _ = allocate_invoice_number(engine)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Could not allocate invoice number: {str(e)}")
     
     # Update Booking
     booking.invoice_number = invoice_num
@@ -1810,49 +2670,297 @@ def checkout_booking(booking_id: str, db=Depends(get_db)):
             item['paymentMethod'] = 'Settled'
     
     booking.folio = current_folio
+    # Freeze the tax for the final stay length; the invoice, receipt and exports all read this
+    _refresh_tax_breakdown(db, booking, db_property_to_pydantic(prop).dict())
+    
+    booking_dict, prop_dict, include_receipt = _checkout_document_payload(db, booking, prop)
     
-    # Prepare data for PDF
-    booking_pydantic = db_booking_to_pydantic(booking)
-    prop_pydantic = db_property_to_pydantic(prop)
+    # Commit the financial state first; rendering must not hold the transaction open
+    from sqlalchemy.orm.exc import StaleDataError
+    try:
+        db.commit()
+    except StaleDataError:
+        void_invoice_number(engine, invoice_num, f"Checkout of {booking_id} raced another update")
+        raise _booking_conflict(db, booking_id)
+    except Exception as e:
+        db.rollback()
+        void_invoice_number(engine, invoice_num, f"Checkout of {booking_id} failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Checkout failed: {str(e)}")
+    
+    # Expected document-store keys (filled in on the booking once the job finishes)
+    invoice_path = invoice_key(invoice_num)
+    receipt_path = receipt_key(invoice_num) if include_receipt else None
     
-    booking_dict = booking_pydantic.dict()
+    job_id = None
+    try:
+        job_id = pdf_jobs.submit(booking_id, invoice_num, booking_dict, prop_dict, include_receipt=include_receipt)
+    except Exception as e:
+        # Checkout is already final; documents can be regenerated later
+        print(f"Error queueing checkout PDFs for {booking_id}: {e}")
+    
+    return {
+        "status": "success", 
+        "invoiceNumber": invoice_num,
+        "jobId": job_id,
+        "invoicePath": invoice_path,
+        "receiptPath": receipt_path,
+        "invoiceUrl": f"/api/bookings/{booking_id}/documents/invoice",
+        "receiptUrl": f"/api/bookings/{booking_id}/documents/receipt" if include_receipt else None
+    }
+
+@app.get("/api/billing/jobs/{job_id}")
+def get_billing_job(job_id: str):
+    """Status of a background invoice/receipt rendering job"""
+    from backend.pdf_jobs import pdf_jobs
+    job = pdf_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/billing/jobs/{job_id}/{doc}")
+def download_billing_job_document(job_id: str, doc: str, request: Request, db=Depends(get_db)):
+    """Download the invoice or receipt produced by a finished job"""
+    from backend.pdf_jobs import pdf_jobs
+    
+    job = pdf_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return download_booking_document(job["bookingId"], doc, request, db)
+
+def _refresh_tax_breakdown(db, booking, prop_dict=None, room_type_names=None):
+    """Recompute the cached GST breakdown after a booking's amount, folio or room changes (caller commits)."""
+    from backend.tax_engine import compute_tax_breakdown
+
+    if prop_dict is None:
+        prop = db.query(PropertySettingsDB).filter(PropertySettingsDB.id == "default").first()
+        prop_dict = db_property_to_pydantic(prop).dict() if prop else get_fallback_property().dict()
+
+    booking_dict = db_booking_to_pydantic(booking).dict()
+    if room_type_names is not None:
+        booking_dict['roomTypeName'] = room_type_names.get(booking.room_type_id, "Standard")
+    else:
+        rt = db.query(RoomTypeDB).filter(RoomTypeDB.id == booking.room_type_id).first()
+        booking_dict['roomTypeName'] = rt.name if rt else "Standard"
+
+    try:
+        breakdown = compute_tax_breakdown(booking_dict, prop_dict)
+    except (KeyError, TypeError, ValueError) as e:
+        # Missing/malformed dates on legacy rows; renderers fall back to computing on the fly
+        print(f"Could not compute tax breakdown for {booking.id}: {e}")
+        breakdown = None
+    # Assigning an equal value still bumps the version, and would 409 other editors of the booking
+    if breakdown != booking.tax_breakdown:
+        booking.tax_breakdown = breakdown
+    return booking.tax_breakdown
+
+def _checkout_document_payload(db, booking, prop, room_type_names=None):
+    """Plain dicts for the invoice/receipt renderer (picklable, so they can go to a worker process)."""
+    # Check if paid to generate receipt
+    total_paid = sum(p['amount'] for p in (booking.payments or []) if p.get('status') == 'Completed')
+    # We also count paid folio items
+    total_paid += sum(f.get('amount', 0) for f in (booking.folio or []) if f.get('isPaid'))
+    
+    booking_dict = db_booking_to_pydantic(booking).dict()
     # Add room type name for PDF
-    rt = db.query(RoomTypeDB).filter(RoomTypeDB.id == booking.room_type_id).first()
-    booking_dict['roomTypeName'] = rt.name if rt else "Standard"
+    if room_type_names is not None:
+        booking_dict['roomTypeName'] = room_type_names.get(booking.room_type_id, "Standard")
+    else:
+        rt = db.query(RoomTypeDB).filter(RoomTypeDB.id == booking.room_type_id).first()
+        booking_dict['roomTypeName'] = rt.name if rt else "Standard"
+    
+    prop_dict = prop if isinstance(prop, dict) else db_property_to_pydantic(prop).dict()
+    return booking_dict, prop_dict, total_paid > 0
+
+def _load_booking_document(db, booking, doc: str):
+    """
+    Fetch a checked-out booking's invoice/receipt from the document store, regenerating
+    it from booking data if it is missing (e.g. ephemeral disk, new storage backend).
+    Returns (data, etag, key).
+    """
+    from backend.document_store import get_document_store, invoice_key, receipt_key
+    from backend.pdf_jobs import save_checkout_documents
+    from backend.billing_utils import render_checkout_documents
+    
+    invoice_num = booking.invoice_number
+    if not invoice_num:
+        raise HTTPException(status_code=404, detail="Booking has not been invoiced yet")
     
-    prop_dict = prop_pydantic.dict()
+    key = invoice_key(invoice_num) if doc == "invoice" else receipt_key(invoice_num)
+    store = get_document_store()
+    found = store.get(key)
+    if found:
+        return found[0], found[1], key
+    
+    prop = db.query(PropertySettingsDB).filter(PropertySettingsDB.id == "default").first()
+    if not prop:
+        raise HTTPException(status_code=404, detail="Property settings not found")
+    booking_dict, prop_dict, include_receipt = _checkout_document_payload(db, booking, prop)
+    if doc == "receipt" and not include_receipt:
+        raise HTTPException(status_code=404, detail="No receipt for this booking")
+    
+    paths = save_checkout_documents(invoice_num, render_checkout_documents(booking_dict, prop_dict, invoice_num, include_receipt))
+    if booking.invoice_path != paths["invoicePath"] or booking.receipt_path != paths["receiptPath"]:
+        booking.invoice_path = paths["invoicePath"]
+        booking.receipt_path = paths["receiptPath"]
+        db.commit()
+    
+    data, etag = store.get(key)
+    return data, etag, key
+
+def _document_response(request: Request, data: bytes, etag: str, filename: str):
+    """Stream a stored PDF with ETag revalidation and single-range support."""
+    from fastapi.responses import Response, StreamingResponse
     
-    # PDF paths
-    os.makedirs("Billing", exist_ok=True)
-    invoice_path = f"Billing/Invoice_{invoice_num}.pdf"
-    receipt_path = f"Billing/Receipt_{invoice_num}.pdf"
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Content-Disposition": f'inline; filename="{filename}"'
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    size = len(data)
+    start, end, status = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and range_header.startswith("bytes=") and "," not in range_header and (not if_range or if_range == etag):
+        first, _, last = range_header[6:].strip().partition("-")
+        try:
+            if first:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+            else:
+                start = max(size - int(last), 0)
+        except ValueError:
+            start, end = 0, size - 1
+        else:
+            if start > end or start >= size:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    view = memoryview(data)[start:end + 1]
+    def chunks(chunk_size=64 * 1024):
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset:offset + chunk_size])
+    return StreamingResponse(chunks(), status_code=status, media_type="application/pdf", headers=headers)
+
+@app.get("/api/billing/export")
+def export_invoice_batch(start: str, end: str, db=Depends(get_db)):
+    """
+    Every invoice and receipt for bookings checked out between `start` and `end` (inclusive,
+    YYYY-MM-DD) as a streamed ZIP, plus a gst_summary.csv sheet. PDFs are rendered in
+    parallel on the PDF worker pool and written into the archive as each one finishes.
+    """
+    from fastapi.responses import StreamingResponse
     
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=400, detail="Database required for invoice export")
     try:
-        generate_invoice_pdf(booking_dict, prop_dict, invoice_num, invoice_path)
-        
-        # Check if paid to generate receipt
-        total_paid = sum(p['amount'] for p in (booking.payments or []) if p.get('status') == 'Completed')
-        # We also count paid folio items
-        total_paid += sum(f.get('amount', 0) for f in (booking.folio or []) if f.get('isPaid'))
-        
-        if total_paid > 0:
-            generate_receipt_pdf(booking_dict, prop_dict, invoice_num, receipt_path)
+        if datetime.strptime(start, "%Y-%m-%d") > datetime.strptime(end, "%Y-%m-%d"):
+            raise HTTPException(status_code=400, detail="start must not be after end")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    
+    prop = db.query(PropertySettingsDB).filter(PropertySettingsDB.id == "default").first()
+    if not prop:
+        raise HTTPException(status_code=404, detail="Property settings not found")
+    prop_dict = db_property_to_pydantic(prop).dict()
+    room_type_names = {rt.id: rt.name for rt in db.query(RoomTypeDB).all()}
+    
+    def generate():
+        import csv
+        import tempfile
+        from backend.database import SessionLocal
+        from backend.billing_export import ZipStream
+        from backend.billing_utils import invoice_summary
+        from backend.document_store import invoice_key, receipt_key
+        from backend.pdf_jobs import pdf_jobs
+        
+        # The request-scoped session is closed before the body streams, so use our own
+        session = SessionLocal()
+        summary = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+", newline="")
+        try:
+            writer = csv.writer(summary)
+            writer.writerow(["Invoice Number", "Booking ID", "Guest Name", "GSTIN (Supplier)", "Room", "Check-In",
+                             "Check-Out", "Nights", "Room Charges", "Folio Charges", "Taxable Value",
+                             "GST Rates", "CGST", "SGST", "Total GST", "Invoice Total"])
             
-        # Save paths to DB
-        booking.invoice_path = invoice_path
-        if total_paid > 0:
-            booking.receipt_path = receipt_path
+            bookings = session.query(BookingDB).filter(
+                BookingDB.status == 'CheckedOut',
+                BookingDB.invoice_number.isnot(None),
+                BookingDB.check_out >= start,
+                BookingDB.check_out <= end
+            ).order_by(BookingDB.check_out, BookingDB.invoice_number).yield_per(100)
             
-        db.commit()
-        return {
-            "status": "success", 
-            "invoiceNumber": invoice_num,
-            "invoicePath": invoice_path,
-            "receiptPath": receipt_path if total_paid > 0 else None
-        }
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Checkout failed: {str(e)}")
+            def payloads():
+                for b in bookings:
+                    booking_dict, _, include_receipt = _checkout_document_payload(session, b, prop_dict, room_type_names)
+                    totals = invoice_summary(booking_dict, prop_dict)
+                    writer.writerow([b.invoice_number, b.id, b.guest_name, prop_dict.get('gstNumber') or '',
+                                     b.room_number or '', b.check_in, b.check_out, totals["nights"],
+                                     totals["roomTotal"], totals["folioTotal"], totals["taxableValue"],
+                                     totals["gstRates"], totals["cgst"], totals["sgst"], totals["gstAmount"],
+                                     totals["grandTotal"]])
+                    yield b.invoice_number, booking_dict, prop_dict, b.invoice_number, include_receipt
+            
+            archive = ZipStream()
+            for invoice_num, rendered in pdf_jobs.render_unordered(payloads()):
+                yield archive.add(f"invoices/{invoice_key(invoice_num)}", rendered["invoice"])
+                if rendered.get("receipt"):
+                    yield archive.add(f"receipts/{receipt_key(invoice_num)}", rendered["receipt"])
+            
+            summary.seek(0)
+            yield from archive.add_file("gst_summary.csv", summary)
+            yield archive.close()
+        finally:
+            summary.close()
+            session.close()
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="invoices_{start}_to_{end}.zip"'}
+    )
+
+@app.get("/api/bookings/{booking_id}/documents/{doc}")
+def download_booking_document(booking_id: str, doc: str, request: Request, db=Depends(get_db)):
+    """Invoice or receipt for a checked-out booking (regenerated on demand if missing)"""
+    if doc not in ("invoice", "receipt"):
+        raise HTTPException(status_code=400, detail="Document must be 'invoice' or 'receipt'")
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=400, detail="Database required for billing documents")
+    
+    booking = db.query(BookingDB).filter(BookingDB.id == booking_id).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    data, etag, key = _load_booking_document(db, booking, doc)
+    return _document_response(request, data, etag, key)
+
+@app.get("/billing/{filename}")
+def download_billing_file(filename: str, request: Request, db=Depends(get_db)):
+    """Legacy /billing/Invoice_<num>.pdf links, now served from the document store"""
+    match = re.fullmatch(r'(Invoice|Receipt)_(.+)\.pdf', filename)
+    if not match:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    from backend.document_store import get_document_store
+    found = get_document_store().get(filename)
+    if found:
+        return _document_response(request, found[0], found[1], filename)
+    
+    if not USE_DATABASE() or not db:
+        raise HTTPException(status_code=404, detail="Document not found")
+    booking = db.query(BookingDB).filter(BookingDB.invoice_number == match.group(2)).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Document not found")
+    data, etag, key = _load_booking_document(db, booking, match.group(1).lower())
+    return _document_response(request, data, etag, key)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1879,35 +2987,51 @@ def db_notification_to_pydantic(db_notif):
         metadata=db_notif.metadata or {}
     )
 
+def notification_timestamp():
+    """Timezone-aware UTC ISO timestamp for notifications.created_at/read_at"""
+    from backend.notification_outbox import notification_timestamp as _timestamp
+    return _timestamp()
+
+def _publish_notification_change(conn, unread_count: int, notification: dict = None):
+    """Push a new notification (or just the new unread count) to open /api/notifications/stream clients."""
+    from backend.notification_stream import notification_broadcaster
+    try:
+        event = {"kind": "notification" if notification else "unread-count", "unreadCount": unread_count}
+        if notification:
+            event["notification"] = notification
+        notification_broadcaster.publish(conn, event)
+    except Exception as e:
+        # Streams are best-effort; clients resync the count on reconnect
+        print(f"Error publishing notification event: {e}")
+
 def create_notification_internal(db, notif_type: str, category: str, title: str, message: str, 
                                  priority: str = "normal", booking_id: str = None, 
-                                 room_number: str = None, metadata: dict = None):
-    """Helper function to create a notification from within other endpoints - uses direct SQL"""
-    import os
+                                 room_number: str = None, metadata: dict = None, group: dict = None):
+    """
+    Helper function to create a notification from within other endpoints.
+    With a session, the notification is queued and written in that session's next commit,
+    together with the caller's changes (see backend/notification_outbox.py); without one it
+    is written straight away.
+    """
     import json
     
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    if not USE_DATABASE():
         return None
     
+    from backend.notification_outbox import queue_notification, new_notification_id
+    if db is not None:
+        return queue_notification(db, notif_type, category, title, message, priority,
+                                  booking_id, room_number, metadata, group)
+    
     try:
-        from sqlalchemy import create_engine, text
+        from sqlalchemy import text
+        from backend.notification_counter import insert_notification
         
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql://", 1)
-        
-        engine = create_engine(db_url, pool_pre_ping=True)
+        notif_id = new_notification_id()
+        now = notification_timestamp()
         
-        notif_id = f"notif-{str(uuid.uuid4())[:8]}"
-        now = datetime.now().isoformat()
-        
-        insert_sql = text("""
-            INSERT INTO notifications (id, type, category, title, message, priority, is_read, is_dismissed, created_at, booking_id, room_number, metadata)
-            VALUES (:id, :type, :category, :title, :message, :priority, :is_read, :is_dismissed, :created_at, :booking_id, :room_number, :metadata)
-        """)
-        
-        with engine.connect() as conn:
-            conn.execute(insert_sql, {
+        with engine.begin() as conn:
+            unread = insert_notification(conn, {
                 "id": notif_id,
                 "type": notif_type,
                 "category": category,
@@ -1921,63 +3045,82 @@ def create_notification_internal(db, notif_type: str, category: str, title: str,
                 "room_number": room_number,
                 "metadata": json.dumps(metadata or {})
             })
-            conn.commit()
+            # Stream the stored row, so createdAt matches what the feed pages by
+            stored = conn.execute(text(f"SELECT {NOTIFICATION_COLUMNS} FROM notifications WHERE id = :id"),
+                                  {"id": notif_id}).first()
+        
+        with engine.connect() as conn:
+            _publish_notification_change(conn, unread, _notification_row_to_dict(stored))
         
         return notif_id
     except Exception as e:
         print(f"Error creating notification: {e}")
         return None
 
-@app.get("/api/notifications")
-def get_notifications(unread_only: bool = False, type_filter: str = None, limit: int = 50):
-    """Get notifications with optional filters"""
-    import os
+NOTIFICATION_COLUMNS = "id, type, category, title, message, priority, is_read, is_dismissed, created_at, read_at, booking_id, room_number, metadata"
+
+def _notification_row_to_dict(row):
+    """Convert a raw `SELECT NOTIFICATION_COLUMNS` row to the API's dict format"""
+    n = row._mapping
+    metadata = n["metadata"]
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata or "{}")
+    def iso(value):
+        # timestamptz on Postgres, ISO text on SQLite
+        return value.isoformat() if isinstance(value, datetime) else value
     
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    return {
+        "id": n["id"],
+        "type": n["type"],
+        "category": n["category"],
+        "title": n["title"],
+        "message": n["message"],
+        "priority": n["priority"],
+        "isRead": bool(n["is_read"]),
+        "isDismissed": bool(n["is_dismissed"]),
+        "createdAt": iso(n["created_at"]),
+        "readAt": iso(n["read_at"]),
+        "bookingId": n["booking_id"],
+        "roomNumber": n["room_number"],
+        "metadata": metadata or {}
+    }
+
+@app.get("/api/notifications")
+def get_notifications(response: Response, unread_only: bool = False, type_filter: str = None,
+                      booking_id: str = None, room_number: str = None, before: str = None,
+                      order: str = "recent", limit: int = 50):
+    """
+    Notification feed, newest first (or `order=priority`). `type_filter` takes one type or a
+    comma-separated list. Keyset-paginated: pass the X-Next-Cursor header of one page as
+    `before` to get the next (see backend/notification_feed.py).
+    """
+    if not USE_DATABASE():
         return []
     
+    from backend.notification_feed import ORDERS, MAX_LIMIT, parse_cursor, encode_cursor, feed_query
+    
+    if order not in ORDERS:
+        raise HTTPException(status_code=400, detail=f"order must be one of: {', '.join(ORDERS)}")
+    limit = max(1, min(limit, MAX_LIMIT))
+    types = [t.strip() for t in type_filter.split(",") if t.strip()] if type_filter else None
+    cursor = None
+    if before:
+        try:
+            cursor = parse_cursor(before, order)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid 'before' cursor")
+    
     try:
-        from sqlalchemy import create_engine, text
-        
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql://", 1)
-        
-        engine = create_engine(db_url, pool_pre_ping=True)
-        
-        # Build query
-        sql = "SELECT id, type, category, title, message, priority, is_read, is_dismissed, created_at, read_at, booking_id, room_number, metadata FROM notifications WHERE is_dismissed = FALSE"
-        
-        if unread_only:
-            sql += " AND is_read = FALSE"
-        if type_filter:
-            sql += f" AND type = '{type_filter}'"
-        
-        sql += " ORDER BY created_at DESC LIMIT :limit"
-        
+        statement, params = feed_query(
+            NOTIFICATION_COLUMNS, engine.dialect.name, unread_only=unread_only, types=types,
+            booking_id=booking_id, room_number=room_number, cursor=cursor, order=order, limit=limit
+        )
         with engine.connect() as conn:
-            result = conn.execute(text(sql), {"limit": limit})
-            rows = result.fetchall()
-        
-        # Convert to dict format
-        notifications = []
-        for row in rows:
-            notifications.append({
-                "id": row[0],
-                "type": row[1],
-                "category": row[2],
-                "title": row[3],
-                "message": row[4],
-                "priority": row[5],
-                "isRead": row[6],
-                "isDismissed": row[7],
-                "createdAt": row[8],
-                "readAt": row[9],
-                "bookingId": row[10],
-                "roomNumber": row[11],
-                "metadata": row[12] or {}
-            })
+            rows = conn.execute(statement, params).fetchall()
         
+        notifications = [_notification_row_to_dict(row) for row in rows[:limit]]
+        if len(rows) > limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(notifications[-1], order)
         return notifications
     except Exception as e:
         print(f"Error fetching notifications: {e}")
@@ -1985,87 +3128,162 @@ def get_notifications(unread_only: bool = False, type_filter: str = None, limit:
 
 @app.get("/api/notifications/unread-count")
 def get_unread_notification_count():
-    """Get count of unread notifications"""
-    import os
-    
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    """Get count of unread notifications (maintained counter, see backend/notification_counter.py)"""
+    if not USE_DATABASE():
         return {"count": 0}
     
     try:
-        from sqlalchemy import create_engine, text
-        
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql://", 1)
-        
-        engine = create_engine(db_url, pool_pre_ping=True)
-        
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM notifications WHERE is_read = FALSE AND is_dismissed = FALSE"))
-            count = result.scalar()
-        
-        return {"count": count or 0}
+        from backend.notification_counter import unread_cache
+        return {"count": unread_cache.get(engine)}
     except Exception as e:
         print(f"Error counting notifications: {e}")
         return {"count": 0}
 
+@app.post("/api/notifications/reconcile")
+def reconcile_notification_count():
+    """Recount unread notifications and repair the maintained counter if it drifted"""
+    if not USE_DATABASE():
+        raise HTTPException(status_code=503, detail="Database not available")
+    from backend.notification_counter import reconcile_unread_counter
+    before, actual = reconcile_unread_counter(engine)
+    if before != actual:
+        print(f"Unread notification counter drifted: {before} -> {actual}")
+        with engine.connect() as conn:
+            _publish_notification_change(conn, actual)
+    return {"before": before, "count": actual, "drift": (actual - before) if before is not None else None}
+
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_REPLAY_LIMIT = 100
+
+def _notification_stream_backlog(last_event_id: str = None):
+    """Notifications created after `last_event_id` (oldest first) plus the current unread count."""
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        missed = []
+        if last_event_id:
+            # Same (created_at, id) keyset as the feed: rows sharing the last one's timestamp
+            # (grouped and bulk inserts) are replayed too
+            rows = conn.execute(text(f"""
+                SELECT {NOTIFICATION_COLUMNS} FROM notifications
+                CROSS JOIN (SELECT created_at AS last_at FROM notifications WHERE id = :last_id) AS seen
+                WHERE is_dismissed = FALSE
+                  AND (created_at, id) > (seen.last_at, :last_id)
+                ORDER BY created_at ASC, id ASC LIMIT :limit
+            """), {"last_id": last_event_id, "limit": STREAM_REPLAY_LIMIT}).fetchall()
+            missed = [_notification_row_to_dict(row) for row in rows]
+    from backend.notification_counter import unread_cache
+    return missed, unread_cache.get(engine)
+
+def _sse(event: str, data: dict, event_id: str = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    return "\n".join(lines) + "\n\n"
+
+@app.get("/api/notifications/stream")
+async def stream_notifications(request: Request, lastEventId: Optional[str] = None):
+    """
+    Server-sent events: `notification` for each new notification (id = notification id)
+    and `unread-count` whenever the count changes. Reconnects resume after the
+    Last-Event-ID header (or ?lastEventId=) by replaying what was missed.
+    """
+    import asyncio
+    from fastapi.responses import StreamingResponse
+    from starlette.concurrency import run_in_threadpool
+    from backend.notification_stream import notification_broadcaster
+    
+    if not USE_DATABASE():
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    last_event_id = request.headers.get("last-event-id") or lastEventId
+    
+    async def events():
+        # Subscribe before reading the backlog so nothing slips in between
+        queue = notification_broadcaster.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            missed, unread = await run_in_threadpool(_notification_stream_backlog, last_event_id)
+            for n in missed:
+                yield _sse("notification", n, n["id"])
+            yield _sse("unread-count", {"count": unread})
+            
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event.get("kind") == "notification":
+                    yield _sse("notification", event["notification"], event["notification"]["id"])
+                yield _sse("unread-count", {"count": event.get("unreadCount", 0)})
+        finally:
+            notification_broadcaster.unsubscribe(queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @app.post("/api/notifications")
-def create_notification(notification: NotificationCreate, db=Depends(get_db)):
+def create_notification(notification: NotificationCreate):
     """Create a new notification"""
-    if not USE_DATABASE() or not db:
+    if not USE_DATABASE():
         raise HTTPException(status_code=503, detail="Database not available")
     
-    notif_id = f"notif-{str(uuid.uuid4())[:8]}"
-    
-    new_notif = NotificationDB(
-        id=notif_id,
-        type=notification.type,
+    notif_id = create_notification_internal(
+        None,
+        notif_type=notification.type,
         category=notification.category,
         title=notification.title,
         message=notification.message,
         priority=notification.priority,
-        is_read=False,
-        is_dismissed=False,
-        created_at=datetime.now().isoformat(),
         booking_id=notification.bookingId,
         room_number=notification.roomNumber,
-        metadata=notification.metadata or {}
+        metadata=notification.metadata
     )
+    if not notif_id:
+        raise HTTPException(status_code=500, detail="Could not create notification")
+    
+    # Read back what was stored: clients page (cursor) and resume streams (Last-Event-ID)
+    # from this createdAt, so it must be the database's value, not a second clock reading
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        row = conn.execute(text(f"SELECT {NOTIFICATION_COLUMNS} FROM notifications WHERE id = :id"),
+                           {"id": notif_id}).first()
+    return Notification(**_notification_row_to_dict(row))
+
+@app.post("/api/notifications/retention")
+def run_notification_retention():
+    """Archive old read/dismissed notifications and roll the monthly partitions (also runs daily)"""
+    if not USE_DATABASE():
+        raise HTTPException(status_code=503, detail="Database not available")
+    from backend.notification_retention import run_retention
+    result = run_retention(engine)
+    print(f"Notification retention: {result}")
+    return result
+
+def _update_notifications(set_clause: str, where_clause: str, params: dict):
+    """Apply a read/dismiss UPDATE with the unread counter kept in step, then push the new count."""
+    from backend.notification_counter import update_notifications
     
-    db.add(new_notif)
-    db.commit()
-    db.refresh(new_notif)
-    
-    return db_notification_to_pydantic(new_notif)
+    with engine.begin() as conn:
+        matched, unread = update_notifications(conn, set_clause, where_clause, params)
+    with engine.connect() as conn:
+        _publish_notification_change(conn, unread)
+    return matched
 
 @app.put("/api/notifications/{notification_id}/read")
 def mark_notification_read(notification_id: str):
     """Mark a single notification as read"""
-    import os
-    from datetime import datetime
-    
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    if not USE_DATABASE():
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        from sqlalchemy import create_engine, text
-        
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql://", 1)
-        
-        engine = create_engine(db_url, pool_pre_ping=True)
-        now = datetime.now().isoformat()
-        
-        with engine.connect() as conn:
-            result = conn.execute(
-                text("UPDATE notifications SET is_read = TRUE, read_at = :read_at WHERE id = :id"),
-                {"id": notification_id, "read_at": now}
-            )
-            conn.commit()
-            
-            if result.rowcount == 0:
-                raise HTTPException(status_code=404, detail="Notification not found")
+        matched = _update_notifications(
+            "is_read = TRUE, read_at = :read_at", "id = :id",
+            {"id": notification_id, "read_at": notification_timestamp()}
+        )
+        if matched == 0:
+            raise HTTPException(status_code=404, detail="Notification not found")
         
         return {"status": "success"}
     except HTTPException:
@@ -2076,29 +3294,12 @@ def mark_notification_read(notification_id: str):
 @app.put("/api/notifications/read-all")
 def mark_all_notifications_read():
     """Mark all notifications as read"""
-    import os
-    from datetime import datetime
-    
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    if not USE_DATABASE():
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        from sqlalchemy import create_engine, text
-        
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql://", 1)
-        
-        engine = create_engine(db_url, pool_pre_ping=True)
-        now = datetime.now().isoformat()
-        
-        with engine.connect() as conn:
-            conn.execute(
-                text("UPDATE notifications SET is_read = TRUE, read_at = :read_at WHERE is_read = FALSE"),
-                {"read_at": now}
-            )
-            conn.commit()
-        
+        _update_notifications("is_read = TRUE, read_at = :read_at", "is_read = FALSE",
+                              {"read_at": notification_timestamp()})
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2106,29 +3307,13 @@ def mark_all_notifications_read():
 @app.delete("/api/notifications/{notification_id}")
 def dismiss_notification(notification_id: str):
     """Dismiss/delete a notification"""
-    import os
-    
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    if not USE_DATABASE():
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        from sqlalchemy import create_engine, text
-        
-        if db_url.startswith("postgres://"):
-            db_url = db_url.replace("postgres://", "postgresql://", 1)
-        
-        engine = create_engine(db_url, pool_pre_ping=True)
-        
-        with engine.connect() as conn:
-            result = conn.execute(
-                text("UPDATE notifications SET is_dismissed = TRUE WHERE id = :id"),
-                {"id": notification_id}
-            )
-            conn.commit()
-            
-            if result.rowcount == 0:
-                raise HTTPException(status_code=404, detail="Notification not found")
+        matched = _update_notifications("is_dismissed = TRUE", "id = :id", {"id": notification_id})
+        if matched == 0:
+            raise HTTPException(status_code=404, detail="Notification not found")
         
         return {"status": "success"}
     except HTTPException:
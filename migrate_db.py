@@ -1,8 +1,176 @@
 
 import os
+from datetime import timedelta
 import psycopg2
 from dotenv import load_dotenv
 import sys
+from psycopg2.extras import execute_values
+
+def partition_notifications(cur):
+    """
+    Rebuild `notifications` as a table range-partitioned by month on a timestamptz created_at.
+    Legacy ISO strings have no zone; they are read as NOTIFICATION_LEGACY_TZ (default UTC,
+    which is what Vercel's clock wrote).
+    """
+    legacy_tz = os.getenv("NOTIFICATION_LEGACY_TZ", "UTC")
+    print(f"Partitioning notifications by month (legacy timestamps read as {legacy_tz})...")
+    cur.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_name = 'notifications' AND column_name IN ('created_at', 'read_at');
+    """)
+    types = dict(cur.fetchall())
+
+    def as_timestamptz(column):
+        if types.get(column, '').startswith('timestamp with'):
+            return column
+        return f"NULLIF({column}, '')::timestamp AT TIME ZONE %(tz)s"
+
+    cur.execute("BEGIN;")
+    try:
+        # Partition bounds are UTC month boundaries
+        cur.execute("SET LOCAL TIME ZONE 'UTC';")
+        cur.execute("""
+            CREATE TABLE notifications_partitioned (
+                id VARCHAR NOT NULL,
+                type VARCHAR NOT NULL,
+                category VARCHAR NOT NULL,
+                title VARCHAR NOT NULL,
+                message VARCHAR NOT NULL,
+                priority VARCHAR DEFAULT 'normal',
+                is_read BOOLEAN DEFAULT FALSE,
+                is_dismissed BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                read_at TIMESTAMPTZ,
+                booking_id VARCHAR REFERENCES bookings(id),
+                room_number VARCHAR,
+                metadata JSON DEFAULT '{}',
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+        """)
+        cur.execute("CREATE TABLE notifications_default PARTITION OF notifications_partitioned DEFAULT;")
+
+        # One partition per month from the oldest notification to two months ahead
+        cur.execute(f"""
+            SELECT date_trunc('month', COALESCE(MIN({as_timestamptz('created_at')}), NOW()))
+            FROM notifications;
+        """, {"tz": legacy_tz})
+        month = cur.fetchone()[0].replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        cur.execute("SELECT date_trunc('month', NOW() + INTERVAL '2 months')::timestamp;")
+        last = cur.fetchone()[0]
+        while month <= last:
+            nxt = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+            name = f"notifications_y{month.year:04d}m{month.month:02d}"
+            cur.execute(
+                f"CREATE TABLE {name} PARTITION OF notifications_partitioned "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{nxt:%Y-%m-%d} 00:00:00+00');"
+            )
+            month = nxt
+
+        cur.execute(f"""
+            INSERT INTO notifications_partitioned
+                (id, type, category, title, message, priority, is_read, is_dismissed,
+                 created_at, read_at, booking_id, room_number, metadata)
+            SELECT id, type, category, title, message, priority, is_read, is_dismissed,
+                   {as_timestamptz('created_at')}, {as_timestamptz('read_at')},
+                   booking_id, room_number, metadata
+            FROM notifications;
+        """, {"tz": legacy_tz})
+        cur.execute("DROP TABLE notifications;")
+        cur.execute("ALTER TABLE notifications_partitioned RENAME TO notifications;")
+        cur.execute("CREATE INDEX ix_notifications_id ON notifications (id);")
+        cur.execute("CREATE INDEX idx_notifications_active_created ON notifications (created_at) WHERE NOT is_dismissed;")
+        cur.execute("COMMIT;")
+        print("Done.")
+    except Exception:
+        cur.execute("ROLLBACK;")
+        raise
+
+def backfill_guest_phones(cur, batch_size=5000):
+    """Fill guest_profiles.phone_e164 for rows written before the column existed."""
+    from backend.guest_search import normalize_phone
+    last_id, filled = 0, 0
+    while True:
+        cur.execute("""
+            SELECT id, phone_number FROM guest_profiles
+            WHERE phone_e164 IS NULL AND id > %s ORDER BY id LIMIT %s;
+        """, (last_id, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = [(pid, normalize_phone(phone)) for pid, phone in rows if normalize_phone(phone)]
+        if values:
+            execute_values(cur, """
+                UPDATE guest_profiles g SET phone_e164 = v.phone_e164
+                FROM (VALUES %s) AS v (id, phone_e164) WHERE g.id = v.id;
+            """, values)
+            filled += len(values)
+    print(f"Normalized {filled} guest phone numbers.")
+
+def backfill_booking_profiles(cur, batch_size=5000):
+    """Link existing bookings to guest profiles: the profileId in guest_details, else the same phone (name match preferred)."""
+    from backend.guest_search import normalize_phone
+    cur.execute("""
+        UPDATE bookings b SET guest_profile_id = (b.guest_details->>'profileId')::int
+        FROM guest_profiles g
+        WHERE b.guest_profile_id IS NULL
+          AND b.guest_details->>'profileId' ~ '^[0-9]+$'
+          AND g.id = (b.guest_details->>'profileId')::int;
+    """)
+    linked = cur.rowcount
+    last_id = ''
+    while True:
+        cur.execute("""
+            SELECT id, guest_details->>'phoneNumber' FROM bookings
+            WHERE guest_profile_id IS NULL AND guest_details->>'phoneNumber' IS NOT NULL AND id > %s
+            ORDER BY id LIMIT %s;
+        """, (last_id, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = [(bid, normalize_phone(phone)) for bid, phone in rows if normalize_phone(phone)]
+        if values:
+            execute_values(cur, """
+                UPDATE bookings b SET guest_profile_id = (
+                    SELECT g.id FROM guest_profiles g WHERE g.phone_e164 = v.phone_e164
+                    ORDER BY (g.name = b.guest_name) DESC, g.last_check_in DESC NULLS LAST LIMIT 1
+                )
+                FROM (VALUES %s) AS v (booking_id, phone_e164) WHERE b.id = v.booking_id;
+            """, values)
+    cur.execute("SELECT COUNT(*) FROM bookings WHERE guest_profile_id IS NOT NULL;")
+    print(f"Linked {linked} bookings by profileId; {cur.fetchone()[0]} bookings now have a guest profile.")
+
+def merge_duplicate_guest_profiles(cur):
+    """Collapse profiles sharing (phone_e164, name) into the most recent one so the upsert key can be unique."""
+    cur.execute("""
+        CREATE TEMP TABLE guest_profile_dups ON COMMIT DROP AS
+        SELECT id, keep FROM (
+            SELECT id, FIRST_VALUE(id) OVER (
+                PARTITION BY phone_e164, name ORDER BY last_check_in DESC NULLS LAST, id
+            ) AS keep
+            FROM guest_profiles WHERE phone_e164 IS NOT NULL
+        ) ranked WHERE id <> keep;
+    """)
+    cur.execute("SELECT COUNT(*) FROM guest_profile_dups;")
+    if not cur.fetchone()[0]:
+        return
+    cur.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = 'guest_profiles' AND data_type IN ('character varying', 'text')
+          AND column_name NOT IN ('name', 'phone_number', 'phone_e164', 'last_check_in');
+    """)
+    text_columns = [r[0] for r in cur.fetchall()]
+    # Blanks on the kept profile are filled from a duplicate
+    fill = ", ".join(f"{c} = COALESCE(NULLIF(k.{c}, ''), d.{c})" for c in text_columns)
+    cur.execute(f"""
+        UPDATE guest_profiles k SET {fill}
+        FROM guest_profile_dups m JOIN guest_profiles d ON d.id = m.id
+        WHERE k.id = m.keep;
+    """)
+    cur.execute("UPDATE bookings b SET guest_profile_id = m.keep FROM guest_profile_dups m WHERE b.guest_profile_id = m.id;")
+    cur.execute("DELETE FROM guest_profiles g USING guest_profile_dups m WHERE g.id = m.id;")
+    print(f"Merged {cur.rowcount} duplicate guest profiles.")
 
 def migrate(env_file):
     print(f"Migrating with {env_file}...")
@@ -38,6 +206,126 @@ def migrate(env_file):
         else:
             print("Auto-parsing columns already exist.")
 
+        print("Checking for GST breakdown columns...")
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='property_settings' AND column_name='room_gst_slabs';")
+        if not cur.fetchone():
+            print("Adding room_gst_slabs column...")
+            cur.execute("ALTER TABLE property_settings ADD COLUMN room_gst_slabs JSONB DEFAULT '[]'::jsonb;")
+            print("Done.")
+        else:
+            print("Column room_gst_slabs already exists.")
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='bookings' AND column_name='tax_breakdown';")
+        if not cur.fetchone():
+            print("Adding tax_breakdown column...")
+            cur.execute("ALTER TABLE bookings ADD COLUMN tax_breakdown JSONB;")
+            print("Done.")
+        else:
+            print("Column tax_breakdown already exists.")
+
+        print("Ensuring notification counter and feed index...")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS notification_counters (
+                name VARCHAR PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0,
+                updated_at VARCHAR
+            );
+        """)
+        cur.execute("""
+            INSERT INTO notification_counters (name, value, updated_at)
+            SELECT 'unread', COUNT(*), NOW()::text FROM notifications WHERE is_read = FALSE AND is_dismissed = FALSE
+            ON CONFLICT (name) DO NOTHING;
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_active_created ON notifications (created_at) WHERE NOT is_dismissed;")
+        print("Done.")
+
+        print("Ensuring guest lookup indexes...")
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='guest_profiles' AND column_name='phone_e164';")
+        if not cur.fetchone():
+            print("Adding phone_e164 column...")
+            cur.execute("ALTER TABLE guest_profiles ADD COLUMN phone_e164 VARCHAR;")
+        backfill_guest_phones(cur)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_guest_profiles_phone_e164 ON guest_profiles (phone_e164);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_guest_profiles_name_trgm ON guest_profiles USING gin (name gin_trgm_ops);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_guest_profiles_name_prefix ON guest_profiles (lower(name) text_pattern_ops);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_guest_profiles_phone_prefix ON guest_profiles (phone_e164 text_pattern_ops);")
+        print("Done.")
+
+        print("Checking bookings.guest_profile_id...")
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='bookings' AND column_name='guest_profile_id';")
+        if not cur.fetchone():
+            print("Adding guest_profile_id column...")
+            cur.execute("ALTER TABLE bookings ADD COLUMN guest_profile_id INTEGER REFERENCES guest_profiles(id);")
+        backfill_booking_profiles(cur)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_guest_profile_checkin ON bookings (guest_profile_id, check_in DESC);")
+        print("Done.")
+
+        print("Checking bookings.version...")
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='bookings' AND column_name='version';")
+        if not cur.fetchone():
+            print("Adding version column...")
+            cur.execute("ALTER TABLE bookings ADD COLUMN version INTEGER NOT NULL DEFAULT 1;")
+        print("Done.")
+
+        print("Ensuring booking status/date indexes...")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_checkin ON bookings (status, check_in);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_checkout ON bookings (status, check_out);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_unassigned ON bookings (check_out) "
+                    "WHERE room_number IS NULL OR room_number = 'Unassigned';")
+        print("Done.")
+
+        print("Ensuring guest profile upsert key...")
+        cur.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'uq_guest_profiles_phone_name';")
+        if not cur.fetchone():
+            cur.execute("BEGIN;")
+            try:
+                merge_duplicate_guest_profiles(cur)
+                cur.execute("CREATE UNIQUE INDEX uq_guest_profiles_phone_name ON guest_profiles (phone_e164, name);")
+                cur.execute("COMMIT;")
+            except Exception:
+                cur.execute("ROLLBACK;")
+                raise
+        print("Done.")
+
+        print("Checking notifications partitioning...")
+        cur.execute("SELECT relkind FROM pg_class WHERE relname = 'notifications';")
+        if cur.fetchone()[0] != 'p':
+            partition_notifications(cur)
+        else:
+            print("Notifications table already partitioned.")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS notifications_archive (
+                id VARCHAR NOT NULL,
+                type VARCHAR NOT NULL,
+                category VARCHAR NOT NULL,
+                title VARCHAR NOT NULL,
+                message VARCHAR NOT NULL,
+                priority VARCHAR DEFAULT 'normal',
+                is_read BOOLEAN DEFAULT FALSE,
+                is_dismissed BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMPTZ NOT NULL,
+                read_at TIMESTAMPTZ,
+                booking_id VARCHAR,
+                room_number VARCHAR,
+                metadata JSON DEFAULT '{}',
+                archived_at TIMESTAMPTZ NOT NULL,
+                PRIMARY KEY (id, created_at)
+            );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_notifications_archive_booking_id ON notifications_archive (booking_id);")
+
+        print("Ensuring notification feed indexes...")
+        # Keyset pages order by (created_at, id); the old feed index had id only as an INCLUDE column
+        cur.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'idx_notifications_feed';")
+        row = cur.fetchone()
+        if row and "INCLUDE (id" in row[0]:
+            cur.execute("DROP INDEX idx_notifications_feed;")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_feed ON notifications (is_dismissed, is_read, created_at DESC, id DESC) INCLUDE (type, priority);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_priority ON notifications (is_dismissed, priority, created_at DESC, id DESC) INCLUDE (is_read, type);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_booking ON notifications (booking_id, created_at DESC, id DESC);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_room ON notifications (room_number, created_at DESC, id DESC);")
+        print("Done.")
+
         cur.close()
         conn.close()
     except Exception as e:
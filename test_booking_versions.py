@@ -0,0 +1,108 @@
+"""
+Optimistic locking on booking writes (version column + ETag / If-Match) against a
+throwaway SQLite database.
+
+Covers conditional PATCH and PUT, the 409 carrying the current booking, and
+If-None-Match on reads. Conflicts are provoked by sending a stale version, not
+by racing writers: SQLite serializes writes, so the UPDATE ... WHERE version
+check is exercised one request at a time.
+
+Usage: python -m pytest test_booking_versions.py
+"""
+import pytest
+from sqlalchemy import text
+
+ROOM_TYPE = "bv-standard"
+
+
+@pytest.fixture(autouse=True)
+def _room_type(room_type):
+    room_type(ROOM_TYPE, ["V1", "V2", "V3"])
+
+
+def _book(client, booking_id, room):
+    response = client.post("/api/bookings", json={
+        "id": booking_id, "roomTypeId": ROOM_TYPE, "roomNumber": room, "guestName": booking_id,
+        "source": "Direct", "status": "Confirmed", "timestamp": 0,
+        "checkIn": "2027-02-01", "checkOut": "2027-02-03", "amount": 2000,
+    })
+    assert response.status_code == 200, response.text
+    return client.get(f"/api/bookings/{booking_id}")
+
+
+def test_patch_with_stale_etag_gets_409_and_current_booking(client):
+    etag = _book(client, "bv-patch", "V1").headers["etag"]
+
+    first = client.patch("/api/bookings/bv-patch", json={"specialRequests": "late arrival"},
+                         headers={"If-Match": etag})
+    assert first.status_code == 200, first.text
+    assert first.headers["etag"] != etag
+
+    # A second client still holding the old ETag must not overwrite the first edit
+    stale = client.patch("/api/bookings/bv-patch", json={"specialRequests": "early arrival"},
+                         headers={"If-Match": etag})
+    assert stale.status_code == 409
+    assert stale.headers["etag"] == first.headers["etag"]
+    assert stale.json()["detail"]["current"]["specialRequests"] == "late arrival"
+
+    # Retrying against the version from the 409 goes through
+    retry = client.patch("/api/bookings/bv-patch", json={"specialRequests": "early arrival"},
+                         headers={"If-Match": stale.headers["etag"]})
+    assert retry.status_code == 200, retry.text
+    assert client.get("/api/bookings/bv-patch").json()["specialRequests"] == "early arrival"
+
+
+def test_version_in_body_and_unconditional_writes(client):
+    version = _book(client, "bv-body", "V2").json()["version"]
+
+    assert client.patch("/api/bookings/bv-body", json={"pax": 2, "version": version}).status_code == 200
+    assert client.patch("/api/bookings/bv-body", json={"pax": 3, "version": version}).status_code == 409
+
+    # Without If-Match or version the write is unconditional
+    assert client.patch("/api/bookings/bv-body", json={"pax": 3}).status_code == 200
+    assert client.get("/api/bookings/bv-body").json()["pax"] == 3
+
+
+def test_put_with_stale_version_gets_409(client):
+    booking = _book(client, "bv-put", "V3").json()
+    assert client.put("/api/bookings/bv-put/status", json={"status": "CheckedIn"}).status_code == 200
+
+    response = client.put("/api/bookings/bv-put", json={**booking, "amount": 2500})
+    assert response.status_code == 409
+    assert response.json()["detail"]["current"]["status"] == "CheckedIn"
+    assert client.get("/api/bookings/bv-put").json()["amount"] == 2000
+
+
+def test_etag_headers(client):
+    etag = _book(client, "bv-etag", "V1").headers["etag"]
+    assert client.get("/api/bookings/bv-etag", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/bookings/bv-etag", headers={"If-None-Match": '"0"'}).status_code == 200
+    assert client.patch("/api/bookings/bv-etag", json={"pax": 2},
+                        headers={"If-Match": "not-a-version"}).status_code == 400
+
+
+
+def test_folio_append_survives_a_concurrent_write(app_db, client, monkeypatch):
+    _book(client, "bv-folio", "V2")
+    apply_side_effects = app_db._apply_booking_side_effects
+    calls = []
+
+    def write_in_between(db, db_booking, *args, **kwargs):
+        # Another terminal saves the booking after this request loaded it
+        if not calls:
+            with app_db.engine.begin() as conn:
+                conn.execute(text("UPDATE bookings SET version = version + 1, pax = 2 WHERE id = 'bv-folio'"))
+        calls.append(db_booking.id)
+        return apply_side_effects(db, db_booking, *args, **kwargs)
+
+    monkeypatch.setattr(app_db, "_apply_booking_side_effects", write_in_between)
+    response = client.post("/api/bookings/bv-folio/folio", json={
+        "id": "bv-tea", "description": "Tea", "amount": 50, "category": "F&B", "timestamp": "2027-02-01T09:00:00",
+    })
+    assert response.status_code == 200, response.text
+    assert len(calls) == 2
+
+    booking = client.get("/api/bookings/bv-folio").json()
+    assert [f["id"] for f in booking["folio"]] == ["bv-tea"]
+    assert booking["pax"] == 2
+    assert response.headers["etag"] == f'"{booking["version"]}"'
@@ -0,0 +1,118 @@
+"""
+Front desk board cache (backend/frontdesk_board.py) against a throwaway SQLite database.
+
+Each test reads the board first so it is cached, then writes through the API and
+checks that the next read reflects the write (re-filed from the commit hook, well
+inside FRONTDESK_CACHE_SECONDS) and that the ETag moves with it.
+
+Usage: python -m pytest test_frontdesk_board.py
+"""
+import pytest
+
+from backend.database import SessionLocal
+from backend.frontdesk_board import frontdesk_board
+
+ROOM_TYPE = "fd-suite"
+DAY = "2027-06-10"
+
+
+@pytest.fixture(autouse=True)
+def _room_type(room_type):
+    room_type(ROOM_TYPE, ["F1", "F2", "F3"], base_price=3000)
+
+
+def _board(client, etag=None):
+    response = client.get("/api/frontdesk/today", params={"date": DAY},
+                          headers={"If-None-Match": etag} if etag else {})
+    assert response.status_code in (200, 304), response.text
+    return response
+
+
+def _ids(board, section):
+    return {row["id"] for row in board[section]}
+
+
+def _room(board, number):
+    return next(room for room in board["rooms"] if room["roomNumber"] == number)
+
+
+def _book(client, booking_id, room, check_in=DAY, check_out="2027-06-12"):
+    response = client.post("/api/bookings", json={
+        "id": booking_id, "roomTypeId": ROOM_TYPE, "roomNumber": room, "guestName": booking_id,
+        "source": "Direct", "status": "Confirmed", "timestamp": 0,
+        "checkIn": check_in, "checkOut": check_out, "amount": 6000,
+    })
+    assert response.status_code == 200, response.text
+
+
+def test_booking_writes_refresh_the_cached_board(client):
+    before = _board(client)
+    assert "fd-arrival" not in _ids(before.json(), "arrivals")
+    assert _board(client, before.headers["etag"]).status_code == 304
+
+    _book(client, "fd-arrival", "F1")
+    arrived = _board(client, before.headers["etag"])
+    assert arrived.status_code == 200
+    assert arrived.headers["etag"] != before.headers["etag"]
+    assert "fd-arrival" in _ids(arrived.json(), "arrivals")
+    assert _room(arrived.json(), "F1")["status"] == "arriving"
+
+    assert client.put("/api/bookings/fd-arrival/status", json={"status": "CheckedIn"}).status_code == 200
+    checked_in = _board(client).json()
+    assert "fd-arrival" not in _ids(checked_in, "arrivals")
+    assert "fd-arrival" in _ids(checked_in, "inHouse")
+    assert _room(checked_in, "F1")["occupant"]["id"] == "fd-arrival"
+
+    assert client.put("/api/bookings/fd-arrival/status", json={"status": "CheckedOut"}).status_code == 200
+    checked_out = _board(client).json()
+    assert "fd-arrival" not in _ids(checked_out, "inHouse")
+    assert _room(checked_out, "F1")["status"] == "vacant"
+
+
+def test_room_assignment_and_cancellation(client):
+    _board(client)
+    _book(client, "fd-unassigned", "Unassigned", check_in="2027-06-09")
+    board = _board(client).json()
+    assert "fd-unassigned" in _ids(board, "unassigned")
+
+    assert client.put("/api/bookings/fd-unassigned/room", json={"roomNumber": "F2"}).status_code == 200
+    assert "fd-unassigned" not in _ids(_board(client).json(), "unassigned")
+
+    _book(client, "fd-cancelled", "F3")
+    assert "fd-cancelled" in _ids(_board(client).json(), "arrivals")
+    assert client.put("/api/bookings/fd-cancelled/status", json={"status": "Cancelled"}).status_code == 200
+    board = _board(client).json()
+    assert "fd-cancelled" not in _ids(board, "arrivals")
+    assert _room(board, "F3")["status"] == "vacant"
+
+
+def test_room_type_changes_drop_the_cache(client):
+    _board(client)
+    from backend.db_models import RoomTypeDB
+    db = SessionLocal()
+    room_type = db.get(RoomTypeDB, ROOM_TYPE)
+    room_type.room_numbers = ["F1", "F2", "F3", "F4"]
+    db.commit()
+    db.close()
+    assert _room(_board(client).json(), "F4")["status"] == "vacant"
+
+
+
+def test_invalidate_during_a_build_is_not_lost(client, monkeypatch):
+    _board(client)
+    frontdesk_board.invalidate()
+    read = frontdesk_board._read
+
+    def bulk_write_while_reading(engine, business_date):
+        entry = read(engine, business_date)
+        # e.g. a night audit or import commits (and invalidates) after these rows were read
+        frontdesk_board.invalidate()
+        return entry
+
+    monkeypatch.setattr(frontdesk_board, "_read", bulk_write_while_reading)
+    _board(client)
+    assert DAY not in frontdesk_board._entries
+
+    monkeypatch.setattr(frontdesk_board, "_read", read)
+    _board(client)
+    assert DAY in frontdesk_board._entries
@@ -0,0 +1,61 @@
+"""
+Concurrency check for invoice number allocation.
+
+Runs parallel checkouts against a throwaway SQLite database and asserts that
+every booking gets a distinct, gap-free INV-YYYY-NNNN. SQLite serializes
+writers, so this checks the allocation logic and numbering, not how
+UPDATE ... RETURNING behaves under real contention on Postgres.
+
+Usage: python -m pytest test_invoice_sequence.py
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.database import SessionLocal
+from backend.invoice_sequence import allocate_invoice_number, current_invoice_number, financial_year
+
+PARALLEL_CHECKOUTS = 24
+
+
+def _seed(room_type):
+    from backend.db_models import PropertySettingsDB, BookingDB
+
+    room_type("inv-deluxe", [str(100 + i) for i in range(PARALLEL_CHECKOUTS)])
+    db = SessionLocal()
+    db.merge(PropertySettingsDB(id="default", name="Test Hotel", address="Test", check_out_time="23:59"))
+    for i in range(PARALLEL_CHECKOUTS):
+        db.add(BookingDB(
+            id=f"inv-{i}", room_type_id="inv-deluxe", room_number=str(100 + i), guest_name=f"Guest {i}",
+            source="Direct", status="CheckedIn", timestamp=0,
+            check_in="2026-01-01", check_out="2026-01-02", amount=1000, folio=[], payments=[]
+        ))
+    db.commit()
+    db.close()
+
+
+def _checkout(app_db, booking_id):
+    db = SessionLocal()
+    try:
+        return app_db.checkout_booking(booking_id, db=db)["invoiceNumber"]
+    finally:
+        db.close()
+
+
+def test_parallel_checkouts_get_unique_invoice_numbers(app_db, room_type):
+    _seed(room_type)
+    start = current_invoice_number(app_db.engine)
+
+    from backend.pdf_jobs import pdf_jobs
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            numbers = list(pool.map(lambda i: _checkout(app_db, f"inv-{i}"), range(PARALLEL_CHECKOUTS)))
+
+        fy = financial_year()
+        assert len(set(numbers)) == PARALLEL_CHECKOUTS
+        assert sorted(numbers) == [f"INV-{fy}-{n:04d}" for n in range(start + 1, start + PARALLEL_CHECKOUTS + 1)]
+
+        # The next allocation continues after the last checkout
+        next_number, _, serial = allocate_invoice_number(app_db.engine)
+        assert serial == start + PARALLEL_CHECKOUTS + 1
+    finally:
+        # Checkout queues PDF renders; don't leave worker processes behind when an assertion fails
+        pdf_jobs.shutdown()
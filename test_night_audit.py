@@ -0,0 +1,82 @@
+"""
+Night audit (backend/night_audit.py) against a throwaway SQLite database.
+
+Covers the open-day guard, no-show flagging and room revenue postings for a
+date audited after its guests have checked out.
+
+Usage: python -m pytest test_night_audit.py
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from backend.night_audit import current_business_date, closable_business_date
+
+ROOM_TYPE = "na-deluxe"
+
+
+@pytest.fixture(autouse=True)
+def _room_type(room_type):
+    room_type(ROOM_TYPE, ["N1", "N2", "N3", "N4"])
+
+
+def _book(client, booking_id, room, check_in, check_out, status="Confirmed", amount=3000):
+    response = client.post("/api/bookings", json={
+        "id": booking_id, "roomTypeId": ROOM_TYPE, "roomNumber": room, "guestName": booking_id,
+        "source": "Direct", "status": "Confirmed", "timestamp": 0,
+        "checkIn": check_in, "checkOut": check_out, "amount": amount,
+    })
+    assert response.status_code == 200, response.text
+    if status != "Confirmed":
+        assert client.put(f"/api/bookings/{booking_id}/status", json={"status": status}).status_code == 200
+
+
+def _postings(engine, business_date):
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT booking_id, amount FROM room_revenue_postings WHERE business_date = :d AND room_type_id = :rt"
+        ), {"d": business_date, "rt": ROOM_TYPE}).fetchall())
+
+
+def test_default_date_leaves_todays_arrivals_alone(client):
+    today = current_business_date()
+    _book(client, "na-today", "N1", today, (date.fromisoformat(today) + timedelta(days=2)).isoformat())
+
+    response = client.post("/api/night-audit", json={})
+    assert response.status_code == 200, response.text
+    assert response.json()["businessDate"] == closable_business_date()
+    assert client.get("/api/bookings/na-today").json()["status"] == "Confirmed"
+
+    # The day in progress needs an explicit override, and isn't marked as audited without it
+    assert client.post("/api/night-audit", json={"businessDate": today}).status_code == 409
+    assert client.get(f"/api/night-audit/{today}").status_code == 404
+
+
+def test_past_date_posts_guests_who_have_checked_out(app_db, client):
+    d = "2025-03-03"
+    _book(client, "na-left", "N1", "2025-03-02", "2025-03-04", status="CheckedOut", amount=2000)  # 1000 a night
+    _book(client, "na-staying", "N2", "2025-03-01", "2025-03-05", status="CheckedIn", amount=4000)
+    _book(client, "na-overstay", "N3", "2025-03-01", "2025-03-03", status="CheckedIn", amount=2000)
+    _book(client, "na-departed", "N4", "2025-03-01", "2025-03-03", status="CheckedOut", amount=2000)
+    _book(client, "na-noshow", "N4", "2025-03-03", "2025-03-04")
+
+    report = client.post("/api/night-audit", json={"businessDate": d}).json()
+    assert [n["id"] for n in report["noShows"]] == ["na-noshow"]
+    assert [o["id"] for o in report["overstays"]] == ["na-overstay"]
+    assert _postings(app_db.engine, d) == {"na-left": 1000, "na-staying": 1000, "na-overstay": 1000}
+    assert report["stats"]["departures"] >= 1
+
+    noshow = client.get("/api/bookings/na-noshow").json()
+    assert (noshow["status"], noshow["rejectionReason"]) == ("Cancelled", "No-show")
+
+    # A forced re-run deletes and re-creates the postings, including the checked-out guest's
+    assert client.post("/api/night-audit", json={"businessDate": d}).json()["alreadyRun"] is True
+    forced = client.post("/api/night-audit", json={"businessDate": d, "force": True}).json()
+    assert [n["id"] for n in forced["noShows"]] == ["na-noshow"]
+    assert _postings(app_db.engine, d) == {"na-left": 1000, "na-staying": 1000, "na-overstay": 1000}
+
+
+def test_bad_date(client):
+    assert client.post("/api/night-audit", json={"businessDate": "03/03/2025"}).status_code == 400
+
@@ -0,0 +1,28 @@
+"""
+The OCR upload size cap (_OCRUploadLimit in main.py) on both entry points: the
+local `main.app` and the Vercel app in api/index.py, which copies main's routes
+but not its middleware.
+
+Usage: python -m pytest test_ocr_upload_limit.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(params=["main", "vercel"])
+def upload_client(request, app_db):
+    if request.param == "main":
+        return TestClient(app_db.app)
+    from api import index
+
+    assert index._full_app_loaded, index._import_error
+    return TestClient(index.app)
+
+
+def test_oversized_upload_is_refused_before_parsing(app_db, upload_client):
+    response = upload_client.post(
+        "/api/ocr/upload", content=b"--b--\r\n",
+        headers={"content-type": "multipart/form-data; boundary=b",
+                 "content-length": str(app_db.OCR_MAX_REQUEST_BYTES + 1)},
+    )
+    assert response.status_code == 413, response.text
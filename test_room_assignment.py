@@ -0,0 +1,127 @@
+"""
+Room assignment solver (backend/room_assignment.py): placement rules and the overbooking report.
+
+Pure solver tests, no database.
+
+Usage: python -m pytest test_room_assignment.py   (or: python test_room_assignment.py)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.room_assignment import solve
+
+DELUXE = {"id": "rt-1", "name": "Deluxe", "roomNumbers": ["101", "102", "103", "201", "202", "301"]}
+SUITE = {"id": "rt-2", "name": "Suite", "roomNumbers": ["401"]}
+
+
+def _booking(booking_id, check_in, check_out, room_type_id="rt-1", **extra):
+    return {
+        "id": booking_id, "guestName": booking_id, "reservationId": None, "roomTypeId": room_type_id,
+        "checkIn": check_in, "checkOut": check_out, "isVIP": False, "specialRequests": None,
+        "profileId": None, **extra,
+    }
+
+
+def _rooms(plan):
+    return {a["bookingId"]: a["roomNumber"] for a in plan["assignments"]}
+
+
+def test_sequential_stays_in_one_reservation():
+    # Back-to-back legs of one reservation: a mate's room is free again for the next leg
+    bookings = [
+        _booking("leg-1", "2026-11-01", "2026-11-03", reservationId="RES-1"),
+        _booking("leg-2", "2026-11-03", "2026-11-05", reservationId="RES-1"),
+    ]
+    plan = solve([DELUXE], [], bookings)
+    rooms = _rooms(plan)
+    assert plan["unplaced"] == []
+    assert rooms["leg-1"] == rooms["leg-2"]
+    leg_2 = next(a for a in plan["assignments"] if a["bookingId"] == "leg-2")
+    assert "same room as group" in leg_2["reasons"]
+
+
+def test_group_rooms_side_by_side_around_fixed_stays():
+    fixed = [("102", "2026-05-01", "2026-05-10", "fixed-1")]
+    bookings = [_booking(f"g{i}", "2026-05-04", "2026-05-06", reservationId="RES-G") for i in range(3)]
+    rooms = _rooms(solve([DELUXE], fixed, bookings))
+    indexes = sorted(DELUXE["roomNumbers"].index(r) for r in rooms.values())
+    assert "102" not in rooms.values()
+    assert indexes == list(range(indexes[0], indexes[0] + 3))
+
+
+def test_one_room_per_stay_and_no_double_booking():
+    fixed = [("101", "2026-05-01", "2026-05-04", "fixed-1")]
+    bookings = [_booking(f"b{i}", f"2026-05-0{1 + i % 4}", f"2026-05-0{3 + i % 4}") for i in range(8)]
+    plan = solve([DELUXE], fixed, bookings)
+    stays = {"101": [("2026-05-01", "2026-05-04")]}
+    for a in plan["assignments"]:
+        for check_in, check_out in stays.get(a["roomNumber"], []):
+            assert check_out <= a["checkIn"] or a["checkOut"] <= check_in
+        stays.setdefault(a["roomNumber"], []).append((a["checkIn"], a["checkOut"]))
+    assert len(plan["assignments"]) + len(plan["unplaced"]) == len(bookings)
+
+
+def test_requested_room_and_vip_floor_hint():
+    bookings = [
+        _booking("asks-202", "2026-05-01", "2026-05-03", specialRequests="please give room 202"),
+        _booking("vip", "2026-05-01", "2026-05-03", isVIP=True, specialRequests="high floor, quiet"),
+    ]
+    rooms = _rooms(solve([DELUXE], [], bookings))
+    assert rooms == {"asks-202": "202", "vip": "301"}
+
+
+def test_usual_room_from_profile_history():
+    bookings = [_booking("returning", "2026-05-01", "2026-05-03", profileId=7)]
+    rooms = _rooms(solve([DELUXE], [], bookings, usual_rooms={(7, "rt-1"): "201"}))
+    assert rooms == {"returning": "201"}
+
+
+def test_overbooked_nights_are_reported():
+    bookings = [
+        _booking("s1", "2026-05-01", "2026-05-03", room_type_id="rt-2"),
+        _booking("s2", "2026-05-02", "2026-05-04", room_type_id="rt-2"),
+    ]
+    plan = solve([DELUXE, SUITE], [], bookings)
+    assert _rooms(plan) == {"s1": "401"}
+    assert [(u["bookingId"], u["reason"]) for u in plan["unplaced"]] == [("s2", "overbooked")]
+    assert plan["overbooking"] == [{
+        "date": "2026-05-02", "roomTypeId": "rt-2", "roomTypeName": "Suite", "rooms": 1, "demand": 2, "short": 1,
+    }]
+
+
+def test_fragmented_stay_is_not_called_overbooked():
+    # Each night has a free room, but no room is free for both nights
+    two_rooms = {"id": "rt-3", "name": "Twin", "roomNumbers": ["501", "502"]}
+    fixed = [("501", "2026-05-01", "2026-05-02", "f1"), ("502", "2026-05-02", "2026-05-03", "f2")]
+    plan = solve([two_rooms], fixed, [_booking("long", "2026-05-01", "2026-05-03", room_type_id="rt-3")])
+    assert plan["overbooking"] == []
+    assert plan["unplaced"][0]["reason"].startswith("fragmented")
+
+
+def test_repair_moves_an_earlier_placement():
+    # "first" asks for 502, the only room "second" fits in; "first" is moved to 501 instead
+    two_rooms = {"id": "rt-3", "name": "Twin", "roomNumbers": ["501", "502"]}
+    fixed = [("501", "2026-05-03", "2026-05-04", "f1")]
+    bookings = [
+        _booking("first", "2026-05-01", "2026-05-03", room_type_id="rt-3", specialRequests="room 502"),
+        _booking("second", "2026-05-02", "2026-05-04", room_type_id="rt-3"),
+    ]
+    plan = solve([two_rooms], fixed, bookings)
+    assert plan["unplaced"] == []
+    assert _rooms(plan) == {"first": "501", "second": "502"}
+    moved = next(a for a in plan["assignments"] if a["bookingId"] == "first")
+    assert moved["reasons"] == ["moved to make room"]
+
+
+def test_room_type_without_rooms():
+    plan = solve([{"id": "rt-9", "name": "Empty", "roomNumbers": []}], [], [_booking("x", "2026-05-01", "2026-05-02", room_type_id="rt-9")])
+    assert plan["unplaced"][0]["reason"] == "no rooms configured for this room type"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+    print("SUCCESS")
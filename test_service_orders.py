@@ -0,0 +1,136 @@
+"""
+Guest-menu orders (POST /api/bookings/{id}/orders, backend/service_orders.py).
+
+Covers idempotent re-sends, the retry when a concurrent write bumps the booking
+or an identical submit wins the race for the order id, and cancellation
+removing the folio charge. The races are staged by writing from a second
+session mid-request; SQLite serializes writes, so nothing runs truly in parallel.
+
+Usage: python -m pytest test_service_orders.py
+"""
+import pytest
+from sqlalchemy import text
+
+from backend.database import SessionLocal
+
+ROOM_TYPE = "so-deluxe"
+ORDER = {"department": "F&B", "items": [{"name": "Masala Chai", "price": 80, "quantity": 2}]}
+
+
+@pytest.fixture(autouse=True)
+def _room_type(room_type):
+    room_type(ROOM_TYPE, ["S1", "S2", "S3", "S4", "S5", "S6"])
+
+
+def _check_in(client, booking_id, room):
+    response = client.post("/api/bookings", json={
+        "id": booking_id, "roomTypeId": ROOM_TYPE, "roomNumber": room, "guestName": booking_id,
+        "source": "Direct", "status": "Confirmed", "timestamp": 0,
+        "checkIn": "2027-03-01", "checkOut": "2027-03-03", "amount": 2000,
+    })
+    assert response.status_code == 200, response.text
+    assert client.put(f"/api/bookings/{booking_id}/status", json={"status": "CheckedIn"}).status_code == 200
+
+
+def _folio_ids(client, booking_id):
+    return [item["id"] for item in client.get(f"/api/bookings/{booking_id}").json()["folio"]]
+
+
+def _orders(client, booking_id):
+    return client.get("/api/orders", params={"bookingId": booking_id, "status": "all"}).json()
+
+
+def _side_effect_hook(app_db, monkeypatch, concurrent_write):
+    """Run `concurrent_write` once, after the endpoint has read the booking but before it flushes."""
+    apply_side_effects = app_db._apply_booking_side_effects
+    calls = []
+
+    def hooked(db, db_booking, *args, **kwargs):
+        if not calls:
+            concurrent_write(db_booking)
+        calls.append(db_booking.id)
+        return apply_side_effects(db, db_booking, *args, **kwargs)
+
+    monkeypatch.setattr(app_db, "_apply_booking_side_effects", hooked)
+    return calls
+
+
+def test_resent_order_id_returns_the_existing_order(client):
+    _check_in(client, "so-resend", "S1")
+    first = client.post("/api/bookings/so-resend/orders", json={**ORDER, "id": "ord-resend"})
+    assert first.status_code == 201, first.text
+    assert first.json()["order"]["amount"] == 160
+
+    again = client.post("/api/bookings/so-resend/orders", json={**ORDER, "id": "ord-resend"})
+    assert again.status_code == 201
+    assert again.json()["order"] == first.json()["order"]
+    assert _folio_ids(client, "so-resend") == ["fi-ord-resend"]
+    assert [o["id"] for o in _orders(client, "so-resend")] == ["ord-resend"]
+
+    # The id is tied to its booking
+    _check_in(client, "so-other", "S2")
+    assert client.post("/api/bookings/so-other/orders", json={**ORDER, "id": "ord-resend"}).status_code == 409
+
+
+def test_concurrent_booking_write_is_retried(app_db, client, monkeypatch):
+    _check_in(client, "so-stale", "S3")
+
+    def bump_version(db_booking):
+        with app_db.engine.begin() as conn:
+            conn.execute(text("UPDATE bookings SET version = version + 1, pax = 2 WHERE id = :id"),
+                         {"id": db_booking.id})
+
+    calls = _side_effect_hook(app_db, monkeypatch, bump_version)
+    response = client.post("/api/bookings/so-stale/orders", json={**ORDER, "id": "ord-stale"})
+    assert response.status_code == 201, response.text
+    assert len(calls) == 2
+    assert _folio_ids(client, "so-stale") == ["fi-ord-stale"]
+    assert client.get("/api/bookings/so-stale").json()["pax"] == 2
+
+
+def test_identical_submit_winning_the_race_is_returned(app_db, client, monkeypatch):
+    from backend.db_models import ServiceOrderDB
+    from backend.models import ServiceOrderCreate
+    from backend.service_orders import new_order_row
+
+    _check_in(client, "so-race", "S4")
+
+    def other_submit_commits_first(db_booking):
+        db = SessionLocal()
+        db.add(ServiceOrderDB(**new_order_row("ord-race", db_booking, ServiceOrderCreate(**ORDER))))
+        db.commit()
+        db.close()
+
+    calls = _side_effect_hook(app_db, monkeypatch, other_submit_commits_first)
+    response = client.post("/api/bookings/so-race/orders", json={**ORDER, "id": "ord-race"})
+    assert response.status_code == 201, response.text
+    assert len(calls) == 1  # the retry finds the winner's order and returns it
+    assert response.json()["order"]["id"] == "ord-race"
+    assert [o["id"] for o in _orders(client, "so-race")] == ["ord-race"]
+
+
+def test_cancelling_removes_the_unpaid_charge(client):
+    _check_in(client, "so-cancel", "S5")
+    assert client.post("/api/bookings/so-cancel/orders", json={**ORDER, "id": "ord-keep"}).status_code == 201
+    assert client.post("/api/bookings/so-cancel/orders", json={**ORDER, "id": "ord-drop"}).status_code == 201
+
+    cancelled = client.put("/api/orders/ord-drop/status", json={"status": "Cancelled"})
+    assert cancelled.status_code == 200, cancelled.text
+    assert cancelled.json()["status"] == "Cancelled"
+    assert _folio_ids(client, "so-cancel") == ["fi-ord-keep"]
+
+    # Delivered orders can't be cancelled, and a paid charge stays put
+    for status in ("InProgress", "Ready", "Delivered"):
+        assert client.put("/api/orders/ord-keep/status", json={"status": status}).status_code == 200
+    assert client.put("/api/orders/ord-keep/status", json={"status": "Cancelled"}).status_code == 409
+    assert _folio_ids(client, "so-cancel") == ["fi-ord-keep"]
+
+
+def test_paid_charge_blocks_cancellation(client):
+    _check_in(client, "so-paid", "S6")
+    assert client.post("/api/bookings/so-paid/orders", json={**ORDER, "id": "ord-paid"}).status_code == 201
+    folio = client.get("/api/bookings/so-paid").json()["folio"]
+    assert client.patch("/api/bookings/so-paid", json={"folio": [{**folio[0], "isPaid": True}]}).status_code == 200
+
+    assert client.put("/api/orders/ord-paid/status", json={"status": "Cancelled"}).status_code == 409
+    assert _folio_ids(client, "so-paid") == ["fi-ord-paid"]
@@ -20,6 +20,12 @@ export interface PropertySettings {
   checkInTime?: string; // e.g. "12:00"
   checkOutTime?: string; // e.g. "11:00"
   loyaltyTiers?: LoyaltyTier[];
+  roomGstSlabs?: GstSlab[]; // Accommodation GST by per-night tariff; empty = flat gstRate
+}
+
+export interface GstSlab {
+  upTo: number | null; // Per-night tariff ceiling, null = no upper bound
+  rate: number;
 }
 
 export interface Hotel {
@@ -79,6 +85,15 @@ export interface InventoryItem {
 
 export type ChannelStatus = 'pending' | 'success' | 'error' | 'retrying' | 'waiting_retry' | 'stopped';
 
+// Typeahead row from /api/guest/suggest; load the full profile with /api/guest/{id}
+export interface GuestSuggestion {
+  id: number;
+  name: string;
+  phoneMasked: string;
+  lastCheckIn?: string;
+  stayCount: number;
+}
+
 export interface GuestDetails {
   profileId?: number;
   name?: string;
@@ -180,6 +195,72 @@ export interface FolioItem {
   paymentId?: string; // Link to a Payment record if paid
 }
 
+export interface ServiceOrderItem {
+  name: string;
+  price: number; // Unit price
+  quantity?: number;
+  instructions?: string;
+}
+
+export type ServiceOrderStatus = 'Received' | 'InProgress' | 'Ready' | 'Delivered' | 'Cancelled';
+
+// In-room dining / laundry order in its department's queue (its charge is folioItemId on the booking)
+export interface ServiceOrder {
+  id: string;
+  number: string;
+  bookingId: string;
+  roomNumber?: string;
+  guestName?: string;
+  department: 'F&B' | 'Laundry';
+  status: ServiceOrderStatus;
+  items: ServiceOrderItem[];
+  amount: number;
+  instructions?: string;
+  folioItemId: string;
+  createdAt: string;
+  updatedAt: string;
+}
+
+// Slim booking row carried on the front desk board
+export type FrontDeskBoardRow = Pick<Booking, 'id' | 'reservationId' | 'guestName' | 'roomTypeId' | 'roomNumber' | 'status' | 'source' | 'checkIn' | 'checkOut' | 'pax' | 'numberOfRooms' | 'isVIP' | 'isSettled' | 'isAutoGenerated'>;
+
+export interface FrontDeskRoom {
+  roomNumber: string;
+  roomTypeId: string;
+  roomTypeName: string;
+  status: 'occupied' | 'departing' | 'arriving' | 'vacant';
+  occupant: { id: string; guestName: string; checkOut: string } | null;
+  arrival: { id: string; guestName: string } | null;
+}
+
+// GET /api/frontdesk/today: the desk's work for one business date
+export interface FrontDeskToday {
+  businessDate: string;
+  arrivals: FrontDeskBoardRow[];
+  departures: FrontDeskBoardRow[];
+  inHouse: FrontDeskBoardRow[];
+  unassigned: FrontDeskBoardRow[];
+  rooms: FrontDeskRoom[];
+  counts: {
+    arrivals: number;
+    departures: number;
+    inHouse: number;
+    unassigned: number;
+    rooms: Record<FrontDeskRoom['status'], number>;
+  };
+}
+
+// POST /api/bookings/assign-rooms: the solver's plan (written when `applied`)
+export interface RoomAssignmentPlan {
+  start: string;
+  end: string;
+  applied: boolean;
+  assignments: { bookingId: string; guestName: string; reservationId?: string; roomTypeId: string; roomNumber: string; checkIn: string; checkOut: string; isVIP: boolean; reasons: string[] }[];
+  unplaced: { bookingId: string; guestName: string; reservationId?: string; roomTypeId: string; checkIn: string; checkOut: string; isVIP: boolean; reason: string }[];
+  overbooking: { date: string; roomTypeId: string; roomTypeName: string; rooms: number; demand: number; short: number }[];
+  stats: { bookings: number; assigned: number; unplaced: number; solveMs: number };
+}
+
 export interface Booking {
   id: string;
   roomTypeId: string;
@@ -210,6 +291,37 @@ export interface Booking {
   externalReferenceId?: string;
   folio?: FolioItem[];
   payments?: Payment[];
+  taxBreakdown?: TaxBreakdown; // Computed by the backend; read-only
+  guestProfileId?: number; // Set by the backend from the synced guest profile
+  version?: number; // Bumped on every write; sent back so a stale edit gets a 409 instead of overwriting
+}
+
+export interface TaxLine {
+  description: string;
+  category: string;
+  taxClass: 'accommodation' | 'food' | 'other';
+  quantity: number;
+  rate: number;
+  taxableValue: number;
+  gstRate: number;
+  cgst: number;
+  sgst: number;
+  tax: number;
+  total: number;
+}
+
+export interface TaxBreakdown {
+  nights: number;
+  lines: TaxLine[];
+  byRate: { gstRate: number; taxableValue: number; cgst: number; sgst: number; tax: number }[];
+  roomTotal: number;
+  folioTotal: number;
+  taxableValue: number;
+  cgst: number;
+  sgst: number;
+  totalTax: number;
+  grandTotal: number;
+  rates: Record<string, number>;
 }
 
 export interface RateSyncEvent {